@@ -1,21 +1,29 @@
 
 # Continue API Backend - Main application and routers
 
-api_main = """from fastapi import FastAPI
+api_main = """from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from database import engine, Base, dispose_engines
 from config import get_settings
 from routers import health, predictions, historical
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the async connection pools with the event loop they belong to
+    await dispose_engines()
+
 # Initialize FastAPI app
 settings = get_settings()
 app = FastAPI(
     title="Chicago Crime Prediction API",
     description="Predictive analytics API for Chicago crime data",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -33,7 +41,7 @@ app.include_router(predictions.router, prefix="/api", tags=["Predictions"])
 app.include_router(historical.router, prefix="/api", tags=["Historical"])
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {
         "message": "Chicago Crime Prediction API",
         "docs": "/docs",
@@ -42,21 +50,22 @@ def read_root():
 """
 
 router_health = """from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from database import get_db
 from schemas import HealthResponse
+from cache import response_cache
 import os
 
 router = APIRouter()
 
 @router.get("/health", response_model=HealthResponse)
-def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_db)):
     \"\"\"Health check endpoint\"\"\"
     
     # Check database connection
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_status = "connected"
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -73,22 +82,37 @@ def health_check(db: Session = Depends(get_db)):
         model_loaded=model_loaded,
         version="1.0.0"
     )
+
+@router.get("/cache/stats")
+async def cache_stats():
+    \"\"\"Response cache hit/miss counts per endpoint\"\"\"
+    return response_cache.stats()
 """
 
-router_predictions = """from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+router_predictions = """from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from database import get_db
+from database import get_db, get_analytics_db
 from schemas import *
-from typing import List
-import pygeohash as pgh
-from datetime import datetime, timedelta
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 import pickle
 import os
 import numpy as np
+from spatial import get_grid_index
+from cache import response_cache
+from forecast_store import get_forecast_store
+from scoring import grid_features, score, hourly_means
+from columnar import (FORMAT_PATTERN, FORECAST_COLUMNS, response_format, rows_to_columns,
+                      records_to_columns, forecast_schema, columnar_response)
 
 router = APIRouter()
 
+# Most grids one bulk forecast returns for a bounding box
+MAX_BULK_GRIDS = 5000
+
 # Load ML model (lazy loading)
 _model = None
 
@@ -108,10 +132,13 @@ def get_model():
     return _model
 
 @router.post("/grids/{grid_id}/forecast", response_model=List[ForecastResponse])
-def forecast_grid(
+async def forecast_grid(
     grid_id: str,
     request: ForecastRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    format: Optional[str] = Query(default=None, pattern=FORMAT_PATTERN,
+                                  description="columnar or arrow for column arrays"),
+    db: AsyncSession = Depends(get_db)
 ):
     \"\"\"Get crime forecast for a specific grid\"\"\"
     
@@ -119,110 +146,200 @@ def forecast_grid(
     if len(grid_id) < 5:
         raise HTTPException(status_code=400, detail="Invalid grid_id")
     
-    # Get historical data for this grid
-    query = text(\"\"\"
-        SELECT 
-            grid_id,
-            DATE(event_date) as date,
-            event_hour,
-            COUNT(*) as count
-        FROM incidents
+    start_date = datetime.now().date() + timedelta(days=1)
+    end_date = start_date + timedelta(days=request.days - 1)
+    fmt = response_format(http_request, format)
+    if fmt != "rows":
+        # Date and hour columns of every columnar path below
+        slot_dates = [start_date + timedelta(days=slot // 24) for slot in range(request.days * 24)]
+        slot_hours = np.tile(np.arange(24, dtype=np.int8), request.days)
+    
+    # Precomputed store: a row slice of the memory-mapped run, no database
+    # round trip and no per-hour response models
+    store = get_forecast_store()
+    values = store.forecast(grid_id, start_date, request.days) if store else None
+    if values is not None:
+        if fmt != "rows":
+            return columnar_response(fmt, {
+                "grid_id": [grid_id] * len(values),
+                "date": slot_dates,
+                "hour": slot_hours,
+                "predicted_count": np.round(values.astype(np.float64), 4),
+                "confidence": np.full(len(values), store.confidence),
+                "model_version": [store.model_version] * len(values)
+            }, forecast_schema)
+        dates = [(start_date + timedelta(days=day)).isoformat() for day in range(request.days)]
+        counts = np.round(values.astype(np.float64), 4).tolist()
+        return JSONResponse([
+            {
+                "grid_id": grid_id,
+                "date": dates[slot // 24],
+                "hour": slot % 24,
+                "predicted_count": count,
+                "confidence": store.confidence,
+                "model_version": store.model_version
+            }
+            for slot, count in enumerate(counts)
+        ])
+    
+    key, cached = await response_cache.lookup(db, "forecast", grid_id=grid_id, days=request.days)
+    if cached is not None:
+        if fmt != "rows":
+            columns = records_to_columns(cached, FORECAST_COLUMNS)
+            columns["date"] = [date.fromisoformat(day) for day in columns["date"]]
+            return columnar_response(fmt, columns, forecast_schema)
+        return cached
+    
+    # Latest batch run: predictions only holds the live run, so this is one
+    # primary key range on (grid_id, prediction_date, prediction_hour)
+    stored = (await db.execute(text(\"\"\"
+        SELECT prediction_date, prediction_hour, predicted_count, confidence, model_version
+        FROM predictions
         WHERE grid_id = :grid_id
-        AND event_date >= DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-        GROUP BY grid_id, DATE(event_date), event_hour
-        ORDER BY date DESC, event_hour
-        LIMIT 100
-    \"\"\")
+        AND prediction_date BETWEEN :start_date AND :end_date
+        ORDER BY prediction_date, prediction_hour
+    \"\"\"), {"grid_id": grid_id, "start_date": start_date, "end_date": end_date})).fetchall()
     
-    result = db.execute(query, {"grid_id": grid_id}).fetchall()
+    # A stale run, or one shorter than the request, falls back to the hourly means below
+    if len(stored) == request.days * 24:
+        if fmt != "rows":
+            # Columnar responses are built from the rows but not cached
+            return columnar_response(fmt, {
+                "grid_id": [grid_id] * len(stored),
+                **rows_to_columns(stored, FORECAST_COLUMNS[1:])
+            }, forecast_schema)
+        forecasts = [ForecastResponse(
+            grid_id=grid_id,
+            date=row.prediction_date,
+            hour=row.prediction_hour,
+            predicted_count=row.predicted_count,
+            confidence=row.confidence,
+            model_version=row.model_version
+        ) for row in stored]
+        await response_cache.store(key, jsonable_encoder(forecasts))
+        return forecasts
     
-    if not result:
+    # Hourly means of the last 90 days of rollup rows, the same fallback as
+    # the bulk forecast and the batch job (one primary key range)
+    predicted = (await hourly_means(db, start_date, [grid_id], request.days, missing=np.nan))[0]
+    if np.isnan(predicted).all():
         raise HTTPException(status_code=404, detail="Grid not found or no historical data")
+    predicted = np.nan_to_num(predicted, nan=1.0)
     
-    # Calculate average for simple prediction
-    avg_by_hour = {}
-    for row in result:
-        hour = row.event_hour
-        if hour not in avg_by_hour:
-            avg_by_hour[hour] = []
-        avg_by_hour[hour].append(row.count)
-    
-    for hour in avg_by_hour:
-        avg_by_hour[hour] = np.mean(avg_by_hour[hour])
+    if fmt != "rows":
+        return columnar_response(fmt, {
+            "grid_id": [grid_id] * len(slot_dates),
+            "date": slot_dates,
+            "hour": slot_hours,
+            "predicted_count": predicted,
+            "confidence": np.full(len(slot_dates), 0.75),
+            "model_version": [None] * len(slot_dates)
+        }, forecast_schema)
     
     # Generate forecast
     forecasts = []
-    start_date = datetime.now().date() + timedelta(days=1)
     
     for day in range(request.days):
         forecast_date = start_date + timedelta(days=day)
         for hour in range(24):
-            predicted = avg_by_hour.get(hour, 1.0)
-            
             forecasts.append(ForecastResponse(
                 grid_id=grid_id,
                 date=forecast_date,
                 hour=hour,
-                predicted_count=float(predicted),
+                predicted_count=float(predicted[day * 24 + hour]),
                 confidence=0.75
             ))
     
+    await response_cache.store(key, jsonable_encoder(forecasts))
     return forecasts
 
-@router.post("/grids/nearby", response_model=List[GridInfo])
-def get_nearby_grids(
-    request: NearbyRequest,
-    db: Session = Depends(get_db)
+@router.post("/grids/forecast", response_model=BulkForecastResponse)
+async def forecast_grids(
+    request: BulkForecastRequest,
+    db: AsyncSession = Depends(get_analytics_db)
 ):
-    \"\"\"Find grids near given coordinates\"\"\"
+    \"\"\"Forecast many grids at once (a list of grid_ids or a bounding box), as columns\"\"\"
     
-    # Create geohash for the location
-    center_hash = pgh.encode(request.latitude, request.longitude, precision=6)
+    start_date = datetime.now().date() + timedelta(days=1)
+    bbox = request.bbox
     
-    # Get adjacent geohashes
-    nearby_hashes = [center_hash]
-    directions = ['top', 'bottom', 'left', 'right', 
-                  'topleft', 'topright', 'bottomleft', 'bottomright']
+    # One query for the features of every grid
+    features = await grid_features(
+        db, start_date,
+        grid_ids=request.grid_ids,
+        bbox=(bbox.lat_min, bbox.lat_max, bbox.lon_min, bbox.lon_max) if bbox else None,
+        limit=MAX_BULK_GRIDS
+    )
+    grid_ids = features['grid_id'].tolist()
     
-    for direction in directions:
-        try:
-            adjacent = pgh.get_adjacent(center_hash, direction)
-            nearby_hashes.append(adjacent)
-        except:
-            pass
+    # One vectorised model call over every grid x hourly slot
+    model_package = get_model()
+    if not grid_ids:
+        values = np.zeros((0, request.days * 24))
+        model_version = "none"
+    elif model_package is None:
+        values = await hourly_means(db, start_date, grid_ids, request.days)
+        model_version = "hourly_mean"
+    else:
+        values = score(model_package, features, start_date, request.days)
+        model_version = f"{model_package['model_type']}_{model_package['timestamp']}"
     
-    # Query grids
-    query = text(\"\"\"
-        SELECT 
-            grid_id,
-            AVG(latitude) as center_lat,
-            AVG(longitude) as center_lon,
-            COUNT(*) as crime_count
-        FROM incidents
-        WHERE grid_id IN :grid_ids
-        AND event_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-        GROUP BY grid_id
-        ORDER BY crime_count DESC
-        LIMIT 20
-    \"\"\")
+    found = set(grid_ids)
+    missing = [g for g in request.grid_ids if g not in found] if request.grid_ids else []
     
-    result = db.execute(query, {"grid_ids": tuple(nearby_hashes)}).fetchall()
+    # Plain lists straight to JSON: validating thousands of rows of floats
+    # against the response model would cost more than computing them
+    return JSONResponse({
+        "start_date": start_date.isoformat(),
+        "days": request.days,
+        "model_version": model_version,
+        "grid_ids": grid_ids,
+        "center_lat": features['center_lat'].astype(float).tolist(),
+        "center_lon": features['center_lon'].astype(float).tolist(),
+        "predicted_count": np.round(values, 4).tolist(),
+        "missing": missing
+    })
+
+@router.post("/grids/nearby", response_model=List[GridInfo])
+async def get_nearby_grids(
+    request: NearbyRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    \"\"\"Find grids within radius_km of given coordinates\"\"\"
+    
+    # Coordinates rounded to 0.1 m, so float noise does not split the cache
+    key, cached = await response_cache.lookup(
+        db, "nearby",
+        latitude=round(request.latitude, 6),
+        longitude=round(request.longitude, 6),
+        radius_km=request.radius_km
+    )
+    if cached is not None:
+        return cached
+    
+    # Ball tree over grid centroids: cost follows the matches, not the radius
+    index = await get_grid_index(db)
+    nearby = index.within(request.latitude, request.longitude, request.radius_km)
+    nearby = nearby[nearby['recent_count'] > 0]
+    nearby = nearby.sort_values('recent_count', ascending=False, kind='stable').head(20)
     
     grids = []
-    for row in result:
+    for row in nearby.itertuples():
         grids.append(GridInfo(
             grid_id=row.grid_id,
             center_lat=float(row.center_lat),
             center_lon=float(row.center_lon),
-            crime_count=int(row.crime_count)
+            crime_count=int(row.recent_count),
+            distance_km=round(float(row.distance_km), 3)
         ))
     
+    await response_cache.store(key, jsonable_encoder(grids))
     return grids
 
 @router.post("/explain", response_model=ExplainResponse)
-def explain_prediction(
+async def explain_prediction(
     request: ExplainRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     \"\"\"Get SHAP explanation for a prediction\"\"\"
     
@@ -242,19 +359,46 @@ def explain_prediction(
     )
 """
 
-router_historical = """from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+router_historical = """from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from database import get_db
+from database import get_analytics_db, get_export_db
 from schemas import *
 from typing import List, Optional
+from sketches import merge, estimate, standard_error
+from cache import response_cache
+from export import (EXPORT_COLUMNS, MEDIA_TYPES, AFTER_CURSOR, UNTIL_BOUNDARY, ORDER,
+                    encode_cursor, decode_cursor, stream_rows, encode, export_row, arrow_schema)
+from columnar import FORMAT_PATTERN, response_format, rows_to_columns, columnar_response
 
 router = APIRouter()
 
+def historical_filters(request):
+    \"\"\"WHERE clause and parameters shared by the historical queries\"\"\"
+    where = "event_date BETWEEN :start_date AND :end_date"
+    params = {
+        "start_date": request.start_date,
+        "end_date": request.end_date
+    }
+    
+    if request.grid_id:
+        where += " AND grid_id = :grid_id"
+        params["grid_id"] = request.grid_id
+    
+    if request.crime_type:
+        where += " AND primary_type = :crime_type"
+        params["crime_type"] = request.crime_type.upper()
+    
+    return where, params
+
 @router.post("/historical", response_model=List[IncidentResponse])
-def get_historical_data(
+async def get_historical_data(
     request: HistoricalRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    format: Optional[str] = Query(default=None, pattern=FORMAT_PATTERN,
+                                  description="columnar or arrow for column arrays"),
+    db: AsyncSession = Depends(get_export_db)
 ):
     \"\"\"Query historical crime data\"\"\"
     
@@ -273,27 +417,22 @@ def get_historical_data(
             district,
             community_area
         FROM incidents
-        WHERE event_date BETWEEN :start_date AND :end_date
+        WHERE {where}
     \"\"\"
     
-    params = {
-        "start_date": request.start_date,
-        "end_date": request.end_date,
-        "limit": request.limit
-    }
-    
-    if request.grid_id:
-        base_query += " AND grid_id = :grid_id"
-        params["grid_id"] = request.grid_id
+    where, params = historical_filters(request)
+    params["limit"] = request.limit
     
-    if request.crime_type:
-        base_query += " AND primary_type = :crime_type"
-        params["crime_type"] = request.crime_type.upper()
-    
-    base_query += " ORDER BY event_ts DESC LIMIT :limit"
+    base_query = base_query.format(where=where) + " ORDER BY event_ts DESC LIMIT :limit"
     
     query = text(base_query)
-    result = db.execute(query, params).fetchall()
+    result = (await db.execute(query, params)).fetchall()
+    
+    # Columns straight from the rows, without a model per incident
+    fmt = response_format(http_request, format)
+    if fmt != "rows":
+        return columnar_response(fmt, rows_to_columns(map(export_row, result), EXPORT_COLUMNS),
+                                 arrow_schema)
     
     incidents = []
     for row in result:
@@ -313,61 +452,958 @@ def get_historical_data(
     
     return incidents
 
+@router.post("/historical/export")
+async def export_historical_data(
+    request: ExportRequest,
+    db: AsyncSession = Depends(get_export_db)
+):
+    \"\"\"
+    Stream historical crime data as NDJSON, CSV or Arrow IPC, newest first.
+    
+    Rows come off a server-side cursor a batch at a time, so server memory
+    is the same for a day or for twenty years. With page_size, a page ends
+    at a fixed (event_ts, incident_id) key and the X-Next-Cursor header
+    holds the token for the next request's cursor; the last page has none.
+    \"\"\"
+    
+    where, params = historical_filters(request)
+    
+    if request.cursor:
+        try:
+            params["cursor_ts"], params["cursor_id"] = decode_cursor(request.cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        where += AFTER_CURSOR
+    
+    headers = {}
+    if request.page_size:
+        # Key of the page's last row, if another row follows it; the page is
+        # then bounded by that key, so rows loaded meanwhile cannot shift it
+        boundary_query = text(f\"\"\"
+            SELECT event_ts, incident_id
+            FROM incidents
+            WHERE {where}
+        \"\"\" + ORDER + " LIMIT 2 OFFSET :offset")
+        boundary = (await db.execute(boundary_query, {**params, "offset": request.page_size - 1})).fetchall()
+        if len(boundary) == 2:
+            params["boundary_ts"], params["boundary_id"] = boundary[0].event_ts, boundary[0].incident_id
+            where += UNTIL_BOUNDARY
+            headers["X-Next-Cursor"] = encode_cursor(boundary[0].event_ts, boundary[0].incident_id)
+    
+    query = text(f\"\"\"
+        SELECT {", ".join(EXPORT_COLUMNS)}
+        FROM incidents
+        WHERE {where}
+    \"\"\" + ORDER)
+    
+    return StreamingResponse(
+        encode(request.format, stream_rows(query, params)),
+        media_type=MEDIA_TYPES[request.format],
+        headers=headers
+    )
+
 @router.get("/stats/summary")
-def get_summary_stats(
+async def get_summary_stats(
     days: int = Query(default=30, ge=1, le=365),
-    db: Session = Depends(get_db)
+    exact: bool = Query(default=False, description="Exact distinct counts instead of sketches"),
+    db: AsyncSession = Depends(get_analytics_db)
 ):
     \"\"\"Get summary statistics\"\"\"
     
+    key, cached = await response_cache.lookup(db, "stats_summary", days=days, exact=exact)
+    if cached is not None:
+        return cached
+    
+    # Totals come from the daily cube (a primary key range)
     query = text(\"\"\"
         SELECT 
-            COUNT(*) as total_crimes,
-            COUNT(DISTINCT grid_id) as total_grids,
-            COUNT(DISTINCT primary_type) as crime_types,
-            AVG(arrest) as arrest_rate
-        FROM incidents
-        WHERE event_date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
+            SUM(count) as total_crimes,
+            SUM(arrests) / SUM(count) as arrest_rate
+        FROM stats_cube
+        WHERE date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
     \"\"\")
     
-    result = db.execute(query, {"days": days}).fetchone()
+    result = (await db.execute(query, {"days": days})).fetchone()
     
-    return {
+    stats = {
         "period_days": days,
-        "total_crimes": result.total_crimes,
-        "total_grids": result.total_grids,
-        "crime_types": result.crime_types,
-        "arrest_rate": float(result.arrest_rate or 0)
+        "total_crimes": int(result.total_crimes or 0),
+        "arrest_rate": float(result.arrest_rate or 0),
+        "approximate": not exact
     }
+    
+    if exact:
+        # Grids are not a cube dimension; ix_grid_agg_day covers this (grid_id is in the primary key)
+        distinct_query = text(\"\"\"
+            SELECT 
+                (SELECT COUNT(DISTINCT grid_id) FROM grid_aggregates
+                 WHERE date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)) as total_grids,
+                (SELECT COUNT(DISTINCT primary_type) FROM stats_cube
+                 WHERE date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)) as crime_types
+        \"\"\")
+        distinct = (await db.execute(distinct_query, {"days": days})).fetchone()
+        stats["total_grids"] = distinct.total_grids
+        stats["crime_types"] = distinct.crime_types
+        await response_cache.store(key, stats)
+        return stats
+    
+    # Merge one sketch per day; cost is independent of the incident volume
+    sketch_query = text(\"\"\"
+        SELECT grids, crime_types
+        FROM daily_sketches
+        WHERE date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
+    \"\"\")
+    
+    rows = (await db.execute(sketch_query, {"days": days})).fetchall()
+    grids = merge(row.grids for row in rows)
+    crime_types = merge(row.crime_types for row in rows)
+    
+    stats["total_grids"] = estimate(grids)
+    stats["crime_types"] = estimate(crime_types)
+    stats["relative_error"] = round(standard_error(grids), 4) if grids is not None else 0.0
+    await response_cache.store(key, stats)
+    return stats
 
 @router.get("/stats/by-hour")
-def get_hourly_stats(
+async def get_hourly_stats(
     days: int = Query(default=30, ge=1, le=365),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_analytics_db)
 ):
     \"\"\"Get crime stats by hour of day\"\"\"
     
+    key, cached = await response_cache.lookup(db, "stats_by_hour", days=days)
+    if cached is not None:
+        return cached
+    
     query = text(\"\"\"
         SELECT 
-            event_hour,
-            COUNT(*) as count,
-            COUNT(CASE WHEN arrest = 1 THEN 1 END) as arrests
-        FROM incidents
-        WHERE event_date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
-        GROUP BY event_hour
-        ORDER BY event_hour
+            hour as event_hour,
+            SUM(count) as count,
+            SUM(arrests) as arrests
+        FROM stats_cube
+        WHERE date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
+        GROUP BY hour
+        ORDER BY hour
     \"\"\")
     
-    result = db.execute(query, {"days": days}).fetchall()
+    result = (await db.execute(query, {"days": days})).fetchall()
     
-    return [
+    hourly = [
         {
             "hour": row.event_hour,
-            "count": row.count,
-            "arrests": row.arrests
+            "count": int(row.count),
+            "arrests": int(row.arrests)
         }
         for row in result
     ]
+    await response_cache.store(key, hourly)
+    return hourly
+"""
+
+api_router_queries = """\"\"\"
+Representative calls of every router query, with the SQL they issue captured
+for EXPLAIN-based tooling
+\"\"\"
+import asyncio
+from contextlib import contextmanager
+from datetime import date, timedelta
+from fastapi import HTTPException
+from sqlalchemy import event, text
+import pygeohash as pgh
+from database import async_engine, AsyncSessionLocal
+from schemas import (ForecastRequest, BulkForecastRequest, BoundingBox, NearbyRequest,
+                     HistoricalRequest, ExportRequest)
+from routers import predictions, historical
+from cache import response_cache
+from spatial import reset_grid_index
+from forecast_store import bypass_forecast_store
+
+def sample_grid(db):
+    \"\"\"Busiest grid of the last 30 days, so the sample calls hit real rows\"\"\"
+    row = db.execute(text(\"\"\"
+        SELECT grid_id
+        FROM grid_aggregates
+        WHERE date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+        GROUP BY grid_id
+        ORDER BY SUM(count) DESC
+        LIMIT 1
+    \"\"\")).fetchone()
+    return row.grid_id if row else "dp3wjz"
+
+def router_calls(db, async_db):
+    \"\"\"
+    One call per router query shape.
+
+    db is a sync session for picking the sample grid, async_db the session
+    the routers run on. Returns (name, call, (start, end)) tuples, where
+    call returns the router coroutine and (start, end) is the event_date
+    range the call asks for; end is None for open-ended "last N days"
+    filters, start None when the call has no date filter.
+    \"\"\"
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    grid_id = sample_grid(db)
+    lat, lon = pgh.decode(grid_id)
+
+    return [
+        ("forecast_grid",
+         lambda: predictions.forecast_grid(
+             grid_id, ForecastRequest(grid_id=grid_id), http_request=None, format="rows", db=async_db),
+         (today - timedelta(days=90), None)),
+        ("forecast_grids",
+         lambda: predictions.forecast_grids(BulkForecastRequest(bbox=BoundingBox(
+             lat_min=max(lat - 0.02, 41.6), lat_max=min(lat + 0.02, 42.1),
+             lon_min=max(lon - 0.02, -87.9), lon_max=min(lon + 0.02, -87.5))), db=async_db),
+         (today - timedelta(days=90), None)),
+        ("get_nearby_grids",
+         lambda: predictions.get_nearby_grids(NearbyRequest(latitude=lat, longitude=lon), db=async_db),
+         (month_ago, None)),
+        ("get_historical_data",
+         lambda: historical.get_historical_data(
+             HistoricalRequest(start_date=month_ago, end_date=today),
+             http_request=None, format="rows", db=async_db),
+         (month_ago, today)),
+        ("get_historical_data[grid_id]",
+         lambda: historical.get_historical_data(
+             HistoricalRequest(start_date=month_ago, end_date=today, grid_id=grid_id),
+             http_request=None, format="rows", db=async_db),
+         (month_ago, today)),
+        ("get_historical_data[crime_type]",
+         lambda: historical.get_historical_data(
+             HistoricalRequest(start_date=month_ago, end_date=today, crime_type="theft"),
+             http_request=None, format="rows", db=async_db),
+         (month_ago, today)),
+        # Only the page boundary query runs here; the streamed query that
+        # follows has the same filter and order
+        ("export_historical_data",
+         lambda: historical.export_historical_data(
+             ExportRequest(start_date=month_ago, end_date=today, page_size=1000), db=async_db),
+         (month_ago, today)),
+        ("get_summary_stats",
+         lambda: historical.get_summary_stats(days=30, exact=False, db=async_db),
+         (month_ago, None)),
+        ("get_summary_stats[exact]",
+         lambda: historical.get_summary_stats(days=30, exact=True, db=async_db),
+         (month_ago, None)),
+        ("get_hourly_stats",
+         lambda: historical.get_hourly_stats(days=30, db=async_db),
+         (month_ago, None)),
+    ]
+
+@contextmanager
+def uncached():
+    \"\"\"
+    Make every router call query MySQL: no response cache, a grid index
+    rebuilt on first use and no forecast store. Otherwise a second capture
+    (e.g. after a migration) would be served from memory and miss the SQL.
+    \"\"\"
+    backend = response_cache.backend
+    response_cache.backend = None
+    reset_grid_index()
+    bypass_forecast_store()
+    try:
+        yield
+    finally:
+        response_cache.backend = backend
+        reset_grid_index()
+        bypass_forecast_store(False)
+
+def capture_queries(db):
+    \"\"\"
+    Run every router call once and record the statements it sends to MySQL.
+
+    The routers run on an async session on the primary, in their own event
+    loop, with the in-process caches off (see uncached). Returns dicts with
+    the endpoint name, the statement and its DBAPI parameters as the driver
+    received them, and the call's date range.
+    \"\"\"
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append({"statement": statement, "parameters": parameters})
+
+    async def run_calls():
+        queries = []
+        try:
+            async with AsyncSessionLocal() as async_db:
+                for name, call, date_range in router_calls(db, async_db):
+                    captured.clear()
+                    try:
+                        await call()
+                    except HTTPException:
+                        # A 404 on an empty grid still issued its query
+                        pass
+                    queries.extend({"endpoint": name, "date_range": date_range, **q} for q in captured)
+        finally:
+            # Pooled connections belong to this loop; the next run gets a new one
+            await async_engine.dispose()
+        return queries
+
+    # asyncmy uses pymysql's format paramstyle, so captured parameters work with explain()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        with uncached():
+            return asyncio.run(run_calls())
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+def explain(db, query, analyze=False):
+    \"\"\"EXPLAIN (or EXPLAIN ANALYZE) a captured query, as a list of row dicts\"\"\"
+    prefix = "EXPLAIN ANALYZE " if analyze else "EXPLAIN "
+    result = db.connection().exec_driver_sql(prefix + query["statement"], query["parameters"])
+    return [dict(row._mapping) for row in result]
+"""
+
+api_verify_partitions = """#!/usr/bin/env python3
+\"\"\"
+Check with EXPLAIN that each router query only reads the incidents partitions
+its date range needs
+\"\"\"
+import sys
+from datetime import date
+from sqlalchemy import text
+from database import SessionLocal
+from router_queries import capture_queries, explain
+
+def partition_ranges(db):
+    \"\"\"(name, lower, upper) event_date bounds of every incidents partition; None is unbounded\"\"\"
+    result = db.execute(text(\"\"\"
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'incidents'
+        AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    \"\"\")).fetchall()
+    ranges = []
+    lower = None
+    for name, bound in result:
+        upper = None if bound == 'MAXVALUE' else date.fromisoformat(bound.strip("'"))
+        ranges.append((name, lower, upper))
+        lower = upper
+    return ranges
+
+def expected_partitions(ranges, start, end):
+    \"\"\"Partitions overlapping the [start, end] event_date range\"\"\"
+    return {
+        name for name, lower, upper in ranges
+        if (start is None or upper is None or upper > start)
+        and (end is None or lower is None or lower <= end)
+    }
+
+def verify(db):
+    \"\"\"
+    EXPLAIN every captured router query against incidents' partitions.
+
+    Returns one result dict per statement that reads incidents, with the
+    partitions it touches, the ones it should and whether it passed.
+    \"\"\"
+    ranges = partition_ranges(db)
+    results = []
+    for query in capture_queries(db):
+        touched = set()
+        for row in explain(db, query):
+            if row.get("partitions"):
+                touched.update(row["partitions"].split(","))
+        if not touched:
+            # Only reads unpartitioned tables such as grid_aggregates
+            continue
+        expected = expected_partitions(ranges, *query["date_range"])
+        results.append({
+            "endpoint": query["endpoint"],
+            "touched": sorted(touched),
+            "unexpected": sorted(touched - expected),
+            "passed": touched <= expected
+        })
+    return results
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("ROUTER QUERY PARTITION PRUNING")
+    print("=" * 70)
+
+    db = SessionLocal()
+    try:
+        results = verify(db)
+    finally:
+        db.close()
+
+    for r in results:
+        status = "PASS" if r["passed"] else "FAIL"
+        print(f"{status}  {r['endpoint']:<34} {len(r['touched'])} partitions "
+              f"({r['touched'][0]} .. {r['touched'][-1]})")
+        if r["unexpected"]:
+            print(f"      unexpected: {', '.join(r['unexpected'])}")
+
+    failed = sum(not r["passed"] for r in results)
+    print(f"\\n{len(results) - failed}/{len(results)} queries pruned as expected")
+    sys.exit(1 if failed else 0)
+"""
+
+api_index_advisor = """#!/usr/bin/env python3
+\"\"\"
+Recommend covering indexes for the SQL the routers issue, write them as a
+migration and measure latency before and after
+\"\"\"
+import re
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import text
+from database import SessionLocal
+from router_queries import capture_queries, explain
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "infra" / "mysql" / "migrations"
+
+# Columns that cannot be part of an index without a prefix length
+UNINDEXABLE_TYPES = {'text', 'mediumtext', 'longtext', 'blob', 'mediumblob', 'longblob'}
+
+# Wider covering indexes cost more on every load than they save on reads
+MAX_INDEX_COLUMNS = 6
+
+def table_columns(db, table):
+    \"\"\"{column: data_type} of a table\"\"\"
+    result = db.execute(text(\"\"\"
+        SELECT COLUMN_NAME, DATA_TYPE
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+    \"\"\"), {"table": table}).fetchall()
+    return {name: data_type for name, data_type in result}
+
+def table_indexes(db, table):
+    \"\"\"{index name: [columns in key order]} of a table, primary key included\"\"\"
+    result = db.execute(text(\"\"\"
+        SELECT INDEX_NAME, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    \"\"\"), {"table": table}).fetchall()
+    indexes = {}
+    for name, column in result:
+        indexes.setdefault(name, []).append(column)
+    return indexes
+
+def _clause(sql, keyword, stops):
+    \"\"\"Text of one clause, from keyword up to the first of the stop keywords\"\"\"
+    match = re.search(rf"\\b{keyword}\\b(.*?)(?:\\b(?:{'|'.join(stops)})\\b|$)", sql, re.S)
+    return match.group(1) if match else ""
+
+def _mentions(clause, columns, operator=""):
+    \"\"\"Columns named in a clause (followed by operator), in order of appearance\"\"\"
+    found = []
+    # A name directly followed by "(" is a function call, e.g. COUNT( vs column count
+    for match in re.finditer(rf"\\b(\\w+)\\b(?!\\s*\\()\\s*{operator}", clause):
+        name = match.group(1)
+        if name in columns and name not in found:
+            found.append(name)
+    return found
+
+def query_shape(statement, columns):
+    \"\"\"
+    Break a single-table query into the column roles that drive index design.
+
+    Returns (table, shape) where shape lists the equality, range, GROUP BY,
+    ORDER BY and all referenced columns; table is None for statements the
+    advisor does not handle (joins, non-SELECTs).
+    \"\"\"
+    sql = " ".join(statement.lower().split())
+    tables = re.findall(r"\\b(?:from|join)\\s+(\\w+)", sql)
+    if not sql.startswith("select") or len(tables) != 1 or tables[0] not in columns:
+        return None, None
+    table = tables[0]
+    cols = columns[table]
+
+    where = _clause(sql, "where", ["group by", "order by", "limit"])
+    shape = {
+        "equality": _mentions(where, cols, r"(?:=|\\bin\\b)"),
+        "range": _mentions(where, cols, r"(?:>=|<=|>|<|\\bbetween\\b)"),
+        "group_by": _mentions(_clause(sql, "group by", ["order by", "limit"]), cols),
+        "order_by": _mentions(_clause(sql, "order by", ["limit"]), cols),
+        "referenced": _mentions(sql, cols)
+    }
+    shape["range"] = [c for c in shape["range"] if c not in shape["equality"]]
+    return table, shape
+
+def recommend_index(shape, column_types, primary_key):
+    \"\"\"
+    Columns of the index that best serves one query shape.
+
+    Equality columns lead, then a single range column or else the GROUP BY
+    or ORDER BY columns, so the index also delivers the rows in order. The
+    other referenced columns are appended so the query reads the index
+    alone. InnoDB already stores the primary key in every secondary index,
+    so those columns are not repeated. Returns (key, columns, covering).
+    \"\"\"
+    key = list(shape["equality"])
+    if shape["range"]:
+        key.append(shape["range"][0])
+    else:
+        key += [c for c in shape["group_by"] or shape["order_by"] if c not in key]
+
+    rest = [c for c in shape["referenced"] if c not in key and c not in primary_key]
+    covering = (all(column_types[c] not in UNINDEXABLE_TYPES for c in rest)
+                and len(key) + len(rest) <= MAX_INDEX_COLUMNS)
+    key = [c for c in key if column_types[c] not in UNINDEXABLE_TYPES]
+    return key, key + rest if covering else key, covering
+
+def serves(index, primary_key, key, columns):
+    \"\"\"Whether an existing index has the key columns first and holds the rest\"\"\"
+    if index[:len(key)] != key:
+        return False
+    # The clustered primary key holds every column
+    return index == primary_key or set(columns) <= set(index) | set(primary_key)
+
+def index_name(table, columns):
+    \"\"\"Deterministic index name within MySQL's 64 character limit\"\"\"
+    return f"ix_{table}_{'_'.join(columns)}"[:64]
+
+def advise(db, queries):
+    \"\"\"
+    Recommend indexes for every captured query.
+
+    Drops recommendations that an existing index (or a longer recommendation)
+    already serves with the same leading columns. Returns {index name:
+    recommendation dict}.
+    \"\"\"
+    columns, indexes, recommendations = {}, {}, {}
+    for table in {t for t in re.findall(r"\\bfrom\\s+(\\w+)", " ".join(
+            q["statement"].lower() for q in queries))}:
+        columns[table] = table_columns(db, table)
+        indexes[table] = table_indexes(db, table)
+
+    for query in queries:
+        table, shape = query_shape(query["statement"], columns)
+        if table is None:
+            continue
+        primary_key = indexes[table].get("PRIMARY", [])
+        key, index_columns, covering = recommend_index(shape, columns[table], primary_key)
+        if not index_columns:
+            continue
+        existing = [name for name, cols in indexes[table].items()
+                    if serves(cols, primary_key, key, index_columns)]
+        if existing:
+            query["served_by"] = existing[0]
+            continue
+        name = index_name(table, index_columns)
+        rec = recommendations.setdefault(name, {
+            "table": table, "columns": index_columns, "covering": covering, "endpoints": []
+        })
+        if query["endpoint"] not in rec["endpoints"]:
+            rec["endpoints"].append(query["endpoint"])
+
+    # Keep the longest of recommendations sharing leading columns
+    for name, rec in list(recommendations.items()):
+        for other in recommendations.values():
+            if (other is not rec and other["table"] == rec["table"]
+                    and len(other["columns"]) > len(rec["columns"])
+                    and other["columns"][:len(rec["columns"])] == rec["columns"]):
+                other["endpoints"] += [e for e in rec["endpoints"] if e not in other["endpoints"]]
+                del recommendations[name]
+                break
+    return recommendations
+
+def measure(db, queries, repeat=5):
+    \"\"\"
+    Median latency (ms) of every captured query, plus EXPLAIN ANALYZE's plan.
+
+    The first run warms the buffer pool and is not counted.
+    \"\"\"
+    conn = db.connection()
+    for query in queries:
+        timings = []
+        for i in range(repeat + 1):
+            start = time.perf_counter()
+            conn.exec_driver_sql(query["statement"], query["parameters"]).fetchall()
+            if i:
+                timings.append((time.perf_counter() - start) * 1000)
+        query["latency_ms"] = round(statistics.median(timings), 3)
+        rows = explain(db, query, analyze=True)
+        query["plan"] = next(iter(rows[0].values())) if rows else ""
+    return queries
+
+def write_migration(recommendations, migrations_dir=MIGRATIONS_DIR):
+    \"\"\"Write the recommended indexes as the next numbered migration file\"\"\"
+    migrations_dir.mkdir(parents=True, exist_ok=True)
+    number = len(list(migrations_dir.glob("*.sql"))) + 1
+    path = migrations_dir / f"{number:03d}_covering_indexes.sql"
+
+    lines = [f"-- Generated by api/index_advisor.py on {datetime.now():%Y-%m-%d %H:%M}", ""]
+    for name, rec in sorted(recommendations.items()):
+        lines.append(f"-- {'Covering index' if rec['covering'] else 'Index'} for "
+                     f"{', '.join(rec['endpoints'])}")
+        lines.append(f"CREATE INDEX {name} ON {rec['table']} ({', '.join(rec['columns'])});")
+        lines.append("")
+    for table in sorted({rec["table"] for rec in recommendations.values()}):
+        lines.append(f"ANALYZE TABLE {table};")
+    path.write_text("\\n".join(lines) + "\\n")
+    return path
+
+def apply_migration(db, path):
+    \"\"\"Run a migration file statement by statement\"\"\"
+    conn = db.connection()
+    for statement in path.read_text().split(";"):
+        statement = "\\n".join(l for l in statement.splitlines() if not l.startswith("--")).strip()
+        if statement:
+            conn.exec_driver_sql(statement).close()
+
+def query_keys(queries):
+    \"\"\"
+    (endpoint, statement, occurrence) of every query, so the same statement
+    from two capture runs pairs up whatever else either run issued
+    \"\"\"
+    seen = Counter()
+    keys = []
+    for query in queries:
+        key = (query["endpoint"], query["statement"])
+        keys.append(key + (seen[key],))
+        seen[key] += 1
+    return keys
+
+def print_latencies(queries, before=None):
+    \"\"\"
+    Print per-query latency, with the speedup against the same statement of
+    the before run when given; queries captured in only one run are listed
+    \"\"\"
+    if before is None:
+        for query in queries:
+            print(f"  {query['endpoint']:<34} {query['latency_ms']:>10.2f} ms")
+        return
+
+    before_by_key = dict(zip(query_keys(before), before))
+    after_keys = query_keys(queries)
+    for key, query in zip(after_keys, queries):
+        was = before_by_key.get(key)
+        if was is None:
+            print(f"  {query['endpoint']:<34} {'(after only)':>10} -> {query['latency_ms']:>9.2f} ms")
+            continue
+        was = was["latency_ms"]
+        print(f"  {query['endpoint']:<34} {was:>10.2f} -> {query['latency_ms']:>9.2f} ms"
+              f"  ({was / max(query['latency_ms'], 1e-6):.1f}x)")
+    after_keys = set(after_keys)
+    for key, query in before_by_key.items():
+        if key in after_keys:
+            continue
+        print(f"  {query['endpoint']:<34} {query['latency_ms']:>10.2f} -> {'(before only)':>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Recommend covering indexes for the router queries')
+    parser.add_argument('--apply', action='store_true',
+                        help='Apply the migration and measure latency again')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timed runs per query, the median is reported')
+    parser.add_argument('--migrations-dir', type=Path, default=MIGRATIONS_DIR)
+    parser.add_argument('--report', default=None,
+                        help='Also write the full report to this JSON file')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ROUTER QUERY INDEX ADVISOR")
+    print("=" * 70)
+
+    db = SessionLocal()
+    try:
+        queries = capture_queries(db)
+        print(f"\\nCaptured {len(queries)} queries, latency before:")
+        before = measure(db, queries, args.repeat)
+        print_latencies(before)
+
+        recommendations = advise(db, queries)
+        report = {"before": before, "recommendations": recommendations}
+        if not recommendations:
+            print("\\nEvery query is already served by an index")
+        else:
+            print(f"\\n{len(recommendations)} recommended indexes:")
+            for name, rec in recommendations.items():
+                print(f"  {name} ON {rec['table']} ({', '.join(rec['columns'])})"
+                      f"{' covering' if rec['covering'] else ''}")
+            path = write_migration(recommendations, args.migrations_dir)
+            report["migration"] = str(path)
+            print(f"Migration written to {path}")
+
+            if args.apply:
+                apply_migration(db, path)
+                after = measure(db, capture_queries(db), args.repeat)
+                report["after"] = after
+                print("\\nLatency before -> after:")
+                print_latencies(after, before)
+    finally:
+        db.close()
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\\n✅ Report saved to {args.report}")
+"""
+
+api_check_routing = """#!/usr/bin/env python3
+\"\"\"
+Show which server and pool every workload class reads from, and that a
+saturated class does not block the others.
+
+Runs against any configured servers, e.g. SQLite stand-ins:
+
+    DATABASE_URL_OVERRIDE=sqlite:///primary.db \\\\
+    REPLICA_URLS='["sqlite:///replica1.db", "sqlite:///replica2.db"]' \\\\
+    python check_routing.py
+\"\"\"
+import asyncio
+from sqlalchemy import text
+from database import (WORKLOADS, POOL_SIZES, async_engine, read_engines, dispose_engines,
+                      get_db, get_analytics_db, get_export_db, get_write_db)
+
+DEPENDENCIES = {
+    "interactive": get_db,
+    "analytics": get_analytics_db,
+    "export": get_export_db,
+    "write": get_write_db
+}
+
+def _url(engine):
+    \"\"\"Engine URL without its password\"\"\"
+    return engine.url.render_as_string(hide_password=True)
+
+async def served_by(dependency):
+    \"\"\"URL of the server a dependency's session ran a query on\"\"\"
+    sessions = dependency()
+    db = await anext(sessions)
+    try:
+        await db.execute(text("SELECT 1"))
+        return _url(db.get_bind())
+    finally:
+        await sessions.aclose()
+
+async def saturate(workload):
+    \"\"\"
+    Check out every connection of one workload class, then check the others still connect.
+
+    Returns the other classes with the server that served them.
+    \"\"\"
+    # pool_size plus its max_overflow of twice that, see _pool_options
+    held = [await pool_engine.connect()
+            for pool_engine in read_engines(workload)
+            for _ in range(POOL_SIZES[workload] * 3)]
+    try:
+        return {other: await served_by(dependency)
+                for other, dependency in DEPENDENCIES.items() if other != workload}
+    finally:
+        for conn in held:
+            await conn.close()
+
+async def main():
+    print("=" * 70)
+    print("DATABASE ROUTING CHECK")
+    print("=" * 70)
+
+    print(f"\\nPrimary: {_url(async_engine)}")
+    for workload in WORKLOADS:
+        for pool_engine in read_engines(workload):
+            print(f"  {workload:<12} pool {POOL_SIZES[workload]:>3} + "
+                  f"{POOL_SIZES[workload] * 2:>3} overflow  {_url(pool_engine)}")
+
+    print("\\nSessions per dependency (two calls each, to show round-robin):")
+    for name, dependency in DEPENDENCIES.items():
+        print(f"  {name:<12} {await served_by(dependency)}")
+        print(f"  {name:<12} {await served_by(dependency)}")
+
+    print("\\nWith every export connection checked out:")
+    for workload, url in (await saturate("export")).items():
+        print(f"  {workload:<12} still served by {url}")
+
+    await dispose_engines()
+
+if __name__ == "__main__":
+    asyncio.run(main())
+"""
+
+api_benchmark_concurrency = """#!/usr/bin/env python3
+\"\"\"
+Requests/sec of a running API at increasing numbers of concurrent clients.
+
+Run it once against the API before a change and once after, each with its
+own --label, then compare the two reports:
+
+    python benchmark_concurrency.py --label before --report before.json
+    python benchmark_concurrency.py --label after --report after.json
+    python benchmark_concurrency.py --compare before.json after.json
+
+Run the client on other cores than the server (taskset, or another host),
+otherwise both compete for the same CPUs at 1000 clients.
+
+Every endpoint in the mix but health is served from the response cache
+(api/cache.py), so start the API with CACHE_BACKEND=none to measure the
+database path; the benchmark refuses to run against a cache unless
+--with-cache is given, and records the server's hits and misses per level.
+\"\"\"
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import statistics
+from pathlib import Path
+from datetime import datetime
+import httpx
+
+REPORT_DIR = Path(__file__).parent.parent / "data" / "benchmarks"
+
+CLIENTS = (50, 200, 1000)
+
+def request_mix(grid_id):
+    \"\"\"(method, path, json body) of every request a client cycles through\"\"\"
+    return [
+        ("POST", f"/api/grids/{grid_id}/forecast", {"grid_id": grid_id, "days": 7}),
+        ("POST", "/api/grids/nearby", {"latitude": 41.88, "longitude": -87.63, "radius_km": 1.0}),
+        ("GET", "/api/stats/summary?days=30", None),
+        ("GET", "/api/stats/by-hour?days=30", None),
+        ("GET", "/api/health", None)
+    ]
+
+async def client(http, mix, offset, deadline, latencies, errors):
+    \"\"\"One client: send the mix in a loop, each request after the previous answer\"\"\"
+    i = offset
+    while time.perf_counter() < deadline:
+        method, path, body = mix[i % len(mix)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, path, json=body)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+def cache_stats(url):
+    \"\"\"The server's /api/cache/stats, or None when it has no response cache\"\"\"
+    try:
+        response = httpx.get(f"{url}/api/cache/stats", timeout=10.0)
+    except httpx.HTTPError:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+async def run_level(url, clients, duration, warmup, mix):
+    \"\"\"Hold clients concurrent connections for duration seconds after warmup\"\"\"
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as http:
+        if warmup:
+            await asyncio.gather(*(client(http, mix, i, time.perf_counter() + warmup, [], [])
+                                   for i in range(clients)))
+        latencies, errors = [], []
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(client(http, mix, i, deadline, latencies, errors)
+                               for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 2),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 1),
+        'p95_ms': round(quantiles[94] * 1000, 1),
+        'p99_ms': round(quantiles[98] * 1000, 1)
+    }
+
+def compare(before_file, after_file):
+    \"\"\"Print requests/sec and p95 of two reports side by side\"\"\"
+    with open(before_file) as f:
+        before_report = json.load(f)
+    before = {run['clients']: run for run in before_report['runs']}
+    with open(after_file) as f:
+        after_report = json.load(f)
+    after = {run['clients']: run for run in after_report['runs']}
+
+    backends = (before_report.get('cache_backend', 'none'), after_report.get('cache_backend', 'none'))
+    if backends != ('none', 'none'):
+        print(f"⚠️  Response cache enabled (before: {backends[0]}, after: {backends[1]}); "
+              "the numbers include cache hits")
+    print(f"{'clients':>8} {'before req/s':>13} {'after req/s':>12} {'speedup':>8} "
+          f"{'before p95':>11} {'after p95':>10}")
+    for clients in sorted(before.keys() & after.keys()):
+        b, a = before[clients], after[clients]
+        speedup = a['requests_per_sec'] / b['requests_per_sec'] if b['requests_per_sec'] else float('nan')
+        print(f"{clients:>8} {b['requests_per_sec']:>13,.1f} {a['requests_per_sec']:>12,.1f} "
+              f"{speedup:>7.2f}x {b['p95_ms']:>9,.1f}ms {a['p95_ms']:>8,.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark API throughput under concurrent clients')
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--clients', default=','.join(map(str, CLIENTS)),
+                        help='Comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=20.0,
+                        help='Measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=3.0,
+                        help='Unmeasured seconds per level, to fill the connection pools')
+    parser.add_argument('--grid-id', default='dp3wjz',
+                        help='Grid the forecast requests ask for')
+    parser.add_argument('--label', default='run',
+                        help='Name of the server build, e.g. before or after')
+    parser.add_argument('--report', default=None,
+                        help='Report path (default data/benchmarks/api_<label>_<timestamp>.json)')
+    parser.add_argument('--with-cache', action='store_true',
+                        help='Run even when the API has a response cache enabled')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Compare two reports instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    stats = cache_stats(args.url)
+    cache_backend = stats['backend'] if stats else 'none'
+    if cache_backend != 'none' and not args.with_cache:
+        print(f"❌ The API serves responses from its {cache_backend} cache; restart it with "
+              "CACHE_BACKEND=none to measure the database path, or pass --with-cache")
+        sys.exit(1)
+
+    print("=" * 70)
+    print(f"API CONCURRENCY BENCHMARK ({args.label})")
+    print("=" * 70)
+
+    mix = request_mix(args.grid_id)
+    runs = []
+    for clients in map(int, args.clients.split(',')):
+        before = cache_stats(args.url)
+        run = asyncio.run(run_level(args.url, clients, args.duration, args.warmup, mix))
+        after = cache_stats(args.url)
+        if before and after:
+            run['cache_hits'] = after['hits'] - before['hits']
+            run['cache_misses'] = after['misses'] - before['misses']
+        runs.append(run)
+        print(f"  {clients:>5} clients  {run['requests_per_sec']:>10,.1f} req/s  "
+              f"p50 {run['p50_ms']:>8,.1f}ms  p95 {run['p95_ms']:>8,.1f}ms  "
+              f"p99 {run['p99_ms']:>8,.1f}ms  errors {run['errors']}"
+              + (f"  cache hits {run['cache_hits']}" if 'cache_hits' in run else ""))
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'label': args.label,
+        'url': args.url,
+        'cache_backend': cache_backend,
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'runs': runs
+    }
+
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    report_file = args.report or REPORT_DIR / f"api_{args.label}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\\n✅ Report saved to {report_file}")
 """
 
 print("✅ API Routers Generated:")
@@ -375,3 +1411,8 @@ print("   - api/main.py")
 print("   - api/routers/health.py")
 print("   - api/routers/predictions.py")
 print("   - api/routers/historical.py")
+print("   - api/router_queries.py")
+print("   - api/verify_partitions.py")
+print("   - api/index_advisor.py")
+print("   - api/check_routing.py")
+print("   - api/benchmark_concurrency.py")
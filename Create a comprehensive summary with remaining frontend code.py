@@ -545,9 +545,9 @@ FILE: infra/mysql/init.sql
 CREATE DATABASE IF NOT EXISTS chicago_crime;
 USE chicago_crime;
 
--- Create incidents table with partitioning
+-- Create incidents table with monthly partitioning
 CREATE TABLE IF NOT EXISTS incidents (
-  incident_id BIGINT PRIMARY KEY,
+  incident_id BIGINT NOT NULL,
   case_number VARCHAR(50),
   iucr VARCHAR(10),
   primary_type VARCHAR(100),
@@ -561,7 +561,7 @@ CREATE TABLE IF NOT EXISTS incidents (
   latitude DOUBLE,
   longitude DOUBLE,
   event_ts DATETIME,
-  event_date DATE,
+  event_date DATE NOT NULL,
   event_hour TINYINT,
   day_of_week TINYINT,
   is_weekend TINYINT,
@@ -569,14 +569,14 @@ CREATE TABLE IF NOT EXISTS incidents (
   domestic BOOLEAN DEFAULT FALSE,
   reported_year SMALLINT,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  -- The partitioning column must be part of every unique key
+  PRIMARY KEY (incident_id, event_date)
 ) ENGINE=InnoDB
-PARTITION BY RANGE (YEAR(event_date)) (
-  PARTITION p2020 VALUES LESS THAN (2021),
-  PARTITION p2021 VALUES LESS THAN (2022),
-  PARTITION p2022 VALUES LESS THAN (2023),
-  PARTITION p2023 VALUES LESS THAN (2024),
-  PARTITION p2024 VALUES LESS THAN (2025),
+-- pmax is split into monthly partitions (p200101, p200102, ...) by
+-- etl/partitions.py, which the loaders run before every load
+PARTITION BY RANGE COLUMNS (event_date) (
+  PARTITION p_archive VALUES LESS THAN ('2001-01-01'),
   PARTITION pmax VALUES LESS THAN (MAXVALUE)
 );
 
@@ -585,6 +585,8 @@ CREATE INDEX ix_grid_date_hour ON incidents (grid_id, event_date, event_hour);
 CREATE INDEX ix_geo ON incidents (geohash6, geohash8);
 CREATE INDEX ix_type_date ON incidents (primary_type, event_date);
 CREATE INDEX ix_district ON incidents (district);
+-- Keyset order of the streaming export (/historical/export)
+CREATE INDEX ix_event_ts ON incidents (event_ts, incident_id);
 
 -- Create grid aggregates table
 CREATE TABLE IF NOT EXISTS grid_aggregates (
@@ -592,6 +594,7 @@ CREATE TABLE IF NOT EXISTS grid_aggregates (
   date DATE,
   hour TINYINT,
   count INT DEFAULT 0,
+  arrests INT DEFAULT 0,
   rolling_1d INT DEFAULT 0,
   rolling_7d INT DEFAULT 0,
   rolling_30d INT DEFAULT 0,
@@ -599,19 +602,86 @@ CREATE TABLE IF NOT EXISTS grid_aggregates (
 ) ENGINE=InnoDB;
 
 CREATE INDEX ix_grid_agg_date ON grid_aggregates (grid_id, date);
+-- Covering index for the city-wide stats over recent days
+CREATE INDEX ix_grid_agg_day ON grid_aggregates (date, hour, count, arrests);
 
--- Create predictions table
-CREATE TABLE IF NOT EXISTS predictions (
-  id INT PRIMARY KEY AUTO_INCREMENT,
+-- Create daily stats cube for the city-wide dashboard statistics
+CREATE TABLE IF NOT EXISTS stats_cube (
+  date DATE,
+  hour TINYINT,
+  district INT,
+  primary_type VARCHAR(100),
+  count INT DEFAULT 0,
+  arrests INT DEFAULT 0,
+  PRIMARY KEY (date, hour, district, primary_type)
+) ENGINE=InnoDB;
+
+-- Create daily HyperLogLog sketches (4096 one-byte registers each) of
+-- distinct grids and crime types, merged for any date range
+CREATE TABLE IF NOT EXISTS daily_sketches (
+  date DATE PRIMARY KEY,
+  grids BLOB,
+  crime_types BLOB
+) ENGINE=InnoDB;
+
+-- Create grids dimension: every geohash6 cell of the city bounding box
+CREATE TABLE IF NOT EXISTS grids (
+  grid_id VARCHAR(32) PRIMARY KEY,
+  center_lat DOUBLE,
+  center_lon DOUBLE,
+  lat_min DOUBLE,
+  lat_max DOUBLE,
+  lon_min DOUBLE,
+  lon_max DOUBLE,
+  parent_id VARCHAR(32),
+  children VARCHAR(255),
+  lifetime_count INT DEFAULT 0,
+  recent_count INT DEFAULT 0,
+  last_event_date DATE,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+-- Ring 0 is the cell itself, ring 1 its 8 adjacent cells
+CREATE TABLE IF NOT EXISTS grid_neighbors (
   grid_id VARCHAR(32),
-  prediction_date DATE,
-  prediction_hour TINYINT,
+  neighbor_id VARCHAR(32),
+  ring TINYINT,
+  PRIMARY KEY (grid_id, neighbor_id)
+) ENGINE=InnoDB;
+
+-- Create data version table: bumped by every ETL commit that changes served
+-- data, so API response caches know when to drop their entries
+CREATE TABLE IF NOT EXISTS data_version (
+  id TINYINT PRIMARY KEY,
+  version BIGINT NOT NULL,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO data_version (id, version) VALUES (1, 0);
+
+-- Create predictions table: the live batch forecast run only, swapped in
+-- whole by models/batch_forecast.py, so a grid's forecast is one key range
+CREATE TABLE IF NOT EXISTS predictions (
+  grid_id VARCHAR(32) NOT NULL,
+  prediction_date DATE NOT NULL,
+  prediction_hour TINYINT NOT NULL,
   predicted_count FLOAT,
   confidence FLOAT,
   model_version VARCHAR(50),
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  INDEX ix_pred_grid (grid_id),
-  INDEX ix_pred_date (prediction_date)
+  PRIMARY KEY (grid_id, prediction_date, prediction_hour)
+) ENGINE=InnoDB;
+
+-- Create prediction runs table: one row per batch forecast run
+CREATE TABLE IF NOT EXISTS prediction_runs (
+  run_id INT PRIMARY KEY AUTO_INCREMENT,
+  model_version VARCHAR(50) NOT NULL,
+  first_date DATE NOT NULL,
+  horizon_days SMALLINT NOT NULL,
+  row_count INT,
+  status VARCHAR(10) NOT NULL,  -- staged, live, retired (kept as predictions_run_<id>), pruned, failed
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  INDEX ix_run_status (status, run_id)
 ) ENGINE=InnoDB;
 
 -- Create user for application
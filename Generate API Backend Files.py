@@ -3,16 +3,23 @@
 
 api_requirements = """fastapi==0.115.0
 uvicorn[standard]==0.32.0
-sqlalchemy==2.0.35
+sqlalchemy[asyncio]==2.0.35
 pymysql==1.1.1
+asyncmy==0.2.9
+aiosqlite==0.20.0
+httpx==0.27.2
+pytest==8.3.3
+redis==5.1.1
 python-dotenv==1.0.1
 pydantic==2.9.2
 pydantic-settings==2.5.2
+orjson==3.10.7
 python-multipart==0.0.12
 python-jose[cryptography]==3.3.0
 passlib[bcrypt]==1.7.4
 pandas==2.2.3
 numpy==2.1.2
+pyarrow==17.0.0
 lightgbm==4.5.0
 xgboost==2.1.1
 shap==0.46.0
@@ -46,6 +53,7 @@ CMD ["uvicorn", "main:app", "--host", "0.0.0.0", "--port", "8000"]
 
 api_config = """from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     # Database
@@ -55,6 +63,21 @@ class Settings(BaseSettings):
     mysql_user: str = "root"
     mysql_password: str = "password"
     
+    # Read replicas and workload pools; database_url_override (e.g. sqlite:///primary.db)
+    # replaces the MySQL primary, replica_urls is a JSON list of URLs
+    database_url_override: Optional[str] = None
+    replica_urls: list = []
+    interactive_pool_size: int = 10
+    analytics_pool_size: int = 5
+    export_pool_size: int = 2
+    
+    # Response cache: "memory" (per-process LRU), "redis" (shared, at redis_url) or "none"
+    cache_backend: str = "memory"
+    cache_ttl_seconds: int = 300
+    cache_max_entries: int = 10000
+    cache_version_check_seconds: float = 5.0
+    redis_url: str = "redis://localhost:6379/0"
+    
     # API
     api_host: str = "0.0.0.0"
     api_port: int = 8000
@@ -73,6 +96,8 @@ class Settings(BaseSettings):
 
     @property
     def database_url(self) -> str:
+        if self.database_url_override:
+            return self.database_url_override
         return f"mysql+pymysql://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}"
 
 @lru_cache()
@@ -80,45 +105,136 @@ def get_settings() -> Settings:
     return Settings()
 """
 
-api_database = """from sqlalchemy import create_engine
+api_database = """import itertools
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import get_settings
 
 settings = get_settings()
 
-# Create engine
+# Workload classes, each with its own connection pools so a slow class
+# (e.g. a 10k-row export) can never take the connections another one needs
+WORKLOADS = ("interactive", "analytics", "export")
+
+POOL_SIZES = {
+    "interactive": settings.interactive_pool_size,
+    "analytics": settings.analytics_pool_size,
+    "export": settings.export_pool_size
+}
+
+# Async drivers for the configured URLs: asyncmy for MySQL, aiosqlite for SQLite stand-ins
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+asyncmy",
+    "sqlite": "sqlite+aiosqlite"
+}
+
+def async_url(url):
+    \"\"\"The same server through its async driver\"\"\"
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+def _pool_options(pool_size):
+    \"\"\"Bounded pool with twice its size as overflow\"\"\"
+    return dict(
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=pool_size,
+        max_overflow=pool_size * 2
+    )
+
+def _create_engine(url, pool_size):
+    \"\"\"Async engine with its own bounded pool; SQLite files work as local stand-ins\"\"\"
+    return create_async_engine(async_url(url), **_pool_options(pool_size))
+
+def _read_urls(workload):
+    \"\"\"
+    Servers a workload class reads from.
+
+    Without replicas everything reads the primary. With replicas,
+    interactive and analytics reads are spread over all of them, and
+    exports are pinned to the last one so long scans stay on one server.
+    \"\"\"
+    replicas = list(settings.replica_urls)
+    if not replicas:
+        return [settings.database_url]
+    if workload == "export":
+        return replicas[-1:]
+    return replicas
+
+# Sync engine on the primary: schema creation and the EXPLAIN/maintenance scripts
+connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
 engine = create_engine(
     settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=10,
-    max_overflow=20
+    connect_args=connect_args,
+    **_pool_options(settings.interactive_pool_size)
 )
 
-# Create session
+# Async engines serve the routers: the primary takes writes
+async_engine = _create_engine(settings.database_url, settings.interactive_pool_size)
+
+_read_engines = {
+    workload: [_create_engine(url, POOL_SIZES[workload]) for url in _read_urls(workload)]
+    for workload in WORKLOADS
+}
+_next_engine = {workload: itertools.cycle(engines) for workload, engines in _read_engines.items()}
+
+# Create sessions; async sessions keep loaded rows usable after commit
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+AsyncReadSession = async_sessionmaker(autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+def read_engines(workload):
+    \"\"\"Async engines (one per server) behind a workload class\"\"\"
+    return _read_engines[workload]
+
+async def dispose_engines():
+    \"\"\"Close every async pool, e.g. on shutdown or before leaving an event loop\"\"\"
+    await async_engine.dispose()
+    for engines in _read_engines.values():
+        for read_engine in engines:
+            await read_engine.dispose()
+
+def read_session(workload):
+    \"\"\"AsyncSession on the next server of a workload class\"\"\"
+    return AsyncReadSession(bind=next(_next_engine[workload]))
+
+def _session_dependency(workload):
+    \"\"\"FastAPI dependency yielding an AsyncSession for one workload class\"\"\"
+    async def get_session():
+        async with read_session(workload) as db:
+            yield db
+    get_session.__name__ = f"get_{workload}_db"
+    return get_session
+
+# Dependency to get DB session: latency-sensitive reads (forecast, nearby, health)
+get_db = _session_dependency("interactive")
+
+# Aggregate statistics over up to a year of rollups
+get_analytics_db = _session_dependency("analytics")
+
+# Large row dumps such as /historical
+get_export_db = _session_dependency("export")
+
+# Dependency for writes, always on the primary
+async def get_write_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 """
 
-api_models = """from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Date, SmallInteger, TIMESTAMP, Index, Text
+api_models = """from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, Date, SmallInteger, TIMESTAMP, Index, Text, LargeBinary
 from sqlalchemy.sql import func
 from database import Base
 
 class Incident(Base):
     __tablename__ = "incidents"
     
-    # Primary Key
+    # Primary Key (incident_id, event_date): the table is partitioned by event_date
     incident_id = Column(Integer, primary_key=True, index=True)
     
     # Crime Information
@@ -139,7 +255,7 @@ class Incident(Base):
     
     # Temporal
     event_ts = Column(DateTime, index=True)
-    event_date = Column(Date, index=True)
+    event_date = Column(Date, primary_key=True, index=True)
     event_hour = Column(SmallInteger)
     day_of_week = Column(SmallInteger)
     is_weekend = Column(SmallInteger)
@@ -158,6 +274,7 @@ class Incident(Base):
         Index('ix_grid_date_hour', 'grid_id', 'event_date', 'event_hour'),
         Index('ix_geo', 'geohash6', 'geohash8'),
         Index('ix_type_date', 'primary_type', 'event_date'),
+        Index('ix_event_ts', 'event_ts', 'incident_id'),
     )
 
 class GridAggregate(Base):
@@ -167,28 +284,93 @@ class GridAggregate(Base):
     date = Column(Date, primary_key=True)
     hour = Column(SmallInteger, primary_key=True)
     count = Column(Integer, default=0)
+    arrests = Column(Integer, default=0)
     rolling_1d = Column(Integer, default=0)
     rolling_7d = Column(Integer, default=0)
     rolling_30d = Column(Integer, default=0)
     
     __table_args__ = (
         Index('ix_grid_agg_date', 'grid_id', 'date'),
+        Index('ix_grid_agg_day', 'date', 'hour', 'count', 'arrests'),
     )
 
+class StatsCube(Base):
+    __tablename__ = "stats_cube"
+    
+    date = Column(Date, primary_key=True)
+    hour = Column(SmallInteger, primary_key=True)
+    district = Column(Integer, primary_key=True)  # 0 when unknown
+    primary_type = Column(String(100), primary_key=True)  # '' when unknown
+    count = Column(Integer, default=0)
+    arrests = Column(Integer, default=0)
+
+class DailySketch(Base):
+    __tablename__ = "daily_sketches"
+    
+    date = Column(Date, primary_key=True)
+    grids = Column(LargeBinary)  # HyperLogLog registers, see sketches.py
+    crime_types = Column(LargeBinary)
+
+class Grid(Base):
+    __tablename__ = "grids"
+    
+    grid_id = Column(String(32), primary_key=True)
+    center_lat = Column(Float)
+    center_lon = Column(Float)
+    lat_min = Column(Float)
+    lat_max = Column(Float)
+    lon_min = Column(Float)
+    lon_max = Column(Float)
+    parent_id = Column(String(32))
+    children = Column(String(255))  # comma-separated child cells with incidents
+    lifetime_count = Column(Integer, default=0)
+    recent_count = Column(Integer, default=0)
+    last_event_date = Column(Date)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+class GridNeighbor(Base):
+    __tablename__ = "grid_neighbors"
+    
+    grid_id = Column(String(32), primary_key=True)
+    neighbor_id = Column(String(32), primary_key=True)
+    ring = Column(SmallInteger)  # 0 for the cell itself, 1 for adjacent cells
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+    
+    id = Column(SmallInteger, primary_key=True)  # a single row, id 1
+    version = Column(BigInteger, nullable=False)  # bumped by every ETL commit
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
 class Prediction(Base):
     __tablename__ = "predictions"
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    grid_id = Column(String(32), index=True)
-    prediction_date = Column(Date, index=True)
-    prediction_hour = Column(SmallInteger)
+    # Only the live batch run; the primary key is the per-grid lookup
+    grid_id = Column(String(32), primary_key=True)
+    prediction_date = Column(Date, primary_key=True)
+    prediction_hour = Column(SmallInteger, primary_key=True)
     predicted_count = Column(Float)
     confidence = Column(Float)
     model_version = Column(String(50))
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+class PredictionRun(Base):
+    __tablename__ = "prediction_runs"
+    
+    run_id = Column(Integer, primary_key=True, autoincrement=True)
+    model_version = Column(String(50), nullable=False)
+    first_date = Column(Date, nullable=False)
+    horizon_days = Column(SmallInteger, nullable=False)
+    row_count = Column(Integer)
+    status = Column(String(10), nullable=False)  # staged, live, retired, pruned, failed
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_run_status', 'status', 'run_id'),
+    )
 """
 
-api_schemas = """from pydantic import BaseModel, Field
+api_schemas = """from pydantic import BaseModel, Field, model_validator
 from datetime import datetime, date
 from typing import Optional, List
 
@@ -220,6 +402,37 @@ class ForecastResponse(BaseModel):
     hour: int
     predicted_count: float
     confidence: float
+    model_version: Optional[str] = None
+
+class BoundingBox(BaseModel):
+    lat_min: float = Field(..., ge=41.6, le=42.1)
+    lat_max: float = Field(..., ge=41.6, le=42.1)
+    lon_min: float = Field(..., ge=-87.9, le=-87.5)
+    lon_max: float = Field(..., ge=-87.9, le=-87.5)
+
+class BulkForecastRequest(BaseModel):
+    # Either grid_ids or bbox (every grid with incidents whose centroid is inside)
+    grid_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=5000)
+    bbox: Optional[BoundingBox] = None
+    days: int = Field(default=1, ge=1, le=30)
+
+    @model_validator(mode="after")
+    def one_selector(self):
+        if (self.grid_ids is None) == (self.bbox is None):
+            raise ValueError("Give either grid_ids or bbox")
+        return self
+
+class BulkForecastResponse(BaseModel):
+    # Columnar: one entry per grid in grid_ids/center_lat/center_lon, and one
+    # row of days * 24 hourly counts from start_date 00:00 in predicted_count
+    start_date: date
+    days: int
+    model_version: str
+    grid_ids: List[str]
+    center_lat: List[float]
+    center_lon: List[float]
+    predicted_count: List[List[float]]
+    missing: List[str] = []
 
 class NearbyRequest(BaseModel):
     latitude: float = Field(..., ge=41.6, le=42.1)
@@ -240,6 +453,17 @@ class HistoricalRequest(BaseModel):
     crime_type: Optional[str] = None
     limit: int = Field(default=1000, le=10000)
 
+class ExportRequest(BaseModel):
+    start_date: date
+    end_date: date
+    grid_id: Optional[str] = None
+    crime_type: Optional[str] = None
+    format: str = Field(default="ndjson", pattern="^(ndjson|csv|arrow)$")
+    # Rows per page; None streams the whole range in one response
+    page_size: Optional[int] = Field(default=None, ge=1)
+    # X-Next-Cursor of the previous page
+    cursor: Optional[str] = None
+
 class ExplainRequest(BaseModel):
     grid_id: str
     date: date
@@ -260,6 +484,801 @@ class HealthResponse(BaseModel):
     version: str
 """
 
+api_sketches = """\"\"\"
+Merge and estimate the daily HyperLogLog sketches written by etl/sketches.py
+\"\"\"
+import math
+import numpy as np
+
+def merge(sketches):
+    \"\"\"Union of sketches: the register-wise maximum\"\"\"
+    sketches = [s for s in sketches if s]
+    if not sketches:
+        return None
+    return np.max(np.stack([np.frombuffer(s, dtype=np.uint8) for s in sketches]), axis=0)
+
+def standard_error(registers):
+    \"\"\"Relative standard error of an estimate: 1.04 / sqrt(m), 1.6% for 4096 registers\"\"\"
+    return 1.04 / math.sqrt(len(registers))
+
+def estimate(registers):
+    \"\"\"
+    Distinct count of a (merged) sketch.
+
+    About 68% of estimates fall within one standard error of the true count
+    and 95% within two. Small counts use linear counting over the empty
+    registers, which is nearly exact.
+    \"\"\"
+    if registers is None:
+        return 0
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    empty = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and empty:
+        return round(m * math.log(m / empty))
+    return round(raw)
+"""
+
+api_spatial = """\"\"\"
+In-process ball tree over grid centroids for radius searches
+\"\"\"
+import asyncio
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+from sqlalchemy import text
+from cache import response_cache
+
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    \"\"\"Great-circle distance in km between points given in degrees\"\"\"
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+class GridIndex:
+    \"\"\"Haversine ball tree over the centroids of the grids dimension\"\"\"
+
+    def __init__(self, grids):
+        self.grids = grids.reset_index(drop=True)
+        # BallTree needs at least one point; an empty grids table just finds nothing
+        self.tree = None
+        self.max_reach_km = 0.0
+        if len(self.grids):
+            self.tree = BallTree(np.radians(self.grids[['center_lat', 'center_lon']].to_numpy()),
+                                 metric='haversine')
+            # Farthest any point of a cell is from its centroid
+            self.max_reach_km = float(haversine_km(
+                self.grids['center_lat'], self.grids['center_lon'],
+                self.grids['lat_max'], self.grids['lon_max']).max())
+
+    def within(self, latitude, longitude, radius_km):
+        \"\"\"
+        Grids whose cell comes within radius_km of the point, nearest centroid first.
+
+        The tree returns candidate centroids up to one cell reach beyond the
+        radius, then each candidate is kept if the closest point of its
+        bounds is inside the radius, so the cell containing the point always
+        matches. distance_km is measured to the centroid.
+        \"\"\"
+        if self.tree is None:
+            return self.grids.assign(distance_km=pd.Series(dtype=float))
+        point = np.radians([[latitude, longitude]])
+        positions, distances = self.tree.query_radius(
+            point, r=(radius_km + self.max_reach_km) / EARTH_RADIUS_KM,
+            return_distance=True, sort_results=True)
+        found = self.grids.iloc[positions[0]].copy()
+        found['distance_km'] = distances[0] * EARTH_RADIUS_KM
+
+        closest_lat = np.clip(latitude, found['lat_min'], found['lat_max'])
+        closest_lon = np.clip(longitude, found['lon_min'], found['lon_max'])
+        reach = haversine_km(latitude, longitude, closest_lat, closest_lon)
+        return found[reach <= radius_km]
+
+_index = None
+_built_version = None
+_lock = asyncio.Lock()
+
+def reset_grid_index():
+    \"\"\"Drop the index; the next request rebuilds it\"\"\"
+    global _index, _built_version
+    _index = None
+    _built_version = None
+
+async def get_grid_index(db):
+    \"\"\"
+    Build the index from the grids table on first use and again whenever
+    the data version changes, i.e. after every ETL commit, so cached
+    nearby results under a new version never come from the old grids.
+    \"\"\"
+    global _index, _built_version
+    version = await response_cache.data_version(db)
+    if _index is None or version != _built_version:
+        # One request rebuilds; the others wait for it instead of querying too
+        async with _lock:
+            if _index is None or version != _built_version:
+                rows = (await db.execute(text(\"\"\"
+                    SELECT grid_id, center_lat, center_lon, lat_min, lat_max, lon_min, lon_max,
+                        recent_count
+                    FROM grids
+                \"\"\"))).fetchall()
+                grids = pd.DataFrame(rows, columns=['grid_id', 'center_lat', 'center_lon', 'lat_min',
+                                                    'lat_max', 'lon_min', 'lon_max', 'recent_count'])
+                _index = GridIndex(grids)
+                _built_version = version
+    return _index
+"""
+
+api_cache = """\"\"\"
+Response cache for the read endpoints: an in-process LRU or a shared Redis,
+keyed on normalized request parameters and the ETL's data version
+\"\"\"
+import json
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+from sqlalchemy import text
+from config import get_settings
+
+class LRUCache:
+    \"\"\"In-process cache of at most max_entries, least recently used out first\"\"\"
+
+    name = "memory"
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self):
+        self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+class RedisCache:
+    \"\"\"
+    Cache shared by every API process on a Redis-compatible server.
+
+    Entries expire after ttl; eviction under memory pressure is the
+    server's maxmemory-policy (allkeys-lru).
+    \"\"\"
+
+    name = "redis"
+
+    def __init__(self, url, ttl):
+        # Optional dependency, only needed with cache_backend=redis
+        import redis.asyncio as redis
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.evictions = None
+
+    async def get(self, key):
+        value = await self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    async def set(self, key, value):
+        await self.client.set(key, json.dumps(value), ex=self.ttl)
+
+    async def clear(self):
+        # Keys carry the data version, so older entries are never read again
+        # and expire on their own; other processes may still be on it
+        pass
+
+    def size(self):
+        return None
+
+def normalize(params):
+    \"\"\"JSON of the parameters with sorted keys, so equal requests share a key\"\"\"
+    return json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+class ResponseCache:
+    \"\"\"
+    Cache-aside helper for the routers, with hit/miss counts per endpoint.
+
+    Keys hold the data_version row bumped by every ETL commit, checked at
+    most every version_check_seconds, so a load invalidates all cached
+    responses, and today's date, since "last N days" and forecast windows
+    move at midnight. Backend errors count as misses.
+    \"\"\"
+
+    def __init__(self, backend, version_check_seconds):
+        self.backend = backend
+        self.version_check_seconds = version_check_seconds
+        self.version = None
+        self.invalidations = 0
+        self.errors = 0
+        self.hits = Counter()
+        self.misses = Counter()
+        self._checked_at = 0.0
+
+    async def data_version(self, db):
+        \"\"\"Latest data version, re-read from MySQL once version_check_seconds have passed\"\"\"
+        if self.version is None or time.monotonic() - self._checked_at > self.version_check_seconds:
+            result = await db.execute(text("SELECT version FROM data_version WHERE id = 1"))
+            version = result.scalar() or 0
+            self._checked_at = time.monotonic()
+            if self.version is not None and version != self.version:
+                self.invalidations += 1
+                # The version is also read with caching off (e.g. by the grid index)
+                if self.backend is not None:
+                    await self.backend.clear()
+            self.version = version
+        return self.version
+
+    async def lookup(self, db, endpoint, **params):
+        \"\"\"(key, cached value or None) for one call of an endpoint\"\"\"
+        if self.backend is None:
+            return None, None
+        version = await self.data_version(db)
+        key = f"crime-api:{endpoint}:{version}:{date.today().isoformat()}:{normalize(params)}"
+        try:
+            value = await self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses[endpoint] += 1
+        else:
+            self.hits[endpoint] += 1
+        return key, value
+
+    async def store(self, key, value):
+        \"\"\"Cache a JSON-compatible response under a key from lookup()\"\"\"
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(key, value)
+        except Exception:
+            self.errors += 1
+
+    def stats(self):
+        \"\"\"Hit/miss counts and rates per endpoint, plus backend state\"\"\"
+        endpoints = {}
+        for endpoint in sorted(self.hits.keys() | self.misses.keys()):
+            hits, misses = self.hits[endpoint], self.misses[endpoint]
+            endpoints[endpoint] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4)
+            }
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "backend": self.backend.name if self.backend else "none",
+            "entries": self.backend.size() if self.backend else 0,
+            "evictions": self.backend.evictions if self.backend else 0,
+            "data_version": self.version,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "endpoints": endpoints
+        }
+
+def _create_backend(settings):
+    \"\"\"Backend named by cache_backend; None disables caching\"\"\"
+    if settings.cache_backend == "redis":
+        return RedisCache(settings.redis_url, settings.cache_ttl_seconds)
+    if settings.cache_backend == "memory":
+        return LRUCache(settings.cache_max_entries, settings.cache_ttl_seconds)
+    return None
+
+settings = get_settings()
+response_cache = ResponseCache(_create_backend(settings), settings.cache_version_check_seconds)
+"""
+
+api_forecast_store = """\"\"\"
+Memory-mapped forecast store published by models/batch_forecast.py
+\"\"\"
+import os
+import json
+import time
+import numpy as np
+from datetime import date
+
+STORE_DIR = os.getenv("FORECAST_STORE_DIR", "../models/forecasts/")
+
+# How often a worker looks for a newly published run
+CHECK_SECONDS = 5
+
+class ForecastStore:
+    \"\"\"
+    One run as a read-only (grid x hour slot) float32 array.
+
+    The array is memory-mapped, so every uvicorn worker shares the same
+    pages through the OS page cache instead of holding its own copy.
+    \"\"\"
+
+    def __init__(self, pointer, values):
+        self.values = values
+        self.run_id = pointer['run_id']
+        self.model_version = pointer['model_version']
+        self.first_date = date.fromisoformat(pointer['first_date'])
+        self.days = pointer['days']
+        self.confidence = pointer['confidence']
+        self.rows = {grid_id: row for row, grid_id in enumerate(pointer['grid_ids'])}
+
+    def forecast(self, grid_id, start, days):
+        \"\"\"
+        The days * 24 hourly values of a grid from start, as a view of the
+        array; None when the grid or the window is not in the run.
+        \"\"\"
+        row = self.rows.get(grid_id)
+        offset = (start - self.first_date).days
+        if row is None or offset < 0 or offset + days > self.days:
+            return None
+        return self.values[row, offset * 24:(offset + days) * 24]
+
+_store = None
+_pointer_mtime = None
+_checked_at = 0.0
+_bypassed = False
+
+def bypass_forecast_store(bypassed=True):
+    \"\"\"Serve forecasts from MySQL even when a run is published, e.g. to capture their SQL\"\"\"
+    global _bypassed
+    _bypassed = bypassed
+
+def get_forecast_store():
+    \"\"\"The latest published run, re-checked every CHECK_SECONDS; None before the first run\"\"\"
+    global _store, _pointer_mtime, _checked_at
+    if _bypassed:
+        return None
+    if time.monotonic() - _checked_at > CHECK_SECONDS:
+        _checked_at = time.monotonic()
+        pointer_file = os.path.join(STORE_DIR, "latest.json")
+        try:
+            mtime = os.stat(pointer_file).st_mtime_ns
+            if mtime != _pointer_mtime:
+                with open(pointer_file) as f:
+                    pointer = json.load(f)
+                values = np.load(os.path.join(STORE_DIR, pointer['file']), mmap_mode='r')
+                _store = ForecastStore(pointer, values)
+                _pointer_mtime = mtime
+        except FileNotFoundError:
+            # Not published yet, or pruned under us: keep serving what is mapped
+            pass
+    return _store
+"""
+
+api_scoring = """\"\"\"
+Vectorised forecasts for many grids: one feature query, one model call.
+
+Shared by the forecast routers and models/batch_forecast.py, so both build
+the same features and fallback; the query builders and array functions are
+plain, the async wrappers are for the routers.
+\"\"\"
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+# History behind the hourly-mean fallback and the district lookup
+HISTORY_DAYS = 90
+
+# District of a grid: its latest incident in the last HISTORY_DAYS, one
+# (grid_id, event_date) index dive per grid within the recent partitions
+GRID_FEATURES = \"\"\"
+    SELECT g.grid_id, g.center_lat, g.center_lon,
+        g.lifetime_count AS total_crimes,
+        COALESCE(SUM(CASE WHEN a.date >= :d1 THEN a.count END), 0) AS rolling_1d,
+        COALESCE(SUM(CASE WHEN a.date >= :d7 THEN a.count END), 0) AS rolling_7d,
+        COALESCE(SUM(a.count), 0) AS rolling_30d,
+        (SELECT i.district FROM incidents i
+         WHERE i.grid_id = g.grid_id AND i.event_date >= :since
+         ORDER BY i.event_date DESC LIMIT 1) AS district
+    FROM grids g
+    LEFT JOIN grid_aggregates a
+        ON a.grid_id = g.grid_id AND a.date >= :d30 AND a.date < :start
+    WHERE {where}
+    GROUP BY g.grid_id, g.center_lat, g.center_lon, g.lifetime_count
+    ORDER BY g.grid_id
+\"\"\"
+
+FEATURE_COLUMNS = ['grid_id', 'center_lat', 'center_lon', 'total_crimes',
+                   'rolling_1d', 'rolling_7d', 'rolling_30d', 'district']
+
+def feature_query(start, grid_ids=None, bbox=None, limit=None):
+    \"\"\"
+    (query, params) of the per-grid model inputs as of start: for a list of
+    grid_ids, for every grid with incidents whose centroid is inside bbox
+    (lat_min, lat_max, lon_min, lon_max), or for every grid with incidents.
+    \"\"\"
+    params = {
+        "start": start,
+        "d1": start - timedelta(days=1),
+        "d7": start - timedelta(days=7),
+        "d30": start - timedelta(days=30),
+        "since": start - timedelta(days=HISTORY_DAYS)
+    }
+    if grid_ids is not None:
+        query = text(GRID_FEATURES.format(where="g.grid_id IN :grid_ids")).bindparams(
+            bindparam("grid_ids", expanding=True))
+        params["grid_ids"] = list(grid_ids)
+    elif bbox is not None:
+        query = text(GRID_FEATURES.format(where=\"\"\"
+            g.center_lat BETWEEN :lat_min AND :lat_max
+            AND g.center_lon BETWEEN :lon_min AND :lon_max
+            AND g.lifetime_count > 0
+        \"\"\") + (" LIMIT :limit" if limit else ""))
+        params.update(zip(("lat_min", "lat_max", "lon_min", "lon_max"), bbox))
+        if limit:
+            params["limit"] = limit
+    else:
+        query = text(GRID_FEATURES.format(where="g.lifetime_count > 0"))
+    return query, params
+
+def feature_frame(rows):
+    \"\"\"Feature rows as a DataFrame; grids without a recent incident get district 0\"\"\"
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS).fillna({'district': 0})
+
+async def grid_features(db, start, grid_ids=None, bbox=None, limit=None):
+    \"\"\"
+    Per-grid model inputs as of start (see feature_query), in one query.
+    Grids unknown to the grids table are left out.
+    \"\"\"
+    query, params = feature_query(start, grid_ids, bbox, limit)
+    return feature_frame((await db.execute(query, params)).fetchall())
+
+def slot_calendar(start, days):
+    \"\"\"Hour, day of week, weekend flag and month of each hourly slot from start\"\"\"
+    slots = np.arange(days * 24)
+    dates = pd.Timestamp(start) + pd.to_timedelta(slots // 24, unit='D')
+    return {
+        'event_hour': slots % 24,
+        'day_of_week': dates.dayofweek.to_numpy(),
+        'is_weekend': (dates.dayofweek >= 5).astype(int),
+        'month': dates.month.to_numpy()
+    }
+
+def score(model_package, features, start, days):
+    \"\"\"
+    Predicted counts as a (grid x hourly slot) array, from one model call
+    over every grid and slot. Row order follows features.
+    \"\"\"
+    n_grids, n_slots = len(features), days * 24
+    calendar = slot_calendar(start, days)
+    columns = {}
+    for column in model_package['feature_cols']:
+        if column in calendar:
+            columns[column] = np.tile(calendar[column], n_grids)
+        else:
+            columns[column] = np.repeat(features[column].to_numpy(dtype=np.float64), n_slots)
+    X = pd.DataFrame(columns)[model_package['feature_cols']]
+
+    model = model_package['model']
+    if model_package['model_type'] == 'lightgbm':
+        predicted = model.predict(X, num_iteration=model.best_iteration)
+    elif model_package['model_type'] == 'xgboost':
+        import xgboost as xgb
+        predicted = model.predict(xgb.DMatrix(X))
+    else:
+        predicted = model.predict(X)
+    return np.clip(np.asarray(predicted, dtype=np.float64), 0, None).reshape(n_grids, n_slots)
+
+def hourly_means_query(start, grid_ids=None):
+    \"\"\"
+    (query, params) of the mean count per (grid_id, hour) over the last
+    HISTORY_DAYS of rollup rows, for grid_ids or every grid
+    \"\"\"
+    params = {"since": start - timedelta(days=HISTORY_DAYS), "start": start}
+    where = "date >= :since AND date < :start"
+    if grid_ids is not None:
+        where += " AND grid_id IN :grid_ids"
+        params["grid_ids"] = list(grid_ids)
+    query = text(f\"\"\"
+        SELECT grid_id, hour, AVG(count) AS mean_count
+        FROM grid_aggregates
+        WHERE {where}
+        GROUP BY grid_id, hour
+    \"\"\")
+    if grid_ids is not None:
+        query = query.bindparams(bindparam("grid_ids", expanding=True))
+    return query, params
+
+def mean_array(rows, grid_ids, days, missing=1.0):
+    \"\"\"
+    Fallback without a model: hourly means from hourly_means_query as a
+    (grid x hourly slot) array, repeated for every day, with missing for
+    hours without history. Rows follow grid_ids; other grids are ignored.
+    \"\"\"
+    means = np.full((len(grid_ids), 24), missing, dtype=np.float64)
+    if rows:
+        position = {grid_id: row for row, grid_id in enumerate(grid_ids)}
+        found = pd.DataFrame(rows, columns=['grid_id', 'hour', 'mean_count'])
+        found['row'] = found['grid_id'].map(position)
+        found = found.dropna(subset=['row'])
+        means[found['row'].to_numpy(dtype=int), found['hour'].to_numpy(dtype=int)] = \\
+            found['mean_count'].to_numpy(dtype=np.float64)
+    return np.tile(means, days)
+
+async def hourly_means(db, start, grid_ids, days, missing=1.0):
+    \"\"\"The hourly-mean fallback of grid_ids (see mean_array), in one query\"\"\"
+    query, params = hourly_means_query(start, grid_ids)
+    return mean_array((await db.execute(query, params)).fetchall(), grid_ids, days, missing)
+"""
+
+api_export = """\"\"\"
+Streaming export of historical incidents as NDJSON, CSV or Arrow IPC, with
+(event_ts, incident_id) keyset continuation tokens
+\"\"\"
+import io
+import csv
+import json
+import base64
+from datetime import datetime
+from database import read_session
+
+# Rows fetched from the server-side cursor and encoded per chunk
+BATCH_ROWS = 5000
+
+EXPORT_COLUMNS = ['incident_id', 'primary_type', 'description', 'latitude', 'longitude',
+                  'event_ts', 'arrest', 'domestic', 'grid_id', 'district', 'community_area']
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+# Rows after a token, in the export order (newest first); the expanded OR
+# form stays a range scan on ix_event_ts
+AFTER_CURSOR = \"\"\"
+    AND (event_ts < :cursor_ts OR (event_ts = :cursor_ts AND incident_id < :cursor_id))
+\"\"\"
+
+# Rows up to and including the last row of a page
+UNTIL_BOUNDARY = \"\"\"
+    AND (event_ts > :boundary_ts OR (event_ts = :boundary_ts AND incident_id >= :boundary_id))
+\"\"\"
+
+ORDER = " ORDER BY event_ts DESC, incident_id DESC"
+
+# End-of-stream marker of the Arrow IPC streaming format
+ARROW_EOS = b"\\xff\\xff\\xff\\xff\\x00\\x00\\x00\\x00"
+
+def encode_cursor(event_ts, incident_id):
+    \"\"\"Opaque continuation token for the rows after (event_ts, incident_id)\"\"\"
+    key = f"{event_ts.isoformat()}|{incident_id}"
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_cursor(token):
+    \"\"\"(event_ts, incident_id) of a token; ValueError when it is malformed\"\"\"
+    try:
+        event_ts, incident_id = base64.urlsafe_b64decode(token.encode()).decode().split("|")
+        return datetime.fromisoformat(event_ts), int(incident_id)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+def export_row(row):
+    \"\"\"Incident row with the types of IncidentResponse; NULLs stay None\"\"\"
+    return (
+        row.incident_id,
+        row.primary_type,
+        row.description or "",
+        float(row.latitude) if row.latitude is not None else None,
+        float(row.longitude) if row.longitude is not None else None,
+        row.event_ts,
+        bool(row.arrest),
+        bool(row.domestic),
+        row.grid_id,
+        row.district,
+        row.community_area
+    )
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def ndjson_chunk(rows):
+    \"\"\"One JSON object per line\"\"\"
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, map(_iso, row))), separators=(",", ":")) + "\\n"
+        for row in rows
+    ).encode()
+
+def csv_chunk(rows):
+    \"\"\"CSV lines with ISO timestamps\"\"\"
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_iso(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+def arrow_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('incident_id', pa.int64()),
+        ('primary_type', pa.string()),
+        ('description', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('event_ts', pa.timestamp('s')),
+        ('arrest', pa.bool_()),
+        ('domestic', pa.bool_()),
+        ('grid_id', pa.string()),
+        ('district', pa.int32()),
+        ('community_area', pa.int32())
+    ])
+
+def arrow_chunk(rows, schema):
+    \"\"\"One record batch message of the IPC stream\"\"\"
+    import pyarrow as pa
+    columns = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+    return pa.record_batch(columns, schema=schema).serialize().to_pybytes()
+
+async def stream_rows(query, params):
+    \"\"\"
+    Batches of export rows off a server-side cursor.
+
+    The stream runs after the endpoint has returned, when FastAPI has
+    already closed the request's session, so it opens its own on the
+    export pool and holds it until the last batch is sent.
+    \"\"\"
+    async with read_session("export") as db:
+        result = await db.stream(query, params)
+        async for rows in result.partitions(BATCH_ROWS):
+            yield [export_row(row) for row in rows]
+
+async def encode(fmt, batches):
+    \"\"\"Body chunks of an export in fmt, one per batch; memory stays at one batch\"\"\"
+    if fmt == "arrow":
+        schema = arrow_schema()
+        yield schema.serialize().to_pybytes()
+        async for rows in batches:
+            yield arrow_chunk(rows, schema)
+        yield ARROW_EOS
+        return
+
+    if fmt == "csv":
+        yield csv_chunk([EXPORT_COLUMNS])
+        chunk = csv_chunk
+    else:
+        chunk = ndjson_chunk
+    async for rows in batches:
+        yield chunk(rows)
+"""
+
+api_columnar = """\"\"\"
+Opt-in columnar responses: a result set as one array per column, encoded
+straight from DB rows or NumPy arrays with orjson, or as an Arrow IPC stream
+\"\"\"
+import orjson
+from fastapi.responses import Response
+from export import MEDIA_TYPES
+
+# Requested with ?format=columnar|arrow, or with one of these Accept types;
+# without either, endpoints keep returning their response models
+COLUMNAR_JSON = "application/vnd.crime-forecast.columnar+json"
+ARROW_STREAM = MEDIA_TYPES["arrow"]
+
+FORMAT_PATTERN = "^(rows|columnar|arrow)$"
+
+FORECAST_COLUMNS = ['grid_id', 'date', 'hour', 'predicted_count', 'confidence', 'model_version']
+
+def response_format(http_request, format=None):
+    \"\"\"rows (the response models), columnar or arrow: ?format= first, then Accept\"\"\"
+    if format:
+        return format
+    accept = http_request.headers.get("accept", "") if http_request else ""
+    if ARROW_STREAM in accept:
+        return "arrow"
+    if COLUMNAR_JSON in accept:
+        return "columnar"
+    return "rows"
+
+def rows_to_columns(rows, names):
+    \"\"\"Column lists of row tuples, in one transpose\"\"\"
+    columns = list(zip(*rows)) or [()] * len(names)
+    return {name: list(values) for name, values in zip(names, columns)}
+
+def records_to_columns(records, names):
+    \"\"\"Column lists of row dicts, e.g. a cached row response\"\"\"
+    return {name: [record[name] for record in records] for name in names}
+
+def forecast_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('grid_id', pa.string()),
+        ('date', pa.date32()),
+        ('hour', pa.int8()),
+        ('predicted_count', pa.float64()),
+        ('confidence', pa.float64()),
+        ('model_version', pa.string())
+    ])
+
+class ColumnarJSONResponse(Response):
+    \"\"\"orjson encoding: NumPy arrays, dates and datetimes without a jsonable_encoder pass\"\"\"
+
+    media_type = COLUMNAR_JSON
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def arrow_stream(columns, schema):
+    \"\"\"Columns as one record batch of an Arrow IPC stream\"\"\"
+    import pyarrow as pa
+    table = pa.table([pa.array(columns[field.name], type=field.type) for field in schema], schema=schema)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def columnar_response(fmt, columns, schema):
+    \"\"\"
+    Equal-length columns ({name: list or 1-d array}) as columnar JSON,
+    {"row_count": n, "columns": {...}}, or as Arrow IPC typed by schema
+    (a callable, so pyarrow is only imported for Arrow requests).
+    \"\"\"
+    if fmt == "arrow":
+        return Response(arrow_stream(columns, schema()), media_type=ARROW_STREAM)
+    row_count = len(next(iter(columns.values()))) if columns else 0
+    return ColumnarJSONResponse({"row_count": row_count, "columns": columns})
+"""
+
+api_test_cache = """\"\"\"
+Tests for the response cache's data-version handling (python -m pytest test_cache.py)
+\"\"\"
+import asyncio
+from cache import LRUCache, ResponseCache
+
+class VersionResult:
+    def __init__(self, version):
+        self.version = version
+
+    def scalar(self):
+        return self.version
+
+class VersionDB:
+    \"\"\"Stand-in session answering the data_version query with a settable version\"\"\"
+
+    def __init__(self, version=1):
+        self.version = version
+
+    async def execute(self, query, params=None):
+        return VersionResult(self.version)
+
+def test_version_change_without_backend():
+    cache = ResponseCache(None, version_check_seconds=0)
+    db = VersionDB(1)
+    assert asyncio.run(cache.data_version(db)) == 1
+    db.version = 2
+    assert asyncio.run(cache.data_version(db)) == 2
+    assert cache.invalidations == 1
+    assert asyncio.run(cache.lookup(db, "nearby", latitude=41.88)) == (None, None)
+
+def test_version_change_clears_backend():
+    cache = ResponseCache(LRUCache(max_entries=10, ttl=60), version_check_seconds=0)
+    db = VersionDB(1)
+    key, value = asyncio.run(cache.lookup(db, "stats", days=30))
+    assert value is None
+    asyncio.run(cache.store(key, {"total": 1}))
+    assert asyncio.run(cache.lookup(db, "stats", days=30))[1] == {"total": 1}
+    db.version = 2
+    assert asyncio.run(cache.lookup(db, "stats", days=30))[1] is None
+    assert cache.backend.size() == 0
+"""
+
 print("✅ API Backend Core Files Generated:")
 print("   - api/requirements.txt")
 print("   - api/Dockerfile")
@@ -267,3 +1286,11 @@ print("   - api/config.py")
 print("   - api/database.py")
 print("   - api/models.py")
 print("   - api/schemas.py")
+print("   - api/sketches.py")
+print("   - api/spatial.py")
+print("   - api/cache.py")
+print("   - api/forecast_store.py")
+print("   - api/scoring.py")
+print("   - api/export.py")
+print("   - api/columnar.py")
+print("   - api/test_cache.py")
@@ -5,7 +5,6 @@ model_train = """#!/usr/bin/env python3
 \"\"\"
 Train machine learning models for crime prediction
 \"\"\"
-import pandas as pd
 import numpy as np
 from pathlib import Path
 import pickle
@@ -15,17 +14,34 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import lightgbm as lgb
 import xgboost as xgb
 import argparse
+import sys
+
+# Feature datasets are read through the ETL storage helpers
+sys.path.append(str(Path(__file__).parent.parent / "etl"))
+from storage import FEATURES_DATASET, read_dataset, superseded
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 MODEL_DIR = Path(__file__).parent / "saved"
 MODEL_DIR.mkdir(exist_ok=True)
 
-def load_and_prepare_data():
+# Only these columns are read from the features dataset
+TRAINING_COLUMNS = [
+    'incident_id', 'grid_id', 'event_ts', 'event_date', 'event_hour',
+    'rolling_1d', 'rolling_7d', 'rolling_30d', 'day_of_week', 'is_weekend',
+    'month', 'district', 'total_crimes', 'updated_on'
+]
+
+def load_and_prepare_data(start_date=None, end_date=None):
     \"\"\"Load and prepare data for training\"\"\"
     print("Loading feature-engineered data...")
     
-    input_file = DATA_DIR / "chicago_crimes_features.csv"
-    df = pd.read_csv(input_file, parse_dates=['event_ts', 'event_date'])
+    # Column projection plus year/month partition pruning
+    df = read_dataset(FEATURES_DATASET, columns=TRAINING_COLUMNS,
+                      start_date=start_date, end_date=end_date)
+    
+    # An incident whose month changed can appear in two partitions; keep
+    # the newest copy, as the MySQL loader does
+    df = df[~superseded(df)].drop(columns='updated_on')
     
     # Sort by time
     df = df.sort_values('event_ts')
@@ -190,14 +206,14 @@ def save_model(model, model_type, feature_cols, metrics):
     
     print(f"✅ Model saved as {latest_path}")
 
-def main(model_type='lightgbm'):
+def main(model_type='lightgbm', start_date=None, end_date=None):
     \"\"\"Main training pipeline\"\"\"
     print("="*70)
     print("CHICAGO CRIME PREDICTION MODEL TRAINING")
     print("="*70)
     
     # Load data
-    df = load_and_prepare_data()
+    df = load_and_prepare_data(start_date, end_date)
     
     # Prepare features and target
     X, y, feature_cols = prepare_features_target(df)
@@ -236,9 +252,13 @@ if __name__ == "__main__":
     parser.add_argument('--model', type=str, default='lightgbm',
                        choices=['lightgbm', 'xgboost'],
                        help='Model type to train')
+    parser.add_argument('--start-date', type=str, default=None,
+                       help='First month of training data (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=str, default=None,
+                       help='Last month of training data (YYYY-MM-DD)')
     
     args = parser.parse_args()
-    main(args.model)
+    main(args.model, args.start_date, args.end_date)
 """
 
 model_explainer = """#!/usr/bin/env python3
@@ -341,6 +361,326 @@ if __name__ == "__main__":
     plot_shap_summary(shap_values, X_sample, feature_cols)
 """
 
+model_batch_forecast = """#!/usr/bin/env python3
+\"\"\"
+Batch forecasts for every grid, swapped into the predictions table as one run
+and published as a memory-mapped forecast store for the API
+\"\"\"
+import os
+import re
+import json
+import time
+import pickle
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import date, timedelta
+from sqlalchemy import text
+import sys
+
+# Database helpers are shared with the ETL loader, features and scoring with the API
+sys.path.append(str(Path(__file__).parent.parent / "etl"))
+sys.path.append(str(Path(__file__).parent.parent / "api"))
+from load_to_mysql import get_engine, local_infile_enabled
+from refresh_aggregates import bump_data_version
+from scoring import feature_query, feature_frame, hourly_means_query, mean_array, score
+
+MODEL_DIR = Path(__file__).parent / "saved"
+
+# Memory-mapped runs the API serves forecasts from (see api/forecast_store.py)
+STORE_DIR = Path(os.getenv("FORECAST_STORE_DIR", Path(__file__).parent / "forecasts"))
+
+# Covers the longest forecast the API accepts (ForecastRequest.days)
+HORIZON_DAYS = 30
+
+# Retired runs kept next to the live one (as predictions_run_<id> tables and store files)
+KEEP_RUNS = 2
+
+# The API reports the same placeholder for its on-the-fly forecast
+CONFIDENCE = 0.75
+
+FALLBACK_VERSION = "hourly_mean"
+
+PREDICTION_COLUMNS = ['grid_id', 'prediction_date', 'prediction_hour',
+                      'predicted_count', 'confidence', 'model_version']
+
+def load_model_package(model_type='lightgbm'):
+    \"\"\"The latest trained model package, or None when none has been saved\"\"\"
+    model_file = MODEL_DIR / f"{model_type}_crime_predictor.pkl"
+    if not model_file.exists():
+        return None
+    with open(model_file, 'rb') as f:
+        return pickle.load(f)
+
+def model_version(model_package):
+    \"\"\"Tag of a run: model type and training timestamp\"\"\"
+    if model_package is None:
+        return FALLBACK_VERSION
+    return f"{model_package['model_type']}_{model_package['timestamp']}"
+
+def grid_features(conn, as_of):
+    \"\"\"
+    Per-grid inputs of a run as of the given date, built as the API's bulk
+    forecast builds them: rolling counts from the hourly rollup,
+    total_crimes from the grids dimension and district from the latest
+    recent incident. Only grids with any incident are forecast.
+    \"\"\"
+    query, params = feature_query(as_of)
+    return feature_frame(conn.execute(query, params).fetchall())
+
+def forecast_frame(grid_ids, start, days):
+    \"\"\"Every (grid_id, prediction_date, prediction_hour) of the horizon, grid-major\"\"\"
+    grid_ids = np.asarray(grid_ids, dtype=object)
+    slots = days * 24
+    offsets = np.tile(np.arange(slots), len(grid_ids))
+    dates = pd.Timestamp(start) + pd.to_timedelta(offsets // 24, unit='D')
+    return pd.DataFrame({
+        'grid_id': np.repeat(grid_ids, slots),
+        'prediction_date': dates,
+        'prediction_hour': offsets % 24
+    })
+
+def predict_model(model_package, features, start, days):
+    \"\"\"One vectorised model call over all grids x days x 24 hours\"\"\"
+    frame = forecast_frame(features['grid_id'], start, days)
+    frame['predicted_count'] = score(model_package, features, start, days).ravel()
+    return frame
+
+def predict_fallback(conn, grid_ids, start, days):
+    \"\"\"Hourly means per grid, 1.0 for hours without history (as the API does)\"\"\"
+    grid_ids = list(grid_ids)
+    query, params = hourly_means_query(start)
+    frame = forecast_frame(grid_ids, start, days)
+    frame['predicted_count'] = mean_array(conn.execute(query, params).fetchall(), grid_ids, days).ravel()
+    return frame
+
+def _insert_staging(engine, predictions, method, batch_size):
+    \"\"\"Bulk insert a run into predictions_staging on one raw connection\"\"\"
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if method == 'infile':
+            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+                path = f.name
+            try:
+                # Only numbers, dates and tag strings: nothing to escape
+                predictions.to_csv(path, index=False, header=False, lineterminator='\\n')
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE predictions_staging "
+                    "FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\\\n' "
+                    f"({', '.join(PREDICTION_COLUMNS)})"
+                )
+            finally:
+                os.unlink(path)
+        else:
+            statement = (
+                f"INSERT INTO predictions_staging ({', '.join(PREDICTION_COLUMNS)}) "
+                f"VALUES ({', '.join(['%s'] * len(PREDICTION_COLUMNS))})"
+            )
+            rows = list(predictions.itertuples(index=False, name=None))
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(statement, rows[start:start + batch_size])
+        connection.commit()
+    finally:
+        connection.close()
+
+def prune_runs(conn, keep=KEEP_RUNS):
+    \"\"\"Drop the tables of retired runs beyond the newest keep. Returns the pruned run ids\"\"\"
+    retired = [row.run_id for row in conn.execute(text(\"\"\"
+        SELECT run_id FROM prediction_runs
+        WHERE status = 'retired'
+        ORDER BY run_id DESC
+    \"\"\"))][keep:]
+    for run_id in retired:
+        conn.execute(text(f"DROP TABLE IF EXISTS predictions_run_{run_id}"))
+        conn.execute(text("UPDATE prediction_runs SET status = 'pruned' WHERE run_id = :run_id"),
+                     {"run_id": run_id})
+    return retired
+
+def live_table_run(conn):
+    \"\"\"
+    Run id the live predictions table was published as (its table comment),
+    None for the empty table created by init.sql
+    \"\"\"
+    comment = conn.execute(text(\"\"\"
+        SELECT TABLE_COMMENT FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'predictions'
+    \"\"\")).scalar()
+    match = re.fullmatch(r"run (\\d+)", comment or "")
+    return int(match.group(1)) if match else None
+
+def reconcile_runs(conn):
+    \"\"\"
+    Bring prediction_runs in line with the tables, which are the truth.
+
+    The run named in the live table's comment is marked live and any other
+    live run retired; staged runs that never went live are marked failed.
+    Idempotent, so it both finishes a publish and repairs one interrupted
+    between its RENAME and the status update. Tables published before run
+    ids were recorded have no comment; their statuses are left as they are.
+    Returns the live run id.
+    \"\"\"
+    live = live_table_run(conn)
+    if live is None:
+        return conn.execute(text(
+            "SELECT MAX(run_id) FROM prediction_runs WHERE status = 'live'")).scalar()
+    conn.execute(text(\"\"\"
+        UPDATE prediction_runs SET status = 'retired'
+        WHERE status = 'live' AND run_id <> :live
+    \"\"\"), {"live": live})
+    conn.execute(text(\"\"\"
+        UPDATE prediction_runs SET status = 'failed'
+        WHERE status = 'staged' AND run_id <> :live
+    \"\"\"), {"live": live})
+    conn.execute(text("UPDATE prediction_runs SET status = 'live' WHERE run_id = :run_id"),
+                 {"run_id": live})
+    return live
+
+def write_run(engine, predictions, version, start, days, method='auto',
+              batch_size=5000, keep=KEEP_RUNS):
+    \"\"\"
+    Publish a run: bulk load a staging copy of predictions, then swap it in.
+
+    The swap is a single RENAME TABLE, so readers see either the previous
+    run or the new one, never a mix. MySQL commits DDL implicitly, so the
+    swap cannot share a transaction with prediction_runs: the staging table
+    carries its run id as a table comment, and reconcile_runs() derives the
+    statuses from the live table afterwards (and again at the start of the
+    next run, should this one stop in between). The previous live table is
+    kept as predictions_run_<id> and retired runs beyond keep are dropped.
+    Returns the new run id.
+    \"\"\"
+    predictions = predictions.assign(
+        prediction_date=pd.to_datetime(predictions['prediction_date']).dt.strftime('%Y-%m-%d'),
+        predicted_count=predictions['predicted_count'].round(4),
+        confidence=CONFIDENCE,
+        model_version=version
+    )[PREDICTION_COLUMNS]
+
+    if method == 'auto':
+        method = 'infile' if local_infile_enabled(engine) else 'multirow'
+    with engine.begin() as conn:
+        live = reconcile_runs(conn)
+        run_id = conn.execute(text(\"\"\"
+            INSERT INTO prediction_runs (model_version, first_date, horizon_days, row_count, status)
+            VALUES (:version, :first_date, :days, :rows, 'staged')
+        \"\"\"), {"version": version, "first_date": start, "days": days,
+               "rows": len(predictions)}).lastrowid
+
+    # DDL below commits on its own, one statement at a time
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS predictions_staging"))
+        conn.execute(text("CREATE TABLE predictions_staging LIKE predictions"))
+        conn.execute(text(f"ALTER TABLE predictions_staging COMMENT = 'run {run_id}'"))
+    _insert_staging(engine, predictions, method, batch_size)
+
+    with engine.connect() as conn:
+        retired = f"predictions_run_{live}" if live else "predictions_initial"
+        conn.execute(text(f"DROP TABLE IF EXISTS {retired}"))
+        conn.execute(text(f"RENAME TABLE predictions TO {retired}, predictions_staging TO predictions"))
+        if not live:
+            # The empty table created by init.sql, not a run
+            conn.execute(text(f"DROP TABLE {retired}"))
+
+    with engine.begin() as conn:
+        reconcile_runs(conn)
+        prune_runs(conn, keep)
+        bump_data_version(conn)
+    return run_id
+
+def write_store(predictions, version, start, days, run_id, store_dir=STORE_DIR, keep=KEEP_RUNS):
+    \"\"\"
+    Publish a run as a float32 (grid x hour slot) array for the API to memory-map.
+
+    predictions is grid-major with days * 24 rows per grid, as built by
+    forecast_frame. The array goes to forecast_run_<id>.npy and latest.json
+    names it together with the grid_id of every row, replaced atomically so
+    API workers switch runs between requests. Store files of runs beyond
+    keep are removed; a worker still mapping one keeps reading it until it
+    switches. Returns the array path.
+    \"\"\"
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    slots = days * 24
+    grid_ids = predictions['grid_id'].to_numpy()[::slots]
+    values = predictions['predicted_count'].to_numpy(dtype=np.float32).reshape(len(grid_ids), slots)
+
+    array_file = store_dir / f"forecast_run_{run_id}.npy"
+    partial = array_file.with_suffix('.partial')
+    store = np.lib.format.open_memmap(partial, mode='w+', dtype=np.float32, shape=values.shape)
+    store[:] = values
+    store.flush()
+    del store
+    os.replace(partial, array_file)
+
+    pointer = {
+        'run_id': run_id,
+        'file': array_file.name,
+        'model_version': version,
+        'first_date': start.isoformat(),
+        'days': days,
+        'confidence': CONFIDENCE,
+        'grid_ids': [str(g) for g in grid_ids]
+    }
+    with open(store_dir / "latest.json.partial", 'w') as f:
+        json.dump(pointer, f)
+    os.replace(store_dir / "latest.json.partial", store_dir / "latest.json")
+
+    runs = sorted(store_dir.glob("forecast_run_*.npy"),
+                  key=lambda p: int(p.stem.rsplit('_', 1)[1]), reverse=True)
+    for old in runs[keep + 1:]:
+        old.unlink()
+    return array_file
+
+def main(model_type='lightgbm', days=HORIZON_DAYS, method='auto', keep=KEEP_RUNS):
+    \"\"\"Forecast every grid for the next days and publish the run\"\"\"
+    print("=" * 70)
+    print("BATCH FORECAST")
+    print("=" * 70)
+
+    engine = get_engine(local_infile=method in ('auto', 'infile'))
+    start_time = time.time()
+    # The API's forecast starts tomorrow
+    start = date.today() + timedelta(days=1)
+    model_package = load_model_package(model_type)
+    version = model_version(model_package)
+
+    with engine.connect() as conn:
+        features = grid_features(conn, start)
+        if model_package is None:
+            print("No saved model found, forecasting hourly means")
+            predictions = predict_fallback(conn, features['grid_id'], start, days)
+        else:
+            predictions = predict_model(model_package, features, start, days)
+    print(f"Forecast {len(features):,} grids x {days} days x 24 hours "
+          f"({len(predictions):,} rows) in {time.time() - start_time:.1f}s")
+
+    run_id = write_run(engine, predictions, version, start, days, method=method, keep=keep)
+    array_file = write_store(predictions, version, start, days, run_id, keep=keep)
+    print(f"Forecast store: {array_file} ({array_file.stat().st_size / 2 ** 20:,.1f} MB)")
+    print(f"\\n✅ Run {run_id} ({version}) live from {start}, "
+          f"{time.time() - start_time:.1f}s total")
+    return run_id
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write a batch forecast run to the predictions table and store')
+    parser.add_argument('--model', type=str, default='lightgbm',
+                        choices=['lightgbm', 'xgboost'],
+                        help='Saved model to forecast with')
+    parser.add_argument('--days', type=int, default=HORIZON_DAYS,
+                        help='Forecast horizon in days')
+    parser.add_argument('--method', choices=['auto', 'infile', 'multirow'], default='auto',
+                        help='Bulk insert with LOAD DATA LOCAL INFILE or multi-row INSERTs')
+    parser.add_argument('--keep', type=int, default=KEEP_RUNS,
+                        help='Retired runs to keep besides the live one')
+
+    args = parser.parse_args()
+    main(args.model, args.days, args.method, args.keep)
+"""
+
 print("✅ ML Model Training Files Generated:")
 print("   - models/train_model.py")
 print("   - models/explainer.py")
+print("   - models/batch_forecast.py")
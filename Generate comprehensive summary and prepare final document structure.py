@@ -39,7 +39,18 @@ ETL PIPELINE (/etl)
   ├── download_data.py            - Download Chicago crime data (Kaggle/API)
   ├── clean_data.py               - Data cleaning and preprocessing
   ├── feature_engineering.py      - Geohash, temporal, and lag features
-  └── load_to_mysql.py            - Load processed data to MySQL
+  ├── load_to_mysql.py            - Load processed data to MySQL
+  ├── storage.py                  - Partitioned Parquet datasets between stages
+  ├── geohash_vec.py              - Vectorized geohash encode/decode + benchmark
+  ├── temporal.py                 - Season/time-of-day lookups + holiday calendar
+  ├── lag_panel.py                - Dense grid x day/hour rolling count panel
+  ├── pipeline.py                 - Cached, partition-parallel DAG pipeline runner
+  ├── synthetic.py                - Synthetic incident generator (1M-50M rows)
+  ├── benchmark.py                - Per-step ETL timing/memory benchmark
+  ├── refresh_aggregates.py       - Incremental grid_aggregates/stats_cube rollups
+  ├── partitions.py               - Monthly incidents partition manager
+  ├── sketches.py                 - Daily HyperLogLog sketches (grids, crime types)
+  └── grids.py                    - Grids dimension: centroid, bounds, neighbors
 
 API BACKEND (/api)
   ├── Dockerfile                  - API container configuration
@@ -49,6 +60,19 @@ API BACKEND (/api)
   ├── database.py                 - SQLAlchemy database setup
   ├── models.py                   - Database models (Incident, GridAggregate)
   ├── schemas.py                  - Pydantic schemas for API
+  ├── sketches.py                 - HyperLogLog merge + estimate
+  ├── spatial.py                  - Ball-tree radius search over grid centroids
+  ├── cache.py                    - Response cache (LRU or Redis) with hit/miss metrics
+  ├── forecast_store.py           - Memory-mapped forecast store reader
+  ├── scoring.py                  - Vectorised multi-grid scoring
+  ├── export.py                   - Streaming NDJSON/CSV/Arrow export
+  ├── columnar.py                 - Columnar JSON / Arrow responses
+  ├── test_cache.py               - Response cache version tests
+  ├── router_queries.py           - Captured router SQL for EXPLAIN tooling
+  ├── verify_partitions.py        - EXPLAIN partition-pruning check
+  ├── index_advisor.py            - Covering-index advisor + migrations
+  ├── check_routing.py            - Replica/workload routing check
+  ├── benchmark_concurrency.py    - API throughput at 50/200/1000 clients
   └── routers/
       ├── health.py               - Health check endpoint
       ├── predictions.py          - Prediction endpoints (forecast, nearby, explain)
@@ -56,7 +80,8 @@ API BACKEND (/api)
 
 ML MODELS (/models)
   ├── train_model.py              - Train LightGBM/XGBoost models
-  └── explainer.py                - SHAP-based model explainability
+  ├── explainer.py                - SHAP-based model explainability
+  └── batch_forecast.py           - Batch forecast runs into predictions
 
 FRONTEND (/frontend)
   ├── package.json                - Node.js dependencies
@@ -271,7 +296,18 @@ file_structure = {
         "etl/download_data.py",
         "etl/clean_data.py",
         "etl/feature_engineering.py",
-        "etl/load_to_mysql.py"
+        "etl/load_to_mysql.py",
+        "etl/storage.py",
+        "etl/geohash_vec.py",
+        "etl/temporal.py",
+        "etl/lag_panel.py",
+        "etl/pipeline.py",
+        "etl/synthetic.py",
+        "etl/benchmark.py",
+        "etl/refresh_aggregates.py",
+        "etl/partitions.py",
+        "etl/sketches.py",
+        "etl/grids.py"
     ],
     "API Backend": [
         "api/Dockerfile",
@@ -281,13 +317,27 @@ file_structure = {
         "api/database.py",
         "api/models.py",
         "api/schemas.py",
+        "api/sketches.py",
+        "api/spatial.py",
+        "api/cache.py",
+        "api/forecast_store.py",
+        "api/scoring.py",
+        "api/export.py",
+        "api/columnar.py",
+        "api/test_cache.py",
+        "api/router_queries.py",
+        "api/verify_partitions.py",
+        "api/index_advisor.py",
+        "api/check_routing.py",
+        "api/benchmark_concurrency.py",
         "api/routers/health.py",
         "api/routers/predictions.py",
         "api/routers/historical.py"
     ],
     "ML Models": [
         "models/train_model.py",
-        "models/explainer.py"
+        "models/explainer.py",
+        "models/batch_forecast.py"
     ],
     "Infrastructure": [
         "infra/mysql/init.sql"
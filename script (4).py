@@ -15,7 +15,18 @@ chicago-crime-forecast/
 │   ├── download_data.py
 │   ├── clean_data.py
 │   ├── feature_engineering.py
-│   └── load_to_mysql.py
+│   ├── load_to_mysql.py
+│   ├── storage.py
+│   ├── geohash_vec.py
+│   ├── temporal.py
+│   ├── lag_panel.py
+│   ├── pipeline.py
+│   ├── synthetic.py
+│   ├── benchmark.py
+│   ├── refresh_aggregates.py
+│   ├── partitions.py
+│   ├── sketches.py
+│   └── grids.py
 ├── api/
 │   ├── Dockerfile
 │   ├── requirements.txt
@@ -24,6 +35,19 @@ chicago-crime-forecast/
 │   ├── database.py
 │   ├── models.py
 │   ├── schemas.py
+│   ├── sketches.py
+│   ├── spatial.py
+│   ├── cache.py
+│   ├── forecast_store.py
+│   ├── scoring.py
+│   ├── export.py
+│   ├── columnar.py
+│   ├── test_cache.py
+│   ├── router_queries.py
+│   ├── verify_partitions.py
+│   ├── index_advisor.py
+│   ├── check_routing.py
+│   ├── benchmark_concurrency.py
 │   ├── crud.py
 │   └── routers/
 │       ├── __init__.py
@@ -34,7 +58,8 @@ chicago-crime-forecast/
 │   ├── __init__.py
 │   ├── train_model.py
 │   ├── model_utils.py
-│   └── explainer.py
+│   ├── explainer.py
+│   └── batch_forecast.py
 ├── frontend/
 │   ├── package.json
 │   ├── vite.config.ts
@@ -143,10 +168,107 @@ python etl/clean_data.py
 python etl/feature_engineering.py
 ```
 
+For full-history pulls, `python etl/clean_data.py --chunked` streams the raw
+file in fixed-size chunks so memory stays bounded by `--chunksize`.
+
 ### 3. Load to MySQL
 
 ```bash
-python etl/load_to_mysql.py
+python etl/load_to_mysql.py --workers 8
+```
+
+Full loads drop the secondary indexes, load year/month partitions in
+parallel with `LOAD DATA LOCAL INFILE` (or multi-row INSERTs with
+`--method multirow` when the server has `local_infile` off), then rebuild the
+indexes in one pass. Throughput is printed and appended to
+`data/load_metrics.jsonl` so it can be compared across releases.
+
+`incidents` is RANGE-partitioned by month on `event_date`. Loads create the
+partitions they need, and a nightly run keeps three months ready ahead and
+folds or archives old years:
+
+```bash
+python etl/partitions.py                       # create upcoming months
+python etl/partitions.py --merge-before 2015   # one partition per old year
+python etl/partitions.py --archive-before 2005 # move to incidents_archive_* tables
+cd api && python verify_partitions.py          # EXPLAIN each router query
+```
+
+`verify_partitions.py` runs every router query shape under `EXPLAIN` and
+fails if one reads incidents partitions outside its date range.
+
+### Index Advisor
+
+`api/index_advisor.py` captures every query the routers issue, times it
+against a seeded database and reads its `EXPLAIN ANALYZE` plan, then
+recommends covering indexes (equality columns, then the range or sort
+column, then the columns the query reads) and writes them to the next
+`infra/mysql/migrations/NNN_covering_indexes.sql`:
+
+```bash
+python etl/synthetic.py --rows 1m --output data/raw
+python etl/pipeline.py                             # seed MySQL
+cd api && python index_advisor.py                  # recommend + write migration
+cd api && python index_advisor.py --apply --report advisor.json  # before/after latency
+```
+
+### Pipeline Runner
+
+`etl/pipeline.py` runs download → clean → features → load without prompts.
+Each stage fans out per year/month partition across all cores and skips
+partitions whose content-hashed inputs are unchanged since the last run:
+
+```bash
+python etl/pipeline.py --download full           # full rebuild
+python etl/pipeline.py --download incremental    # merge the delta, rerun changed months
+python etl/pipeline.py --stages features load     # rerun selected stages
+python etl/pipeline.py --force                    # ignore the cache
+```
+
+### Incremental Refresh
+
+Nightly runs only fetch incidents created or updated since the last
+`updated_on` watermark and upsert them by `incident_id`:
+
+```bash
+python etl/download_data.py --incremental
+python etl/clean_data.py --incremental
+python etl/feature_engineering.py --incremental
+python etl/load_to_mysql.py --incremental
+```
+
+Every load keeps two rollups in step with `incidents`: `grid_aggregates`
+(hourly counts, arrests and trailing 1/7/30-day windows per grid) and
+`stats_cube` (counts and arrests per date, hour, district and crime type).
+Upserts refresh only the grids and dates they touched in the same
+transaction, bulk loads rebuild both. The forecast endpoint reads
+`grid_aggregates` and the dashboard statistics read `stats_cube`.
+`daily_sketches` holds one HyperLogLog sketch per day of distinct grids and
+crime types: `/api/stats/summary` merges them for any window, with a 1.6%
+standard error (95% of estimates within 3.3%), and `?exact=true` counts
+exactly instead. The `grids` dimension holds every geohash6 cell of the
+city with its centroid, bounds, parent and child cells, lifetime and
+30-day counts, and `grid_neighbors` its precomputed neighbor ring.
+`/api/grids/nearby` searches an in-process haversine ball tree over the
+cell centroids (rebuilt from `grids` when the data version changes), returning every cell
+within `radius_km` with its `distance_km`. To refresh by hand:
+
+```bash
+python etl/refresh_aggregates.py --days 30   # grids with recent incidents
+python etl/refresh_aggregates.py --full      # rebuild all rollups from incidents
+python etl/grids.py --counts-only            # nightly: move the 30-day window
+```
+
+### Synthetic Data & Benchmarks
+
+`etl/synthetic.py` generates portal-shaped incidents with realistic hotspot,
+seasonal and hourly patterns inside the cleaning bounding box, streamed to a
+partitioned raw dataset. `etl/benchmark.py` times and memory-profiles each
+ETL step and writes a JSON report to `data/benchmarks/`:
+
+```bash
+python etl/synthetic.py --rows 10m --output data/raw
+python etl/benchmark.py --rows 1m,10m
 ```
 
 ## 🤖 Train ML Models
@@ -155,6 +277,32 @@ python etl/load_to_mysql.py
 python models/train_model.py --model lightgbm --epochs 100
 ```
 
+### Batch Forecasts
+
+`models/batch_forecast.py` forecasts every grid with incidents for the next
+30 days x 24 hours in one vectorised model call (hourly means when no model
+is saved). Features, model call and fallback come from `api/scoring.py`,
+shared with the API's forecast endpoints, so a grid gets the same inputs
+and the same hourly means from either. The job publishes the run: it bulk loads `predictions_staging`, then
+swaps it in with a single `RENAME TABLE`, so the API never sees a half
+written run. Each row carries the run's `model_version` and
+`prediction_runs` records every run. The live table's comment names its
+run, and run statuses are reconciled from it after every swap and before
+the next run, since MySQL commits the `RENAME` on its own. The previous two runs are kept as
+`predictions_run_<id>` tables and older ones are dropped.
+
+The same run is written to `models/forecasts/` (`FORECAST_STORE_DIR`) as a
+float32 grid x hour-slot array, `forecast_run_<id>.npy`, and `latest.json`
+maps each grid_id to its row. The forecast endpoint memory-maps the latest
+array, so all uvicorn workers share it through the page cache, and answers
+with a row slice. It falls back to one primary key range on `predictions`
+`(grid_id, prediction_date, prediction_hour)`, then to hourly means, only
+when the grid or the requested days are not in the store:
+
+```bash
+python models/batch_forecast.py   # nightly, after the load
+```
+
 ## 📁 Project Structure
 
 See full structure in the codebase. Key directories:
@@ -186,12 +334,95 @@ VITE_MAPBOX_TOKEN=your_mapbox_token
 MODEL_PATH=./models/saved/
 ```
 
+## 🗄️ Read Replicas
+
+`api/database.py` keeps separate connection pools per workload class:
+interactive (forecast, nearby, health), analytics (`/stats/*`) and export
+(`/historical`). With `REPLICA_URLS` set, interactive and analytics reads
+go round-robin over the replicas, exports are pinned to the last replica
+and writes stay on the primary. Check the routing locally with SQLite
+stand-ins:
+
+```bash
+cd api
+DATABASE_URL_OVERRIDE=sqlite:///primary.db \\
+REPLICA_URLS='["sqlite:///replica1.db", "sqlite:///replica2.db"]' \\
+python check_routing.py
+```
+
+The routers are `async def` and run on `AsyncSession`s from async engines
+(asyncmy for MySQL, aiosqlite for SQLite stand-ins), so a request waiting on
+MySQL no longer holds one of uvicorn's threadpool threads. The sync engine
+on the primary only serves schema creation and the maintenance scripts.
+`api/benchmark_concurrency.py` measures requests/sec and latency
+percentiles of a running API at 50, 200 and 1000 concurrent clients;
+run it against the build before and after a change and compare. Start the
+API with `CACHE_BACKEND=none` so requests reach MySQL; the benchmark stops
+when the response cache is on, unless `--with-cache` is given:
+
+```bash
+cd api
+CACHE_BACKEND=none uvicorn main:app --workers 4 &   # for each build
+python benchmark_concurrency.py --label before --report before.json
+python benchmark_concurrency.py --label after --report after.json
+python benchmark_concurrency.py --compare before.json after.json
+```
+
+## ⚡ Response Cache
+
+`/api/stats/summary`, `/api/stats/by-hour`, `/api/grids/nearby` and
+`/api/grids/{grid_id}/forecast` are served from a response cache keyed on
+their normalized parameters (`api/cache.py`). The default
+`CACHE_BACKEND=memory` is an LRU per API process (`CACHE_MAX_ENTRIES`,
+`CACHE_TTL_SECONDS`). `CACHE_BACKEND=redis` shares one cache between all
+processes on a Redis-compatible server at `REDIS_URL`
+(`docker-compose --profile cache up`), and `none` turns caching off. Every
+ETL commit that changes served data (loads, rollup refreshes, grid counts,
+batch forecasts) bumps the `data_version` row. The API re-reads it every
+`CACHE_VERSION_CHECK_SECONDS` (5s) and stops using older entries.
+Hit/miss counts per endpoint are at `GET /api/cache/stats`.
+`cd api && python -m pytest test_cache.py` checks version handling with and
+without a backend.
+
+## 📤 Streaming Export
+
+`POST /api/historical/export` streams every incident matching a date range
+(and optionally a grid or crime type), newest first, as NDJSON, CSV or an
+Arrow IPC stream (`format`). Rows come off a server-side cursor in batches
+of 5000, so API memory stays flat whatever the range. Pass `page_size` to
+split a large export: each page ends at a fixed `(event_ts, incident_id)`
+key, and its `X-Next-Cursor` header is the `cursor` of the next request
+(absent on the last page). Rows loaded between pages never shift or repeat
+a page.
+
+```bash
+curl -s -D headers.txt -X POST localhost:8000/api/historical/export \
+  -H 'Content-Type: application/json' \
+  -d '{"start_date": "2020-01-01", "end_date": "2024-12-31", "format": "csv", "page_size": 100000}' \
+  > page1.csv
+```
+
+## 🧮 Columnar Responses
+
+`POST /api/historical` and `POST /api/grids/{grid_id}/forecast` return one
+object per row by default. Add `?format=columnar` (or
+`Accept: application/vnd.crime-forecast.columnar+json`) to get
+`{"row_count": n, "columns": {"name": [...], ...}}`, encoded with orjson
+straight from the DB rows or forecast arrays, without a response model per
+row. `?format=arrow` (or `Accept: application/vnd.apache.arrow.stream`)
+returns the same columns as an Arrow IPC stream, e.g. for
+`pyarrow.ipc.open_stream(response.content).read_all()`.
+
 ## 🌐 API Endpoints
 
 - `GET /health` - Health check
 - `GET /grids/{grid_id}/forecast` - Get crime forecast for grid
+- `POST /grids/forecast` - Forecast many grids (`grid_ids` or `bbox`) as columns:
+  one feature query and one vectorised model call for all of them
 - `GET /grids/nearby` - Find grids near coordinates
-- `GET /historical` - Query historical crime data
+- `GET /historical` - Query historical crime data (`?format=columnar|arrow` for columns)
+- `POST /historical/export` - Stream historical data as NDJSON, CSV or Arrow IPC,
+  with `page_size` and `cursor` keyset continuation (`X-Next-Cursor` header)
 - `GET /explain` - Get SHAP explanations
 
 ## 📊 Features
@@ -235,6 +466,21 @@ MYSQL_USER=crime_user
 MYSQL_PASSWORD=change_this_password
 MYSQL_ROOT_PASSWORD=change_root_password
 
+# Read replicas (JSON list of SQLAlchemy URLs) and pool size per workload class
+REPLICA_URLS=[]
+INTERACTIVE_POOL_SIZE=10
+ANALYTICS_POOL_SIZE=5
+EXPORT_POOL_SIZE=2
+
+# Response cache: memory (per-process LRU), redis or none
+CACHE_BACKEND=memory
+CACHE_TTL_SECONDS=300
+CACHE_MAX_ENTRIES=10000
+REDIS_URL=redis://redis:6379/0
+
+# Memory-mapped forecast runs written by models/batch_forecast.py
+FORECAST_STORE_DIR=/models/forecasts/
+
 # API Configuration
 API_HOST=0.0.0.0
 API_PORT=8000
@@ -260,6 +506,7 @@ services:
       MYSQL_DATABASE: ${MYSQL_DATABASE}
       MYSQL_USER: ${MYSQL_USER}
       MYSQL_PASSWORD: ${MYSQL_PASSWORD}
+    command: --local-infile=1
     ports:
       - "3306:3306"
     volumes:
@@ -285,6 +532,9 @@ services:
       MYSQL_USER: ${MYSQL_USER}
       MYSQL_PASSWORD: ${MYSQL_PASSWORD}
       SECRET_KEY: ${SECRET_KEY}
+      CACHE_BACKEND: ${CACHE_BACKEND:-memory}
+      REDIS_URL: ${REDIS_URL:-redis://redis:6379/0}
+      FORECAST_STORE_DIR: /models/forecasts/
     ports:
       - "8000:8000"
     volumes:
@@ -297,6 +547,17 @@ services:
       - crime_network
     command: uvicorn main:app --host 0.0.0.0 --port 8000 --reload
 
+  # Optional shared response cache: docker-compose --profile cache up
+  redis:
+    image: redis:7-alpine
+    container_name: chicago_crime_redis
+    profiles: ["cache"]
+    command: redis-server --maxmemory 256mb --maxmemory-policy allkeys-lru
+    ports:
+      - "6379:6379"
+    networks:
+      - crime_network
+
   frontend:
     build:
       context: ./frontend
@@ -7,16 +7,31 @@ etl_download = """#!/usr/bin/env python3
 Download Chicago Crime Dataset from Kaggle or Chicago Data Portal
 \"\"\"
 import os
+import json
+import time
+import shutil
+import argparse
+import threading
 import requests
 import pandas as pd
+import pyarrow.compute as pc
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from storage import (RAW_DATASET, DELTA_RAW_DATASET, raw_table, write_table,
+                     open_dataset)
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
 # Chicago Data Portal API endpoint
 CHICAGO_API_URL = "https://data.cityofchicago.org/resource/ijzp-q8t2.json"
-OUTPUT_FILE = DATA_DIR / "chicago_crimes_raw.csv"
+
+# Keyset downloader working files
+PARTS_DIR = DATA_DIR / "raw_parts"
+CHECKPOINT_FILE = DATA_DIR / "download_checkpoint.json"
+
+# Incremental mode: records changed since the last loaded watermark
+WATERMARK_FILE = DATA_DIR / "watermark.json"
 
 def download_from_chicago_portal(limit=100000):
     \"\"\"Download data from Chicago Data Portal API\"\"\"
@@ -51,13 +66,237 @@ def download_from_chicago_portal(limit=100000):
     
     # Convert to DataFrame
     df = pd.DataFrame(all_data)
-    df.to_csv(OUTPUT_FILE, index=False)
-    print(f"Saved to {OUTPUT_FILE}")
+    write_table(raw_table(all_data), RAW_DATASET)
+    print(f"Saved to {RAW_DATASET}")
     print(f"Shape: {df.shape}")
     print(f"\\nColumns: {list(df.columns)}")
     
     return df
 
+def _get_json(session, api_url, params, max_retries=3):
+    \"\"\"GET a Socrata endpoint, retrying transient failures with backoff\"\"\"
+    for attempt in range(max_retries):
+        try:
+            response = session.get(api_url, params=params, timeout=120)
+            if response.status_code == 200:
+                return response.json()
+            error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+        print(f"Request failed ({error}), retry {attempt + 1}/{max_retries}...")
+        time.sleep(2 ** attempt)
+    raise RuntimeError(f"Giving up on {api_url} with params {params}")
+
+def _and_where(*clauses):
+    \"\"\"Join non-empty SoQL $where clauses with AND\"\"\"
+    return " AND ".join(f"({c})" for c in clauses if c)
+
+def get_id_bounds(session, api_url=CHICAGO_API_URL, where=None):
+    \"\"\"Return the (min, max) incident id matching the optional filter\"\"\"
+    params = {"$select": "min(id) AS min_id, max(id) AS max_id"}
+    if where:
+        params["$where"] = where
+    rows = _get_json(session, api_url, params)
+    if not rows or rows[0].get('min_id') is None:
+        return None, None
+    return int(rows[0]['min_id']), int(rows[0]['max_id'])
+
+def split_id_ranges(min_id, max_id, n_ranges):
+    \"\"\"Split [min_id, max_id] into contiguous half-open (lo, hi] id ranges\"\"\"
+    span = max_id - min_id + 1
+    n_ranges = max(1, min(n_ranges, span))
+    step = -(-span // n_ranges)
+    ranges = []
+    lo = min_id - 1
+    while lo < max_id:
+        hi = min(lo + step, max_id)
+        ranges.append({"lo": lo, "hi": hi, "last_id": lo, "pages": 0, "done": False})
+        lo = hi
+    return ranges
+
+def load_checkpoint(checkpoint_file=CHECKPOINT_FILE):
+    \"\"\"Load a saved download checkpoint, or None\"\"\"
+    if not Path(checkpoint_file).exists():
+        return None
+    with open(checkpoint_file) as f:
+        return json.load(f)
+
+def save_checkpoint(state, checkpoint_file=CHECKPOINT_FILE):
+    \"\"\"Atomically persist the download checkpoint\"\"\"
+    tmp_file = Path(str(checkpoint_file) + ".tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, checkpoint_file)
+
+def write_page(rows, parts_dir, index, page):
+    \"\"\"Write one page of API records into the partitioned staging dataset\"\"\"
+    # Fixed file names make a re-fetched page overwrite its partial copy
+    write_table(raw_table(rows), parts_dir, mode='append',
+                basename_template=f"part-{index:05d}-{page:06d}-{{i}}.parquet")
+
+def _download_range(api_url, state, index, where, page_size,
+                    parts_dir, lock, checkpoint_file):
+    \"\"\"Keyset-page through one id range, checkpointing after every page\"\"\"
+    session = requests.Session()
+    id_range = state["ranges"][index]
+    downloaded = 0
+
+    while not id_range["done"]:
+        params = {
+            "$where": _and_where(
+                where,
+                f"id > {id_range['last_id']} AND id <= {id_range['hi']}"
+            ),
+            "$order": "id",
+            "$limit": page_size
+        }
+        rows = _get_json(session, api_url, params)
+
+        if rows:
+            write_page(rows, parts_dir, index, id_range['pages'])
+
+        with lock:
+            if rows:
+                id_range["last_id"] = int(rows[-1]['id'])
+                id_range["pages"] += 1
+                downloaded += len(rows)
+            if len(rows) < page_size:
+                id_range["done"] = True
+            save_checkpoint(state, checkpoint_file)
+
+    return downloaded
+
+def publish_parts(parts_dir=PARTS_DIR, output_dataset=RAW_DATASET):
+    \"\"\"Swap the completed staging dataset in as the stage output\"\"\"
+    shutil.rmtree(output_dataset, ignore_errors=True)
+    os.replace(parts_dir, output_dataset)
+
+def download_keyset(workers=8, page_size=50000, where=None,
+                    api_url=CHICAGO_API_URL, parts_dir=PARTS_DIR,
+                    checkpoint_file=CHECKPOINT_FILE, output_dataset=RAW_DATASET):
+    \"\"\"
+    Download the full dataset with parallel keyset paging.
+
+    The id space is split into ranges that are paged concurrently with
+    `$where id > last_id`, each page is streamed into a year/month
+    partitioned staging dataset and progress is checkpointed, so an
+    interrupted run resumes where it stopped.
+    \"\"\"
+    print(f"Downloading data from Chicago Data Portal (keyset, {workers} workers)...")
+    print(f"API: {api_url}")
+
+    parts_dir = Path(parts_dir)
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    state = load_checkpoint(checkpoint_file)
+    if state and state.get("where") == where and state.get("api_url") == api_url:
+        remaining = sum(not r["done"] for r in state["ranges"])
+        print(f"Resuming from checkpoint: {remaining} of {len(state['ranges'])} ranges left")
+    else:
+        shutil.rmtree(parts_dir)
+        parts_dir.mkdir(parents=True)
+        min_id, max_id = get_id_bounds(requests.Session(), api_url, where)
+        if min_id is None:
+            print("No records match, nothing to download")
+            return 0
+        state = {
+            "api_url": api_url,
+            "where": where,
+            "ranges": split_id_ranges(min_id, max_id, workers * 4)
+        }
+        save_checkpoint(state, checkpoint_file)
+        print(f"Id range {min_id}..{max_id} split into {len(state['ranges'])} ranges")
+
+    lock = threading.Lock()
+    pending = [i for i, r in enumerate(state["ranges"]) if not r["done"]]
+    start = time.time()
+    downloaded = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_download_range, api_url, state, i, where,
+                        page_size, parts_dir, lock, checkpoint_file)
+            for i in pending
+        ]
+        for future in as_completed(futures):
+            downloaded += future.result()
+            done = sum(r["done"] for r in state["ranges"])
+            print(f"Ranges complete: {done}/{len(state['ranges'])} "
+                  f"({downloaded} records this run)")
+
+    elapsed = time.time() - start
+    print(f"Downloaded {downloaded} records in {elapsed:.1f}s")
+
+    # Run finished cleanly, so the next call starts fresh
+    publish_parts(parts_dir, output_dataset)
+    Path(checkpoint_file).unlink()
+
+    rows = open_dataset(output_dataset).count_rows()
+    print(f"Saved {rows} records to {output_dataset}")
+
+    return rows
+
+def load_watermark(watermark_file=WATERMARK_FILE):
+    \"\"\"Load the ingestion watermark state\"\"\"
+    if not Path(watermark_file).exists():
+        return {"updated_on": None, "pending": None}
+    with open(watermark_file) as f:
+        return json.load(f)
+
+def save_watermark(state, watermark_file=WATERMARK_FILE):
+    \"\"\"Atomically persist the ingestion watermark state\"\"\"
+    tmp_file = Path(str(watermark_file) + ".tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, watermark_file)
+
+def commit_watermark(watermark_file=WATERMARK_FILE):
+    \"\"\"Advance the watermark once the pending delta has been loaded\"\"\"
+    state = load_watermark(watermark_file)
+    if state.get("pending"):
+        state["updated_on"] = state["pending"]
+        state["pending"] = None
+        save_watermark(state, watermark_file)
+        print(f"Watermark advanced to {state['updated_on']}")
+    return state["updated_on"]
+
+def max_updated_on(dataset_path):
+    \"\"\"Return the newest updated_on value in a raw dataset\"\"\"
+    # Socrata floating timestamps sort lexically
+    updated_on = open_dataset(dataset_path).to_table(columns=['updated_on'])['updated_on']
+    return pc.max(updated_on).as_py()
+
+def download_incremental(workers=8, api_url=CHICAGO_API_URL,
+                         output_dataset=DELTA_RAW_DATASET, watermark_file=WATERMARK_FILE):
+    \"\"\"
+    Download only incidents created or updated since the watermark.
+
+    The new watermark is stored as pending and only becomes current after
+    load_to_mysql has upserted the delta, so a failed run is re-fetched.
+    \"\"\"
+    state = load_watermark(watermark_file)
+    watermark = state.get("updated_on")
+
+    if watermark:
+        print(f"Fetching records updated on or after {watermark}")
+        # >= re-fetches the boundary records; the upsert makes that harmless
+        where = f"updated_on >= '{watermark}'"
+    else:
+        print("No watermark yet, fetching full history")
+        where = None
+
+    rows = download_keyset(workers=workers, where=where, api_url=api_url,
+                           output_dataset=output_dataset)
+    if rows:
+        state["pending"] = max_updated_on(output_dataset)
+        save_watermark(state, watermark_file)
+        print(f"Pending watermark: {state['pending']}")
+    else:
+        # Leave an empty delta so downstream stages have nothing to do
+        write_table(raw_table([]), output_dataset)
+
+    return rows
+
 def download_from_kaggle():
     \"\"\"
     Download from Kaggle (requires kaggle API setup)
@@ -79,18 +318,30 @@ def download_from_kaggle():
         return download_from_chicago_portal()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Download Chicago crime data')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Fetch only records updated since the last watermark')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Parallel download workers')
+    args = parser.parse_args()
+
     print("=" * 70)
     print("CHICAGO CRIME DATA DOWNLOADER")
     print("=" * 70)
     
-    # Try Kaggle first, fallback to API
-    choice = input("Download from (1) Kaggle or (2) Chicago Portal? [1/2]: ")
-    
-    if choice == "1":
-        download_from_kaggle()
+    if args.incremental:
+        download_incremental(workers=args.workers)
     else:
-        limit = int(input("How many records to download? [default 100000]: ") or 100000)
-        download_from_chicago_portal(limit)
+        # Try Kaggle first, fallback to API
+        choice = input("Download from (1) Kaggle, (2) Chicago Portal or (3) Chicago Portal full history? [1/2/3]: ")
+    
+        if choice == "1":
+            download_from_kaggle()
+        elif choice == "3":
+            download_keyset(workers=args.workers)
+        else:
+            limit = int(input("How many records to download? [default 100000]: ") or 100000)
+            download_from_chicago_portal(limit)
     
     print("\\n✅ Download complete!")
 """
@@ -101,16 +352,19 @@ Clean and preprocess Chicago crime data
 \"\"\"
 import pandas as pd
 import numpy as np
-from pathlib import Path
+import shutil
+import argparse
 from datetime import datetime
+from storage import (RAW_DATASET, CLEANED_DATASET, DELTA_RAW_DATASET,
+                     DELTA_CLEANED_DATASET, RAW_SCHEMA, open_dataset,
+                     read_dataset, write_dataset, has_data)
 
-DATA_DIR = Path(__file__).parent.parent / "data"
-INPUT_FILE = DATA_DIR / "chicago_crimes_raw.csv"
-OUTPUT_FILE = DATA_DIR / "chicago_crimes_cleaned.csv"
+DEFAULT_CHUNKSIZE = 500000
 
-def clean_data(df):
+def clean_data(df, verbose=True):
     \"\"\"Clean the raw crime data\"\"\"
-    print(f"Initial shape: {df.shape}")
+    if verbose:
+        print(f"Initial shape: {df.shape}")
     
     # Rename columns to standard format
     column_mapping = {
@@ -140,7 +394,8 @@ def clean_data(df):
     df = df.rename(columns=column_mapping)
     
     # Drop rows with missing critical fields
-    print("Removing rows with missing coordinates...")
+    if verbose:
+        print("Removing rows with missing coordinates...")
     df = df.dropna(subset=['latitude', 'longitude'])
     
     # Drop rows with invalid coordinates
@@ -149,7 +404,8 @@ def clean_data(df):
             (df['longitude'].between(-87.9, -87.5))]
     
     # Parse datetime
-    print("Parsing timestamps...")
+    if verbose:
+        print("Parsing timestamps...")
     df['event_ts'] = pd.to_datetime(df['event_ts'], errors='coerce')
     df = df.dropna(subset=['event_ts'])
     
@@ -173,29 +429,90 @@ def clean_data(df):
     df['primary_type'] = df['primary_type'].fillna('UNKNOWN').str.upper()
     df['description'] = df['description'].fillna('').str.upper()
     
-    print(f"Final shape: {df.shape}")
-    print(f"Date range: {df['event_ts'].min()} to {df['event_ts'].max()}")
-    print(f"\\nCrime types: {df['primary_type'].nunique()}")
-    print(df['primary_type'].value_counts().head(10))
+    if verbose:
+        print(f"Final shape: {df.shape}")
+        print(f"Date range: {df['event_ts'].min()} to {df['event_ts'].max()}")
+        print(f"\\nCrime types: {df['primary_type'].nunique()}")
+        print(df['primary_type'].value_counts().head(10))
     
     return df
 
+def clean_data_chunked(input_dataset, output_dataset, chunksize=DEFAULT_CHUNKSIZE):
+    \"\"\"
+    Clean the raw dataset in fixed-size chunks, appending each to the output.
+
+    Applies the same rules as clean_data, but only one chunk is ever held in
+    memory, so peak memory is bounded by chunksize rather than the data size.
+    \"\"\"
+    print(f"Cleaning {input_dataset} in chunks of {chunksize} rows...")
+    
+    rows_in = rows_out = 0
+    min_ts = max_ts = None
+    type_counts = pd.Series(dtype='int64')
+    
+    shutil.rmtree(output_dataset, ignore_errors=True)
+    if not has_data(input_dataset):
+        # e.g. an incremental run on a night without changes
+        print("No input rows")
+        return 0
+    
+    batches = open_dataset(input_dataset).to_batches(columns=RAW_SCHEMA.names,
+                                                     batch_size=chunksize)
+    for i, batch in enumerate(batches):
+        chunk = batch.to_pandas()
+        rows_in += len(chunk)
+        cleaned = clean_data(chunk, verbose=False)
+        write_dataset(cleaned, output_dataset, mode='append',
+                      basename_template=f"chunk-{i:05d}-{{i}}.parquet")
+        
+        # Running summary instead of a full-frame one
+        rows_out += len(cleaned)
+        if not cleaned.empty:
+            chunk_min, chunk_max = cleaned['event_ts'].min(), cleaned['event_ts'].max()
+            min_ts = chunk_min if min_ts is None else min(min_ts, chunk_min)
+            max_ts = chunk_max if max_ts is None else max(max_ts, chunk_max)
+            type_counts = type_counts.add(cleaned['primary_type'].value_counts(), fill_value=0)
+        print(f"Chunk {i + 1}: {rows_in} rows read, {rows_out} kept")
+    
+    print(f"Final rows: {rows_out} of {rows_in}")
+    print(f"Date range: {min_ts} to {max_ts}")
+    print(f"\\nCrime types: {len(type_counts)}")
+    print(type_counts.astype(int).sort_values(ascending=False).head(10))
+    
+    return rows_out
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Clean Chicago crime data')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Clean only the downloaded delta')
+    parser.add_argument('--chunked', action='store_true',
+                        help='Stream the raw file in chunks with bounded memory')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='Rows per chunk in --chunked mode')
+    args = parser.parse_args()
+
+    input_dataset = DELTA_RAW_DATASET if args.incremental else RAW_DATASET
+    output_dataset = DELTA_CLEANED_DATASET if args.incremental else CLEANED_DATASET
+
     print("=" * 70)
     print("CHICAGO CRIME DATA CLEANING")
     print("=" * 70)
     
-    # Load raw data
-    print(f"Loading data from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE, low_memory=False)
+    if args.chunked:
+        clean_data_chunked(input_dataset, output_dataset, args.chunksize)
+        print(f"\\n✅ Cleaned data saved to {output_dataset}")
+    else:
+        # Load raw data
+        print(f"Loading data from {input_dataset}...")
+        df = read_dataset(input_dataset)
     
-    # Clean data
-    df_cleaned = clean_data(df)
+        # Clean data
+        df_cleaned = clean_data(df) if not df.empty else df
     
-    # Save cleaned data
-    df_cleaned.to_csv(OUTPUT_FILE, index=False)
-    print(f"\\n✅ Cleaned data saved to {OUTPUT_FILE}")
-    print(f"Shape: {df_cleaned.shape}")
+        # Save cleaned data
+        write_dataset(df_cleaned, output_dataset)
+        print(f"\\n✅ Cleaned data saved to {output_dataset}")
+        print(f"Shape: {df_cleaned.shape}")
 """
 
 etl_features = """#!/usr/bin/env python3
@@ -205,11 +522,13 @@ Feature engineering for crime prediction
 import pandas as pd
 import numpy as np
 import pygeohash as pgh
-from pathlib import Path
-
-DATA_DIR = Path(__file__).parent.parent / "data"
-INPUT_FILE = DATA_DIR / "chicago_crimes_cleaned.csv"
-OUTPUT_FILE = DATA_DIR / "chicago_crimes_features.csv"
+import argparse
+from geohash_vec import encode as encode_geohashes
+from temporal import season, time_of_day, is_holiday
+from lag_panel import rolling_features
+from storage import (CLEANED_DATASET, FEATURES_DATASET, DELTA_CLEANED_DATASET,
+                     DELTA_FEATURES_DATASET, read_dataset, write_dataset,
+                     upsert_partitions)
 
 def create_grid_id(lat, lon, precision=6):
     \"\"\"Create grid ID from lat/lon using geohash\"\"\"
@@ -219,15 +538,11 @@ def add_spatial_features(df):
     \"\"\"Add geohash-based spatial features\"\"\"
     print("Creating spatial features...")
     
-    # Create geohashes at different precisions
-    df['geohash6'] = df.apply(
-        lambda x: create_grid_id(x['latitude'], x['longitude'], 6), 
-        axis=1
-    )
-    df['geohash8'] = df.apply(
-        lambda x: create_grid_id(x['latitude'], x['longitude'], 8), 
-        axis=1
-    )
+    # Create geohashes at different precisions in one vectorized pass
+    geohashes = encode_geohashes(df['latitude'].to_numpy(), df['longitude'].to_numpy(),
+                                 precisions=(6, 8))
+    df['geohash6'] = geohashes[6]
+    df['geohash8'] = geohashes[8]
     
     # Use geohash6 as primary grid_id
     df['grid_id'] = df['geohash6']
@@ -241,93 +556,2670 @@ def add_temporal_features(df):
     
     # Already have: event_hour, day_of_week, month, is_weekend
     
-    # Add season
-    df['season'] = df['month'].apply(lambda m: 
-        'Winter' if m in [12, 1, 2] else
-        'Spring' if m in [3, 4, 5] else
-        'Summer' if m in [6, 7, 8] else 'Fall'
-    )
+    # Season, holiday and time of day via lookup tables instead of per-row lambdas
+    df['season'] = season(df['month'].to_numpy())
     
-    # Is holiday (simplified)
-    df['is_holiday'] = df['event_date'].apply(lambda d:
-        d.month == 12 and d.day == 25 or  # Christmas
-        d.month == 1 and d.day == 1 or     # New Year
-        d.month == 7 and d.day == 4        # Independence Day
-    ).astype(int)
+    # Federal and Illinois holidays, including observed days off
+    df['is_holiday'] = is_holiday(df['event_date'].to_numpy())
     
     # Time of day categories
-    df['time_of_day'] = df['event_hour'].apply(lambda h:
-        'Night' if h < 6 else
-        'Morning' if h < 12 else
-        'Afternoon' if h < 18 else 'Evening'
-    )
+    df['time_of_day'] = time_of_day(df['event_hour'].to_numpy())
     
     return df
 
-def add_lag_features(df):
-    \"\"\"Add rolling count features\"\"\"
-    print("Creating lag features (this may take time)...")
+def add_lag_features(df, history=None):
+    \"\"\"
+    Add rolling count features
+
+    Windows are calendar days and hours of a dense grid x time panel, so a
+    7-day window covers 7 days even where a grid had none. history: already
+    loaded (grid_id, event_ts) rows that count towards the windows but are
+    not part of df, used by incremental runs.
+    \"\"\"
+    print("Creating lag features...")
     
     # Sort by grid and time
-    df = df.sort_values(['grid_id', 'event_ts'])
-    
-    # Group by grid_id and date
-    daily_counts = df.groupby(['grid_id', 'event_date']).size().reset_index(name='daily_count')
-    
-    # Calculate rolling counts
-    daily_counts = daily_counts.sort_values(['grid_id', 'event_date'])
-    
-    for window in [1, 7, 30]:
-        daily_counts[f'rolling_{window}d'] = daily_counts.groupby('grid_id')['daily_count'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).sum()
-        )
-    
-    # Merge back to main dataframe
-    df = df.merge(daily_counts[['grid_id', 'event_date', 'rolling_1d', 'rolling_7d', 'rolling_30d']], 
-                  on=['grid_id', 'event_date'], 
-                  how='left')
+    df = df.sort_values(['grid_id', 'event_ts']).reset_index(drop=True)
     
-    # Fill NaN with 0
-    df[['rolling_1d', 'rolling_7d', 'rolling_30d']] = df[['rolling_1d', 'rolling_7d', 'rolling_30d']].fillna(0)
+    # Rolling counts come back positionally aligned with df, no key merge needed
+    rolling = rolling_features(df['grid_id'], df['event_ts'], history)
+    for column in rolling.columns:
+        df[column] = rolling[column].to_numpy()
     
     return df
 
-def add_crime_type_features(df):
-    \"\"\"Add crime type encoding and frequency features\"\"\"
+def add_crime_type_features(df, prior_totals=None):
+    \"\"\"
+    Add crime type encoding and frequency features
+
+    prior_totals: per-grid counts of already loaded incidents not in df,
+    used by incremental runs.
+    \"\"\"
     print("Creating crime type features...")
     
     # Crime type frequency per grid
     crime_freq = df.groupby(['grid_id', 'primary_type']).size().reset_index(name='type_freq')
     top_crimes = crime_freq.groupby('grid_id')['type_freq'].sum().reset_index(name='total_crimes')
     
+    if prior_totals is not None:
+        top_crimes['total_crimes'] += top_crimes['grid_id'].map(prior_totals).fillna(0).astype(int)
+    
     df = df.merge(top_crimes, on='grid_id', how='left')
     df['total_crimes'] = df['total_crimes'].fillna(0)
     
     return df
 
+def load_history_context(df, window_days=30):
+    \"\"\"
+    Fetch the already loaded incidents an incremental delta depends on.
+
+    Returns the (grid_id, event_ts) rows inside the longest rolling window
+    before the delta, and the lifetime counts of the touched grids, both
+    excluding incidents that the delta replaces. Only the grids in the delta
+    are read, through the (grid_id, event_date, event_hour) index.
+    \"\"\"
+    from sqlalchemy import text, bindparam
+    from load_to_mysql import get_engine
+
+    grids = df['grid_id'].unique().tolist()
+    ids = df['incident_id'].unique().tolist()
+    start_date = (df['event_date'].min() - pd.Timedelta(days=window_days - 1)).date()
+
+    history_query = text(\"\"\"
+        SELECT incident_id, grid_id, event_ts
+        FROM incidents
+        WHERE grid_id IN :grids
+        AND event_date >= :start_date
+    \"\"\").bindparams(bindparam('grids', expanding=True))
+
+    totals_query = text(\"\"\"
+        SELECT grid_id, COUNT(*) AS n
+        FROM incidents
+        WHERE grid_id IN :grids
+        GROUP BY grid_id
+    \"\"\").bindparams(bindparam('grids', expanding=True))
+
+    replaced_query = text(\"\"\"
+        SELECT grid_id, COUNT(*) AS n
+        FROM incidents
+        WHERE incident_id IN :ids
+        GROUP BY grid_id
+    \"\"\").bindparams(bindparam('ids', expanding=True))
+
+    engine = get_engine()
+    with engine.connect() as conn:
+        history = pd.read_sql(history_query, conn,
+                              params={"grids": grids, "start_date": start_date},
+                              parse_dates=['event_ts'])
+        totals = pd.read_sql(totals_query, conn, params={"grids": grids})
+        replaced = pd.read_sql(replaced_query, conn, params={"ids": ids})
+
+    history = history[~history['incident_id'].isin(ids)]
+    prior_totals = totals.set_index('grid_id')['n'].sub(
+        replaced.set_index('grid_id')['n'], fill_value=0
+    )
+
+    print(f"History context: {len(history)} rows across {len(grids)} grids")
+    return history, prior_totals
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Engineer crime prediction features')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Build features for the cleaned delta only')
+    args = parser.parse_args()
+
+    input_dataset = DELTA_CLEANED_DATASET if args.incremental else CLEANED_DATASET
+    output_dataset = DELTA_FEATURES_DATASET if args.incremental else FEATURES_DATASET
+
     print("=" * 70)
     print("CHICAGO CRIME FEATURE ENGINEERING")
     print("=" * 70)
     
     # Load cleaned data
-    print(f"Loading data from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE, parse_dates=['event_ts', 'event_date'])
+    print(f"Loading data from {input_dataset}...")
+    df = read_dataset(input_dataset)
     
     # Add features
-    df = add_spatial_features(df)
-    df = add_temporal_features(df)
-    df = add_lag_features(df)
-    df = add_crime_type_features(df)
+    if args.incremental and df.empty:
+        print("No changed incidents in the delta")
+    elif args.incremental:
+        df = add_spatial_features(df)
+        df = add_temporal_features(df)
+        history, prior_totals = load_history_context(df)
+        df = add_lag_features(df, history)
+        df = add_crime_type_features(df, prior_totals)
+    else:
+        df = add_spatial_features(df)
+        df = add_temporal_features(df)
+        df = add_lag_features(df)
+        df = add_crime_type_features(df)
     
     # Save feature-engineered data
-    df.to_csv(OUTPUT_FILE, index=False)
-    print(f"\\n✅ Feature-engineered data saved to {OUTPUT_FILE}")
+    write_dataset(df, output_dataset)
+    print(f"\\n✅ Feature-engineered data saved to {output_dataset}")
+    
+    if args.incremental and not df.empty:
+        # Keep the training dataset current, rewriting only the touched months
+        touched = upsert_partitions(df, FEATURES_DATASET)
+        print(f"Merged {len(df)} rows into {touched} partitions of {FEATURES_DATASET}")
     print(f"Shape: {df.shape}")
     print(f"Columns: {list(df.columns)}")
 """
 
+etl_load = """#!/usr/bin/env python3
+\"\"\"
+Load feature-engineered Chicago crime data into MySQL
+\"\"\"
+import os
+import json
+import time
+import argparse
+import tempfile
+import pandas as pd
+from pathlib import Path
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import create_engine, text
+from download_data import commit_watermark
+from partitions import ensure_partitions
+from refresh_aggregates import create_touched_table, refresh_touched, rebuild_aggregates
+from storage import (DATA_DIR, FEATURES_DATASET, DELTA_FEATURES_DATASET,
+                     open_dataset, read_dataset, list_partitions, superseded)
+
+# Columns of the incidents table filled by the ETL
+INCIDENT_COLUMNS = [
+    'incident_id', 'case_number', 'iucr', 'primary_type', 'description',
+    'district', 'community_area', 'beat', 'grid_id', 'geohash6', 'geohash8',
+    'latitude', 'longitude', 'event_ts', 'event_date', 'event_hour',
+    'day_of_week', 'is_weekend', 'arrest', 'domestic', 'reported_year'
+]
+
+# DATE columns, written without a time part in load files
+DATE_COLUMNS = ['event_date']
+
+# Secondary indexes dropped for a bulk load, kept here until they are rebuilt
+DEFERRED_INDEXES_FILE = DATA_DIR / "deferred_indexes.json"
+
+# One JSON line per bulk load, to track throughput across releases
+LOAD_METRICS_FILE = DATA_DIR / "load_metrics.jsonl"
+
+def get_engine(local_infile=False):
+    \"\"\"Create a MySQL engine from the same MYSQL_* settings as the API\"\"\"
+    url = "mysql+pymysql://{user}:{password}@{host}:{port}/{database}".format(
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "password"),
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        port=os.getenv("MYSQL_PORT", "3306"),
+        database=os.getenv("MYSQL_DATABASE", "chicago_crime")
+    )
+    connect_args = {"local_infile": True} if local_infile else {}
+    return create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+
+def prepare_incidents(df):
+    \"\"\"Select and order the columns stored in the incidents table\"\"\"
+    df = df.drop_duplicates('incident_id', keep='last')
+    return df[INCIDENT_COLUMNS]
+
+def local_infile_enabled(engine):
+    \"\"\"Whether the server accepts LOAD DATA LOCAL INFILE\"\"\"
+    with engine.connect() as conn:
+        return bool(conn.execute(text("SELECT @@GLOBAL.local_infile")).scalar())
+
+def secondary_indexes(conn):
+    \"\"\"Secondary index definitions of incidents: {name: {columns, unique}}\"\"\"
+    rows = conn.execute(text(\"\"\"
+        SELECT index_name, column_name, non_unique
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+        AND table_name = 'incidents'
+        AND index_name <> 'PRIMARY'
+        ORDER BY index_name, seq_in_index
+    \"\"\")).fetchall()
+    indexes = {}
+    for name, column, non_unique in rows:
+        index = indexes.setdefault(name, {"columns": [], "unique": not non_unique})
+        index["columns"].append(column)
+    return indexes
+
+def drop_indexes(conn, indexes):
+    \"\"\"Drop secondary indexes in one ALTER TABLE\"\"\"
+    if indexes:
+        conn.execute(text("ALTER TABLE incidents " + ", ".join(
+            f"DROP INDEX {name}" for name in indexes)))
+
+def build_indexes(conn, indexes):
+    \"\"\"Build secondary indexes in one ALTER TABLE, a single pass over the table\"\"\"
+    if indexes:
+        conn.execute(text("ALTER TABLE incidents " + ", ".join(
+            f"ADD {'UNIQUE ' if index['unique'] else ''}INDEX {name} ({', '.join(index['columns'])})"
+            for name, index in indexes.items())))
+
+def restore_deferred_indexes(engine, indexes_file=DEFERRED_INDEXES_FILE):
+    \"\"\"Rebuild indexes left dropped by an interrupted bulk load\"\"\"
+    if not Path(indexes_file).exists():
+        return
+    with open(indexes_file) as f:
+        deferred = json.load(f)
+    with engine.begin() as conn:
+        missing = {name: index for name, index in deferred.items()
+                   if name not in secondary_indexes(conn)}
+        print(f"Restoring {len(missing)} indexes left by an interrupted load...")
+        build_indexes(conn, missing)
+    Path(indexes_file).unlink()
+
+def write_load_file(rows, path):
+    \"\"\"Write rows as CSV for LOAD DATA: \\\\N for NULL, backslashes escaped\"\"\"
+    rows = rows.copy()
+    for column in rows.columns:
+        values = rows[column]
+        if column in DATE_COLUMNS:
+            rows[column] = pd.to_datetime(values).dt.strftime('%Y-%m-%d')
+        elif values.dtype == bool:
+            rows[column] = values.astype('int8')
+        elif pd.api.types.is_string_dtype(values):
+            rows[column] = values.str.replace('\\\\', '\\\\\\\\', regex=False)
+    rows.to_csv(path, index=False, header=False, na_rep='\\\\N',
+                date_format='%Y-%m-%d %H:%M:%S', lineterminator='\\n')
+
+def _insert_infile(cursor, rows):
+    \"\"\"Load rows through a temporary CSV and LOAD DATA LOCAL INFILE\"\"\"
+    with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+        path = f.name
+    try:
+        write_load_file(rows, path)
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE incidents "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\\"' ESCAPED BY '\\\\\\\\' "
+            "LINES TERMINATED BY '\\\\n' "
+            f"({', '.join(INCIDENT_COLUMNS)})"
+        )
+    finally:
+        os.unlink(path)
+
+def _insert_multirow(cursor, rows, batch_size):
+    \"\"\"Insert rows as multi-row INSERT statements of batch_size rows\"\"\"
+    statement = (
+        f"INSERT INTO incidents ({', '.join(INCIDENT_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(INCIDENT_COLUMNS))})"
+    )
+    values = rows.astype(object).where(rows.notna(), None)
+    for column in DATE_COLUMNS:
+        values[column] = pd.to_datetime(rows[column]).dt.date
+    for start in range(0, len(values), batch_size):
+        # pymysql folds executemany on an INSERT ... VALUES into multi-row statements
+        cursor.executemany(statement, list(
+            values.iloc[start:start + batch_size].itertuples(index=False, name=None)))
+
+def _bulk_load_partition(dataset, partition, method, batch_size, skip_ids):
+    \"\"\"Worker: load one feature partition into incidents on its own connection\"\"\"
+    rows = prepare_incidents(read_dataset(dataset, columns=INCIDENT_COLUMNS,
+                                          partitions=[partition]))
+    if skip_ids:
+        rows = rows[~rows['incident_id'].isin(skip_ids)]
+    if rows.empty:
+        return 0
+
+    engine = get_engine(local_infile=method == 'infile')
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # Nothing to check against during a load into a truncated table
+        cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+        if method == 'infile':
+            _insert_infile(cursor, rows)
+        else:
+            _insert_multirow(cursor, rows, batch_size)
+        connection.commit()
+    finally:
+        connection.close()
+        engine.dispose()
+    return len(rows)
+
+def stale_copies(dataset):
+    \"\"\"
+    Older copies of incidents present in more than one partition (see
+    storage.superseded). Returns {partition: [incident_id, ...]} of copies
+    to skip.
+    \"\"\"
+    table = open_dataset(dataset).to_table(
+        columns=['incident_id', 'updated_on', 'event_year', 'event_month'])
+    keys = table.to_pandas()
+    stale = keys[superseded(keys)]
+    return {
+        (int(year), int(month)): group['incident_id'].tolist()
+        for (year, month), group in stale.groupby(['event_year', 'event_month'])
+    }
+
+def prepare_partitions(engine, through=None):
+    \"\"\"Create the monthly incidents partitions a load needs, outside any transaction\"\"\"
+    with engine.connect() as conn:
+        created = ensure_partitions(conn, through)
+    if created:
+        print(f"Created {len(created)} incidents partitions ({created[0]} .. {created[-1]})")
+    return created
+
+def record_metrics(metrics, metrics_file=LOAD_METRICS_FILE):
+    \"\"\"Append one bulk load's throughput to the metrics log\"\"\"
+    with open(metrics_file, 'a') as f:
+        f.write(json.dumps(metrics) + "\\n")
+
+def bulk_load(dataset=FEATURES_DATASET, method='auto', workers=4, batch_size=5000):
+    \"\"\"
+    Replace incidents with a full extract as fast as the server allows.
+
+    Secondary indexes are dropped first and rebuilt in one pass once every
+    row is in, feature partitions are loaded concurrently, one connection
+    per worker, with LOAD DATA LOCAL INFILE when the server allows it or
+    batched multi-row INSERTs otherwise. Throughput is printed and appended
+    to the metrics log.
+    \"\"\"
+    partitions = list_partitions(dataset)
+    if not partitions:
+        print(f"No partitions in {dataset}, nothing to load")
+        return None
+
+    engine = get_engine()
+    restore_deferred_indexes(engine)
+    prepare_partitions(engine, through=date(*partitions[-1], 1))
+    if method == 'auto':
+        method = 'infile' if local_infile_enabled(engine) else 'multirow'
+    skip = stale_copies(dataset)
+    print(f"Bulk loading {len(partitions)} partitions from {dataset} "
+          f"({method}, {workers} workers)...")
+
+    with engine.begin() as conn:
+        indexes = secondary_indexes(conn)
+        # Remember the definitions before dropping, in case the load dies
+        with open(DEFERRED_INDEXES_FILE, 'w') as f:
+            json.dump(indexes, f, indent=2)
+        drop_indexes(conn, indexes)
+        conn.execute(text("TRUNCATE TABLE incidents"))
+
+    start = time.time()
+    rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_bulk_load_partition, dataset, p, method, batch_size, skip.get(p)): p
+            for p in partitions
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            rows += future.result()
+            elapsed = time.time() - start
+            print(f"Partitions loaded: {i}/{len(partitions)} "
+                  f"({rows:,} rows, {rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    load_seconds = time.time() - start
+
+    start = time.time()
+    with engine.begin() as conn:
+        build_indexes(conn, indexes)
+        conn.execute(text("ANALYZE TABLE incidents"))
+    DEFERRED_INDEXES_FILE.unlink()
+    index_seconds = time.time() - start
+
+    start = time.time()
+    with engine.begin() as conn:
+        grids = rebuild_aggregates(conn)
+    aggregate_seconds = time.time() - start
+    engine.dispose()
+
+    total_seconds = load_seconds + index_seconds
+    metrics = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "method": method,
+        "workers": workers,
+        "partitions": len(partitions),
+        "rows": rows,
+        "load_seconds": round(load_seconds, 2),
+        "index_seconds": round(index_seconds, 2),
+        "aggregate_seconds": round(aggregate_seconds, 2),
+        "rows_per_sec": round(rows / max(load_seconds, 1e-9)),
+        "end_to_end_rows_per_sec": round(rows / max(total_seconds, 1e-9))
+    }
+    record_metrics(metrics)
+
+    print(f"Loaded {rows:,} incidents in {load_seconds:.1f}s "
+          f"({metrics['rows_per_sec']:,} rows/s)")
+    print(f"Rebuilt {len(indexes)} indexes in {index_seconds:.1f}s, "
+          f"end to end {metrics['end_to_end_rows_per_sec']:,} rows/s")
+    print(f"Rebuilt grid aggregates for {grids} grids in {aggregate_seconds:.1f}s")
+    return metrics
+
+def _replace_rows(conn, rows, chunksize, month=None, refresh=True):
+    \"\"\"
+    Swap rows into incidents through a staging table, in the caller's transaction.
+
+    Existing rows with the same incident_id are deleted first; with month, a
+    (year, month) tuple, every other incident of that event month goes too.
+    With refresh, the grid_aggregates rows of every (grid_id, date) that
+    gained or lost an incident are refreshed in the same transaction.
+    Returns the number of deleted rows.
+    \"\"\"
+    columns = ", ".join(INCIDENT_COLUMNS)
+    conn.execute(text("DROP TEMPORARY TABLE IF EXISTS incidents_staging"))
+    conn.execute(text(
+        f"CREATE TEMPORARY TABLE incidents_staging AS "
+        f"SELECT {columns} FROM incidents WHERE 1 = 0"
+    ))
+    rows.to_sql('incidents_staging', conn, if_exists='append', index=False,
+                chunksize=chunksize, method='multi')
+    if refresh:
+        # Old and new positions of every replaced incident
+        create_touched_table(conn)
+        conn.execute(text(
+            "INSERT INTO agg_touched SELECT grid_id, event_date FROM incidents_staging"
+        ))
+        conn.execute(text(
+            "INSERT INTO agg_touched SELECT i.grid_id, i.event_date FROM incidents i "
+            "JOIN incidents_staging USING (incident_id)"
+        ))
+    if month is not None:
+        start = pd.Timestamp(*month, 1)
+        bounds = {"start": start.date(), "end": (start + pd.offsets.MonthBegin(1)).date()}
+        if refresh:
+            conn.execute(text(
+                "INSERT INTO agg_touched SELECT grid_id, event_date FROM incidents "
+                "WHERE event_date >= :start AND event_date < :end"
+            ), bounds)
+    deleted = conn.execute(text(
+        "DELETE incidents FROM incidents "
+        "JOIN incidents_staging USING (incident_id)"
+    )).rowcount
+    if month is not None:
+        deleted += conn.execute(
+            text("DELETE FROM incidents WHERE event_date >= :start AND event_date < :end"),
+            bounds
+        ).rowcount
+    conn.execute(text(
+        f"INSERT INTO incidents ({columns}) "
+        f"SELECT {columns} FROM incidents_staging"
+    ))
+    conn.execute(text("DROP TEMPORARY TABLE incidents_staging"))
+    if refresh:
+        refresh_touched(conn)
+    return deleted
+
+def upsert_incidents(df, engine, chunksize=10000):
+    \"\"\"
+    Upsert a delta into incidents keyed by incident_id.
+
+    The delta goes into a staging table first, then the matching rows are
+    replaced in a single transaction, together with the grid_aggregates rows
+    they affect. Delete-and-insert is used instead of ON DUPLICATE KEY so a
+    changed event_date moves the row between partitions.
+    \"\"\"
+    if df.empty:
+        print("No changed incidents to upsert")
+        return 0
+    rows = prepare_incidents(df)
+
+    with engine.begin() as conn:
+        deleted = _replace_rows(conn, rows, chunksize)
+
+    print(f"Upserted {len(rows)} incidents ({deleted} updated, {len(rows) - deleted} new)")
+    return len(rows)
+
+def replace_partition(df, engine, partition, chunksize=10000, refresh=True):
+    \"\"\"
+    Make one event month of incidents match a feature partition.
+
+    Used by the pipeline runner: the month's rows are replaced as a unit, so
+    incidents dropped from the partition disappear and ones that moved in
+    from another month are taken over by incident_id. The runner loads
+    months concurrently, so it passes refresh=False and refreshes the
+    aggregates once every month is in.
+    \"\"\"
+    rows = prepare_incidents(df)
+    with engine.begin() as conn:
+        _replace_rows(conn, rows, chunksize, month=partition, refresh=refresh)
+    return len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load crime data into MySQL')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Upsert only the feature-engineered delta')
+    parser.add_argument('--method', choices=['auto', 'infile', 'multirow'], default='auto',
+                        help='Bulk load with LOAD DATA LOCAL INFILE or multi-row INSERTs')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Partitions loaded concurrently')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Rows per multi-row INSERT')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("CHICAGO CRIME DATA LOADER")
+    print("=" * 70)
+
+    if args.incremental:
+        print(f"Loading data from {DELTA_FEATURES_DATASET}...")
+        df = read_dataset(DELTA_FEATURES_DATASET, columns=INCIDENT_COLUMNS)
+        engine = get_engine()
+        if not df.empty:
+            prepare_partitions(engine, through=pd.to_datetime(df['event_date']).max().date())
+        upsert_incidents(df, engine)
+        # Only advance the watermark once the delta is safely in MySQL
+        commit_watermark()
+    else:
+        bulk_load(FEATURES_DATASET, args.method, args.workers, args.batch_size)
+
+    print("\\n✅ Load complete!")
+"""
+
+etl_storage = """#!/usr/bin/env python3
+\"\"\"
+Partitioned Parquet datasets exchanged between ETL stages
+\"\"\"
+import json
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+# Stage outputs, each a hive-partitioned dataset: event_year=YYYY/event_month=M
+RAW_DATASET = DATA_DIR / "raw"
+CLEANED_DATASET = DATA_DIR / "cleaned"
+FEATURES_DATASET = DATA_DIR / "features"
+
+# Incremental runs exchange only the delta
+DELTA_RAW_DATASET = DATA_DIR / "delta_raw"
+DELTA_CLEANED_DATASET = DATA_DIR / "delta_cleaned"
+DELTA_FEATURES_DATASET = DATA_DIR / "delta_features"
+
+PARTITION_COLUMNS = ['event_year', 'event_month']
+PARTITIONING = ds.partitioning(
+    pa.schema([('event_year', pa.int16()), ('event_month', pa.int8())]),
+    flavor='hive'
+)
+
+# Low-cardinality strings stored dictionary-encoded
+DICTIONARY_COLUMNS = [
+    'primary_type', 'description', 'location_description', 'block', 'iucr',
+    'fbi_code', 'grid_id', 'geohash6', 'geohash8', 'season', 'time_of_day'
+]
+
+# Typed schema of the portal records, shared by every raw writer
+RAW_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('case_number', pa.string()),
+    ('date', pa.string()),
+    ('block', pa.string()),
+    ('iucr', pa.string()),
+    ('primary_type', pa.string()),
+    ('description', pa.string()),
+    ('location_description', pa.string()),
+    ('arrest', pa.bool_()),
+    ('domestic', pa.bool_()),
+    ('beat', pa.int64()),
+    ('district', pa.int64()),
+    ('ward', pa.int64()),
+    ('community_area', pa.int64()),
+    ('fbi_code', pa.string()),
+    ('x_coordinate', pa.float64()),
+    ('y_coordinate', pa.float64()),
+    ('year', pa.int64()),
+    ('updated_on', pa.string()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('location', pa.string())
+])
+
+def raw_table(records):
+    \"\"\"Convert portal JSON records into a typed, partitionable Arrow table\"\"\"
+    records = [
+        dict(r, location=json.dumps(r['location'])) if isinstance(r.get('location'), dict) else r
+        for r in records
+    ]
+    # Socrata returns numbers as strings, so load as text and cast
+    text_schema = pa.schema([
+        (f.name, f.type if pa.types.is_boolean(f.type) else pa.string())
+        for f in RAW_SCHEMA
+    ])
+    table = pa.Table.from_pylist(records, schema=text_schema).cast(RAW_SCHEMA)
+
+    # Partition on the event month of the floating timestamp, e.g. 2024-03-...
+    date = pc.fill_null(table['date'], '0000-00')
+    table = table.append_column(
+        'event_year', pc.cast(pc.utf8_slice_codeunits(date, 0, 4), pa.int16()))
+    table = table.append_column(
+        'event_month', pc.cast(pc.utf8_slice_codeunits(date, 5, 7), pa.int8()))
+    return table
+
+def to_table(df, ts_column='event_ts'):
+    \"\"\"Convert a stage DataFrame into a dictionary-encoded, partitionable table\"\"\"
+    df = df.copy()
+    ts = pd.to_datetime(df[ts_column])
+    df['event_year'] = ts.dt.year.astype('int16')
+    df['event_month'] = ts.dt.month.astype('int8')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for name in DICTIONARY_COLUMNS:
+        if name in table.column_names and not pa.types.is_dictionary(table[name].type):
+            index = table.column_names.index(name)
+            table = table.set_column(index, name, pc.dictionary_encode(table[name]))
+    return table
+
+def write_table(table, path, mode='overwrite', basename_template=None):
+    \"\"\"
+    Write a table that already carries partition columns.
+
+    mode: 'overwrite' replaces the whole dataset, 'append' adds files next to
+    the existing ones (use a unique basename_template), 'replace_partitions'
+    rewrites only the partitions present in the table.
+    \"\"\"
+    path = Path(path)
+    if mode == 'overwrite':
+        shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+
+    behavior = 'delete_matching' if mode == 'replace_partitions' else 'overwrite_or_ignore'
+    ds.write_dataset(
+        table,
+        path,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template=basename_template or 'part-{i}.parquet',
+        existing_data_behavior=behavior
+    )
+
+def write_dataset(df, path, ts_column='event_ts', mode='overwrite', basename_template=None):
+    \"\"\"Write a stage DataFrame as a year/month partitioned Parquet dataset\"\"\"
+    if df.empty:
+        # Nothing to write, but an overwrite still resets the dataset
+        if mode == 'overwrite':
+            shutil.rmtree(path, ignore_errors=True)
+            Path(path).mkdir(parents=True, exist_ok=True)
+        return
+    write_table(to_table(df, ts_column), path, mode, basename_template)
+
+def partition_filter(partitions):
+    \"\"\"Build a dataset filter that prunes to the given (year, month) partitions\"\"\"
+    expr = None
+    for year, month in partitions:
+        term = (ds.field('event_year') == year) & (ds.field('event_month') == month)
+        expr = term if expr is None else expr | term
+    return expr
+
+def partition_path(path, partition):
+    \"\"\"Directory of one (year, month) partition of a dataset\"\"\"
+    year, month = partition
+    return Path(path) / f"event_year={year}" / f"event_month={month}"
+
+def superseded(df, key='incident_id'):
+    \"\"\"
+    Mask of rows that are older copies of a key present more than once.
+
+    An incremental upsert can leave the previous copy of an incident whose
+    event month changed in another partition; the copy with the latest
+    updated_on wins, copies without updated_on lose. File order says
+    nothing here: event_month=10 is read before event_month=2.
+    \"\"\"
+    ordered = df.sort_values('updated_on', na_position='first', kind='stable')
+    return ordered.duplicated(key, keep='last').reindex(df.index)
+
+def has_data(path):
+    \"\"\"Whether a stage dataset exists and holds any parquet file\"\"\"
+    path = Path(path)
+    return path.exists() and any(path.rglob('*.parquet'))
+
+def open_dataset(path):
+    \"\"\"Open a partitioned stage dataset\"\"\"
+    return ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+
+def read_dataset(path, columns=None, start_date=None, end_date=None,
+                 partitions=None, keep_dictionary=False):
+    \"\"\"
+    Read a stage dataset, touching only the needed columns and partitions.
+
+    Partitions come from an explicit (year, month) list or a date range.
+    Dictionary columns are decoded to plain strings unless keep_dictionary
+    is set, in which case they arrive as pandas categoricals.
+    \"\"\"
+    path = Path(path)
+    if not has_data(path):
+        return pd.DataFrame(columns=columns or [])
+
+    if partitions is None and (start_date is not None or end_date is not None):
+        first = pd.Timestamp(start_date or pd.Timestamp.min)
+        last = pd.Timestamp(end_date or pd.Timestamp.max)
+        partitions = [
+            p for p in list_partitions(path)
+            if (first.year, first.month) <= p <= (last.year, last.month)
+        ]
+
+    if partitions is not None and not partitions:
+        return pd.DataFrame(columns=columns or [])
+
+    dataset = open_dataset(path)
+    filter_expr = partition_filter(partitions) if partitions is not None else None
+    if columns is None:
+        columns = [n for n in dataset.schema.names if n not in PARTITION_COLUMNS]
+    table = dataset.to_table(columns=columns, filter=filter_expr)
+
+    if not keep_dictionary:
+        for i, field in enumerate(table.schema):
+            if pa.types.is_dictionary(field.type):
+                table = table.set_column(i, field.name, table[field.name].cast(field.type.value_type))
+    return table.to_pandas(date_as_object=False)
+
+def list_partitions(path):
+    \"\"\"List the (year, month) partitions present in a dataset\"\"\"
+    partitions = []
+    for year_dir in Path(path).glob('event_year=*'):
+        for month_dir in year_dir.glob('event_month=*'):
+            if any(month_dir.glob('*.parquet')):
+                partitions.append((int(year_dir.name.split('=')[1]),
+                                   int(month_dir.name.split('=')[1])))
+    return sorted(partitions)
+
+def upsert_partitions(df, path, key='incident_id', ts_column='event_ts'):
+    \"\"\"
+    Merge rows into a dataset by key, rewriting only the partitions they touch.
+
+    Cost follows the size of the touched months, not of the dataset. A row
+    whose event month changed leaves its old copy behind in the previous
+    partition; readers deduplicate by key.
+    \"\"\"
+    if df.empty:
+        return 0
+    ts = pd.to_datetime(df[ts_column])
+    touched = sorted(set(zip(ts.dt.year, ts.dt.month)))
+
+    existing = read_dataset(path, partitions=touched)
+    if not existing.empty:
+        existing = existing[~existing[key].isin(df[key])]
+        df = pd.concat([existing, df], ignore_index=True)
+    write_dataset(df, path, ts_column, mode='replace_partitions')
+    return len(touched)
+
+def upsert_table(table, path, key='id'):
+    \"\"\"
+    Merge a partitioned Arrow table into a dataset by key.
+
+    Rewrites the partitions the new rows land in plus those holding an older
+    copy of a key, so every key stays in exactly one partition. Returns the
+    touched (year, month) partitions.
+    \"\"\"
+    if table.num_rows == 0:
+        return []
+    keys = table[key]
+    touched = set(zip(table['event_year'].to_pylist(), table['event_month'].to_pylist()))
+    if has_data(path):
+        dataset = open_dataset(path)
+        stale = dataset.to_table(columns=PARTITION_COLUMNS, filter=ds.field(key).isin(keys))
+        touched |= set(zip(stale['event_year'].to_pylist(), stale['event_month'].to_pylist()))
+        kept = dataset.to_table(filter=partition_filter(touched) & ~ds.field(key).isin(keys))
+        table = pa.concat_tables([kept, table.select(kept.column_names).cast(kept.schema)])
+
+    # Partitions left with no rows are not rewritten by the write, so drop them first
+    for partition in touched:
+        shutil.rmtree(partition_path(path, partition), ignore_errors=True)
+    write_table(table, path, mode='replace_partitions')
+    return sorted(touched)
+"""
+
+etl_geohash = """#!/usr/bin/env python3
+\"\"\"
+Vectorized geohash encoding and decoding with NumPy
+\"\"\"
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_CHARS = np.array(list(BASE32))
+
+# Character code -> 5-bit value, -1 for characters outside the alphabet
+_DECODE_LUT = np.full(128, -1, dtype=np.int8)
+for _value, _char in enumerate(BASE32):
+    _DECODE_LUT[ord(_char)] = _value
+
+def encode(latitude, longitude, precisions=(6, 8)):
+    \"\"\"
+    Encode coordinate arrays into geohashes at several precisions at once.
+
+    Runs the same interval bisection as pygeohash.encode, one bit at a time
+    over whole arrays, so results are identical (points exactly on a cell
+    edge go to the lower cell, as in pygeohash 1.2). A geohash is a prefix of
+    every longer one, so all precisions come from a single pass at the
+    largest. Returns {precision: array of geohash strings}.
+    \"\"\"
+    lat = np.asarray(latitude, dtype=np.float64)
+    lon = np.asarray(longitude, dtype=np.float64)
+    n = lat.shape[0]
+    max_precision = max(precisions)
+
+    lat_lo, lat_hi = np.full(n, -90.0), np.full(n, 90.0)
+    lon_lo, lon_hi = np.full(n, -180.0), np.full(n, 180.0)
+    codes = np.zeros((n, max_precision), dtype=np.uint8)
+
+    even = True
+    for char in range(max_precision):
+        value = np.zeros(n, dtype=np.uint8)
+        for _ in range(5):
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                bit = lon > mid
+                lon_lo = np.where(bit, mid, lon_lo)
+                lon_hi = np.where(bit, lon_hi, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                bit = lat > mid
+                lat_lo = np.where(bit, mid, lat_lo)
+                lat_hi = np.where(bit, lat_hi, mid)
+            value = (value << 1) | bit
+            even = not even
+        codes[:, char] = value
+
+    chars = _BASE32_CHARS[codes]
+    return {
+        p: np.ascontiguousarray(chars[:, :p]).view(f'<U{p}').ravel()
+        for p in precisions
+    }
+
+def _codes(geohashes):
+    \"\"\"Turn equal-length geohash strings into an (n, precision) code matrix\"\"\"
+    hashes = np.asarray(geohashes, dtype=str)
+    precision = hashes.dtype.itemsize // 4
+    points = hashes.view(np.uint32).reshape(len(hashes), precision)
+    if points.max(initial=0) >= 128:
+        raise ValueError("Invalid character in geohash")
+    codes = _DECODE_LUT[points]
+    if (codes < 0).any():
+        raise ValueError("Invalid character in geohash")
+    return codes
+
+def decode_exactly(geohashes):
+    \"\"\"
+    Decode equal-length geohashes into centroids and error margins.
+
+    Vectorized pygeohash.decode_exactly: returns (lat, lon, lat_err, lon_err)
+    arrays, the cell centre and its half-height/half-width in degrees.
+    \"\"\"
+    codes = _codes(geohashes)
+    n, precision = codes.shape
+
+    lat_lo, lat_hi = np.full(n, -90.0), np.full(n, 90.0)
+    lon_lo, lon_hi = np.full(n, -180.0), np.full(n, 180.0)
+    lat_err, lon_err = 90.0, 180.0
+
+    even = True
+    for char in range(precision):
+        value = codes[:, char]
+        for mask in (16, 8, 4, 2, 1):
+            bit = (value & mask) > 0
+            if even:
+                lon_err /= 2
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo = np.where(bit, mid, lon_lo)
+                lon_hi = np.where(bit, lon_hi, mid)
+            else:
+                lat_err /= 2
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo = np.where(bit, mid, lat_lo)
+                lat_hi = np.where(bit, lat_hi, mid)
+            even = not even
+
+    lat = (lat_lo + lat_hi) / 2
+    lon = (lon_lo + lon_hi) / 2
+    return lat, lon, np.full(n, lat_err), np.full(n, lon_err)
+
+def decode(geohashes):
+    \"\"\"Decode equal-length geohashes into cell centroid (lat, lon) arrays\"\"\"
+    lat, lon, _, _ = decode_exactly(geohashes)
+    return lat, lon
+
+def bounds(geohashes):
+    \"\"\"Decode equal-length geohashes into (lat_min, lat_max, lon_min, lon_max)\"\"\"
+    lat, lon, lat_err, lon_err = decode_exactly(geohashes)
+    return lat - lat_err, lat + lat_err, lon - lon_err, lon + lon_err
+
+def benchmark(rows=200000, precisions=(6, 8), seed=42):
+    \"\"\"Time the vectorized encoder against the per-row DataFrame.apply path\"\"\"
+    import pygeohash as pgh
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'latitude': rng.uniform(41.6, 42.1, rows),
+        'longitude': rng.uniform(-87.9, -87.5, rows)
+    })
+
+    start = time.perf_counter()
+    expected = {
+        p: df.apply(lambda x: pgh.encode(x['latitude'], x['longitude'], precision=p), axis=1)
+        for p in precisions
+    }
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = encode(df['latitude'].to_numpy(), df['longitude'].to_numpy(), precisions)
+    vector_seconds = time.perf_counter() - start
+
+    identical = all((expected[p].to_numpy() == result[p]).all() for p in precisions)
+
+    print(f"Rows:        {rows}")
+    print(f"Precisions:  {list(precisions)}")
+    print(f"apply:       {apply_seconds:.3f}s ({rows / apply_seconds:,.0f} rows/s)")
+    print(f"vectorized:  {vector_seconds:.3f}s ({rows / vector_seconds:,.0f} rows/s)")
+    print(f"Speedup:     {apply_seconds / vector_seconds:.1f}x")
+    print(f"Identical:   {identical}")
+
+    return {
+        'rows': rows,
+        'apply_seconds': apply_seconds,
+        'vectorized_seconds': vector_seconds,
+        'identical': identical
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark vectorized geohash encoding')
+    parser.add_argument('--rows', type=int, default=200000,
+                        help='Number of random Chicago points to encode')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("GEOHASH ENCODER BENCHMARK")
+    print("=" * 70)
+    benchmark(args.rows)
+"""
+
+etl_temporal = """#!/usr/bin/env python3
+\"\"\"
+Vectorized temporal features and the US/Chicago holiday calendar
+\"\"\"
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+HOLIDAY_CALENDAR_FILE = DATA_DIR / "holiday_calendar.csv"
+
+# Lookup tables indexed by month (1-12) and hour (0-23)
+SEASON_LUT = np.array([
+    '', 'Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer',
+    'Summer', 'Summer', 'Fall', 'Fall', 'Fall', 'Winter'
+], dtype=object)
+TIME_OF_DAY_LUT = np.array(
+    ['Night'] * 6 + ['Morning'] * 6 + ['Afternoon'] * 6 + ['Evening'] * 6,
+    dtype=object
+)
+
+# Fixed-date holidays: (name, month, day, first year observed)
+FIXED_HOLIDAYS = [
+    ("New Year's Day", 1, 1, None),
+    ("Lincoln's Birthday", 2, 12, None),
+    ("Juneteenth", 6, 19, 2021),
+    ("Independence Day", 7, 4, None),
+    ("Veterans Day", 11, 11, None),
+    ("Christmas Day", 12, 25, None)
+]
+
+# Floating holidays: (name, month, weekday Mon=0, nth occurrence, -1 = last)
+FLOATING_HOLIDAYS = [
+    ("Martin Luther King Jr. Day", 1, 0, 3),
+    ("Presidents' Day", 2, 0, 3),
+    ("Casimir Pulaski Day", 3, 0, 1),
+    ("Memorial Day", 5, 0, -1),
+    ("Labor Day", 9, 0, 1),
+    ("Columbus Day", 10, 0, 2),
+    ("Thanksgiving Day", 11, 3, 4)
+]
+
+def nth_weekday(year, month, weekday, n):
+    \"\"\"Date of the nth (or last, n=-1) given weekday in a month\"\"\"
+    if n > 0:
+        first = pd.Timestamp(year, month, 1)
+        offset = (weekday - first.weekday()) % 7
+        return first + pd.Timedelta(days=offset + 7 * (n - 1))
+    last = pd.Timestamp(year, month, 1) + pd.offsets.MonthEnd(0)
+    return last - pd.Timedelta(days=(last.weekday() - weekday) % 7)
+
+def observed_date(date):
+    \"\"\"Weekend holidays are observed on the Friday before or Monday after\"\"\"
+    if date.weekday() == 5:
+        return date - pd.Timedelta(days=1)
+    if date.weekday() == 6:
+        return date + pd.Timedelta(days=1)
+    return date
+
+def holiday_calendar(start_year=2001, end_year=2035):
+    \"\"\"
+    Build the holiday table for a range of years.
+
+    Federal holidays plus the Illinois/Chicago ones (Lincoln's Birthday,
+    Casimir Pulaski Day, the day after Thanksgiving). Weekend fixed-date
+    holidays get an extra row for the weekday they are observed on.
+    Columns: date, holiday, observed.
+    \"\"\"
+    rows = []
+    for year in range(start_year, end_year + 1):
+        for name, month, day, since in FIXED_HOLIDAYS:
+            if since is not None and year < since:
+                continue
+            date = pd.Timestamp(year, month, day)
+            rows.append((date, name, False))
+            observed = observed_date(date)
+            if observed != date:
+                rows.append((observed, name, True))
+        for name, month, weekday, n in FLOATING_HOLIDAYS:
+            rows.append((nth_weekday(year, month, weekday, n), name, False))
+        thanksgiving = nth_weekday(year, 11, 3, 4)
+        rows.append((thanksgiving + pd.Timedelta(days=1), "Day after Thanksgiving", False))
+
+    calendar = pd.DataFrame(rows, columns=['date', 'holiday', 'observed'])
+    return calendar.sort_values('date').reset_index(drop=True)
+
+def load_holiday_calendar(calendar_file=HOLIDAY_CALENDAR_FILE):
+    \"\"\"Load the saved holiday table, building it if it does not exist yet\"\"\"
+    if Path(calendar_file).exists():
+        return pd.read_csv(calendar_file, parse_dates=['date'])
+    return holiday_calendar()
+
+def holiday_dates(calendar=None):
+    \"\"\"Sorted unique holiday dates as datetime64[D], for vectorized lookups\"\"\"
+    if calendar is None:
+        calendar = load_holiday_calendar()
+    return np.unique(calendar['date'].to_numpy().astype('datetime64[D]'))
+
+def is_holiday(dates, holidays=None):
+    \"\"\"Flag dates that are a holiday or its observed day off (vectorized)\"\"\"
+    if holidays is None:
+        holidays = holiday_dates()
+    days = np.asarray(dates).astype('datetime64[D]')
+    return np.isin(days, holidays).astype(int)
+
+def season(months):
+    \"\"\"Map month numbers (1-12) to seasons through the lookup table\"\"\"
+    return SEASON_LUT[np.asarray(months, dtype=int)]
+
+def time_of_day(hours):
+    \"\"\"Map hours (0-23) to time-of-day buckets through the lookup table\"\"\"
+    return TIME_OF_DAY_LUT[np.asarray(hours, dtype=int)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the holiday calendar table')
+    parser.add_argument('--start-year', type=int, default=2001)
+    parser.add_argument('--end-year', type=int, default=2035)
+    args = parser.parse_args()
+
+    calendar = holiday_calendar(args.start_year, args.end_year)
+    calendar.to_csv(HOLIDAY_CALENDAR_FILE, index=False)
+    print(f"✅ {len(calendar)} holiday dates saved to {HOLIDAY_CALENDAR_FILE}")
+"""
+
+etl_lag_panel = """#!/usr/bin/env python3
+\"\"\"
+Rolling crime counts from a dense grid x time panel
+\"\"\"
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+DAILY_WINDOWS = (1, 7, 30)
+HOURLY_WINDOWS = (3, 24)
+
+# Upper bound on grid x period cells held in memory at once (int32 each)
+MAX_PANEL_CELLS = 25_000_000
+
+def window_counts(grid_codes, periods, windows, rows=None, max_cells=MAX_PANEL_CELLS):
+    \"\"\"
+    Count events per grid over trailing windows of whole periods.
+
+    grid_codes and periods are integer codes (0..n-1) of every event that
+    counts towards the windows. Events are binned into a dense grid x period
+    matrix, so empty periods are real zeros, and each window is a single
+    cumulative-sum difference: events in periods (t - window, t]. Grids are
+    processed in blocks that keep the matrix under max_cells.
+
+    rows selects the events to return values for (default all). Returns
+    {window: int array aligned with rows}.
+    \"\"\"
+    grid_codes = np.asarray(grid_codes, dtype=np.int64)
+    periods = np.asarray(periods, dtype=np.int64)
+    rows = np.arange(len(grid_codes)) if rows is None else np.asarray(rows)
+    out = {w: np.zeros(len(rows), dtype=np.int32) for w in windows}
+    if len(grid_codes) == 0:
+        return out
+
+    n_grids = int(grid_codes.max()) + 1
+    n_periods = int(periods.max()) + 1
+    block = max(1, max_cells // n_periods)
+
+    # Sort once so each block of grids is a contiguous slice
+    event_order = np.argsort(grid_codes, kind='stable')
+    event_grids = grid_codes[event_order]
+    row_grids = grid_codes[rows]
+    row_order = np.argsort(row_grids, kind='stable')
+    sorted_row_grids = row_grids[row_order]
+
+    for first in range(0, n_grids, block):
+        last = min(first + block, n_grids)
+        lo, hi = np.searchsorted(event_grids, [first, last])
+        events = event_order[lo:hi]
+
+        counts = np.bincount(
+            (grid_codes[events] - first) * n_periods + periods[events],
+            minlength=(last - first) * n_periods
+        ).reshape(last - first, n_periods)
+        # Leading zero column so window t covers cumulative[t + 1] - cumulative[t + 1 - w]
+        cumulative = np.zeros((last - first, n_periods + 1), dtype=np.int32)
+        np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+        del counts
+
+        lo, hi = np.searchsorted(sorted_row_grids, [first, last])
+        selected = row_order[lo:hi]
+        g = grid_codes[rows[selected]] - first
+        t = periods[rows[selected]] + 1
+        for w in windows:
+            out[w][selected] = cumulative[g, t] - cumulative[g, np.maximum(t - w, 0)]
+
+    return out
+
+def rolling_features(grid_ids, event_ts, history=None,
+                     daily_windows=DAILY_WINDOWS, hourly_windows=HOURLY_WINDOWS):
+    \"\"\"
+    Rolling grid counts for every event, from grid x day and grid x hour panels.
+
+    history: (grid_id, event_ts) rows that count towards the windows but get
+    no values of their own. Returns a DataFrame of rolling_{w}d and
+    rolling_{w}h columns aligned positionally with grid_ids.
+    \"\"\"
+    n = len(grid_ids)
+    columns = [f'rolling_{w}d' for w in daily_windows] + [f'rolling_{w}h' for w in hourly_windows]
+    if n == 0:
+        return pd.DataFrame({c: np.zeros(0, dtype=np.int32) for c in columns})
+
+    grids = pd.Series(grid_ids).reset_index(drop=True)
+    ts = pd.Series(pd.to_datetime(event_ts)).reset_index(drop=True)
+    if history is not None and not history.empty:
+        grids = pd.concat([grids, history['grid_id']], ignore_index=True)
+        ts = pd.concat([ts, pd.to_datetime(history['event_ts'])], ignore_index=True)
+
+    # Integer panel coordinates: grid code and period offset from the first event
+    grid_codes, _ = pd.factorize(grids)
+    days = ts.to_numpy().astype('datetime64[D]')
+    days = (days - days.min()).astype(np.int64)
+    hours = ts.to_numpy().astype('datetime64[h]')
+    hours = (hours - hours.min()).astype(np.int64)
+    rows = np.arange(n)
+
+    features = {}
+    for w, values in window_counts(grid_codes, days, daily_windows, rows).items():
+        features[f'rolling_{w}d'] = values
+    for w, values in window_counts(grid_codes, hours, hourly_windows, rows).items():
+        features[f'rolling_{w}h'] = values
+    return pd.DataFrame(features)
+
+def benchmark(rows=500000, grids=1500, days=365, seed=42):
+    \"\"\"Time the panel engine against the per-grid rolling lambda\"\"\"
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'grid_id': rng.integers(0, grids, rows).astype(str),
+        'event_ts': pd.Timestamp('2023-01-01') + pd.to_timedelta(
+            rng.integers(0, days * 86400, rows), unit='s')
+    })
+    df['event_date'] = df['event_ts'].dt.normalize()
+
+    start = time.perf_counter()
+    daily = df.groupby(['grid_id', 'event_date']).size().reset_index(name='daily_count')
+    for w in DAILY_WINDOWS:
+        daily[f'rolling_{w}d'] = daily.groupby('grid_id')['daily_count'].transform(
+            lambda x: x.rolling(window=w, min_periods=1).sum())
+    transform_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rolling_features(df['grid_id'], df['event_ts'])
+    panel_seconds = time.perf_counter() - start
+
+    print(f"Rows:        {rows} ({grids} grids over {days} days)")
+    print(f"transform:   {transform_seconds:.3f}s (daily windows only)")
+    print(f"panel:       {panel_seconds:.3f}s (daily and hourly windows)")
+    print(f"Speedup:     {transform_seconds / panel_seconds:.1f}x")
+
+    return {
+        'rows': rows,
+        'transform_seconds': transform_seconds,
+        'panel_seconds': panel_seconds
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the rolling count panel')
+    parser.add_argument('--rows', type=int, default=500000,
+                        help='Number of random events')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ROLLING COUNT PANEL BENCHMARK")
+    print("=" * 70)
+    benchmark(args.rows)
+"""
+
+etl_pipeline = """#!/usr/bin/env python3
+\"\"\"
+Non-interactive ETL pipeline: download -> clean -> features -> load
+
+Stages form a DAG and run per year/month partition across a process pool.
+Each partition's inputs are content-hashed, and a partition whose hash
+matches the last successful run is skipped, so an unchanged rerun only
+re-checks file hashes.
+\"\"\"
+import io
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import contextlib
+import pandas as pd
+import pyarrow.parquet as pq
+from pathlib import Path
+from datetime import date
+from graphlib import TopologicalSorter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from storage import (DATA_DIR, RAW_DATASET, CLEANED_DATASET, FEATURES_DATASET,
+                     DELTA_RAW_DATASET, open_dataset, read_dataset, write_dataset,
+                     list_partitions, partition_path, upsert_table)
+
+ETL_DIR = Path(__file__).parent
+CACHE_FILE = DATA_DIR / ".pipeline_cache.json"
+GRID_TOTALS_FILE = DATA_DIR / "grid_totals.parquet"
+
+# Stage -> upstream stages
+DAG = {
+    'download': [],
+    'clean': ['download'],
+    'features': ['clean'],
+    'load': ['features']
+}
+
+# Source files whose changes invalidate a stage's cached partitions
+STAGE_CODE = {
+    'clean': ['clean_data.py', 'storage.py'],
+    'features': ['feature_engineering.py', 'geohash_vec.py', 'temporal.py',
+                 'lag_panel.py', 'storage.py'],
+    'load': ['load_to_mysql.py', 'partitions.py', 'refresh_aggregates.py', 'sketches.py',
+             'grids.py']
+}
+
+# Longest rolling window, in days, that reaches into earlier partitions
+LAG_CONTEXT_DAYS = 30
+
+def load_cache(cache_file=CACHE_FILE):
+    \"\"\"Load the pipeline cache of file digests and per-stage partition hashes\"\"\"
+    if not Path(cache_file).exists():
+        return {"files": {}, "stages": {}}
+    with open(cache_file) as f:
+        return json.load(f)
+
+def save_cache(cache, cache_file=CACHE_FILE):
+    \"\"\"Atomically persist the pipeline cache\"\"\"
+    tmp_file = Path(str(cache_file) + ".tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, cache_file)
+
+def file_digest(path, cache, columns=None):
+    \"\"\"
+    SHA-256 of a file, or of some of its Parquet columns.
+
+    Digests are memoized by size and mtime, so unchanged files are not read
+    again on the next run.
+    \"\"\"
+    stat = Path(path).stat()
+    memo_key = f"{path}|{','.join(columns)}" if columns else str(path)
+    memo = cache["files"].get(memo_key)
+    if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+        return memo[2]
+
+    sha = hashlib.sha256()
+    if columns:
+        frame = pq.read_table(path, columns=columns).to_pandas()
+        sha.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    else:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+    digest = sha.hexdigest()
+    cache["files"][memo_key] = [stat.st_size, stat.st_mtime_ns, digest]
+    return digest
+
+def partition_digest(dataset, partition, cache, columns=None):
+    \"\"\"Digest of every file in one partition, or '' if it does not exist\"\"\"
+    directory = partition_path(dataset, partition)
+    sha = hashlib.sha256()
+    for path in sorted(directory.glob('*.parquet')):
+        sha.update(path.name.encode())
+        sha.update(file_digest(path, cache, columns).encode())
+    return sha.hexdigest() if directory.exists() else ''
+
+def code_digest(stage):
+    \"\"\"Digest of the source files a stage runs\"\"\"
+    sha = hashlib.sha256()
+    for name in STAGE_CODE[stage]:
+        sha.update((ETL_DIR / name).read_bytes())
+    return sha.hexdigest()
+
+def combine(*digests):
+    \"\"\"Combine digests into one cache key\"\"\"
+    return hashlib.sha256("|".join(digests).encode()).hexdigest()
+
+def partition_key(partition):
+    \"\"\"Cache key of a (year, month) partition, e.g. 2024-03\"\"\"
+    return f"{partition[0]:04d}-{partition[1]:02d}"
+
+def context_partitions(partition, days=LAG_CONTEXT_DAYS):
+    \"\"\"Earlier partitions that rolling windows in this partition reach into\"\"\"
+    start = pd.Timestamp(partition[0], partition[1], 1)
+    months = pd.period_range(start - pd.Timedelta(days=days - 1),
+                             start - pd.Timedelta(days=1), freq='M')
+    return [(m.year, m.month) for m in months]
+
+@contextlib.contextmanager
+def quiet():
+    \"\"\"Silence the per-step prints of stage functions inside workers\"\"\"
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def clean_partition(partition):
+    \"\"\"Worker: clean one raw partition into the cleaned dataset\"\"\"
+    from clean_data import clean_data
+
+    df = read_dataset(RAW_DATASET, partitions=[partition])
+    cleaned = clean_data(df, verbose=False) if not df.empty else df
+    shutil.rmtree(partition_path(CLEANED_DATASET, partition), ignore_errors=True)
+    write_dataset(cleaned, CLEANED_DATASET, mode='append')
+    return len(cleaned)
+
+def features_partition(partition):
+    \"\"\"Worker: build features for one cleaned partition\"\"\"
+    from feature_engineering import (add_spatial_features, add_temporal_features,
+                                     add_lag_features, add_crime_type_features)
+
+    df = read_dataset(CLEANED_DATASET, partitions=[partition])
+    with quiet():
+        # Rows from the previous weeks count towards this month's windows
+        start = pd.Timestamp(partition[0], partition[1], 1)
+        history = read_dataset(CLEANED_DATASET, partitions=context_partitions(partition),
+                               columns=['latitude', 'longitude', 'event_ts'])
+        history = history[history['event_ts'] >= start - pd.Timedelta(days=LAG_CONTEXT_DAYS - 1)]
+        history = add_spatial_features(history) if not history.empty else None
+
+        # Lifetime grid totals come from the whole cleaned dataset
+        totals = pd.read_parquet(GRID_TOTALS_FILE).set_index('grid_id')['n']
+        df = add_spatial_features(df)
+        df = add_temporal_features(df)
+        df = add_lag_features(df, history)
+        df = add_crime_type_features(df, totals.sub(df['grid_id'].value_counts(), fill_value=0))
+
+    shutil.rmtree(partition_path(FEATURES_DATASET, partition), ignore_errors=True)
+    write_dataset(df, FEATURES_DATASET, mode='append')
+    return len(df)
+
+def load_partition(partition):
+    \"\"\"Worker: replace one event month of the incidents table\"\"\"
+    from load_to_mysql import INCIDENT_COLUMNS, get_engine, replace_partition
+
+    df = read_dataset(FEATURES_DATASET, columns=INCIDENT_COLUMNS, partitions=[partition])
+    if df.empty:
+        df = pd.DataFrame(columns=INCIDENT_COLUMNS)
+    engine = get_engine()
+    try:
+        return replace_partition(df, engine, partition, refresh=False)
+    finally:
+        engine.dispose()
+
+def prepare_load_partitions(last):
+    \"\"\"Make sure incidents has a partition for every month up to last\"\"\"
+    from load_to_mysql import get_engine, prepare_partitions
+
+    engine = get_engine()
+    try:
+        prepare_partitions(engine, through=date(*last, 1))
+    finally:
+        engine.dispose()
+
+def refresh_loaded_months(partitions):
+    \"\"\"Refresh grid_aggregates for event months the load stage replaced\"\"\"
+    from load_to_mysql import get_engine
+    from refresh_aggregates import refresh_months
+
+    engine = get_engine()
+    try:
+        with engine.begin() as conn:
+            grids = refresh_months(conn, partitions)
+    finally:
+        engine.dispose()
+    print(f"[load] grid aggregates refreshed for {grids} grids")
+
+def build_grid_totals(cache):
+    \"\"\"
+    Count incidents per grid over the whole cleaned dataset.
+
+    total_crimes is a lifetime count, so it is computed once here and shared
+    by every features partition; it is rebuilt only when cleaned data changed.
+    \"\"\"
+    from geohash_vec import encode
+
+    digests = [partition_digest(CLEANED_DATASET, p, cache)
+               for p in list_partitions(CLEANED_DATASET)]
+    key = combine(*digests)
+    if cache.get("grid_totals") == key and GRID_TOTALS_FILE.exists():
+        return key
+
+    points = read_dataset(CLEANED_DATASET, columns=['latitude', 'longitude'])
+    grid_ids = encode(points['latitude'].to_numpy(), points['longitude'].to_numpy(),
+                      precisions=(6,))[6]
+    totals = pd.Series(grid_ids).value_counts().rename_axis('grid_id').reset_index(name='n')
+    totals.to_parquet(GRID_TOTALS_FILE, index=False)
+    cache["grid_totals"] = key
+    print(f"Grid totals rebuilt for {len(totals)} grids")
+    return key
+
+def plan_stage(stage, cache):
+    \"\"\"
+    Work out which partitions of a stage must run.
+
+    Returns ({partition: key} of stale partitions, cached partitions that no
+    longer have an input and must be removed, number of input partitions).
+    \"\"\"
+    code = code_digest(stage)
+    if stage == 'clean':
+        partitions = list_partitions(RAW_DATASET)
+        keys = {p: combine(code, partition_digest(RAW_DATASET, p, cache)) for p in partitions}
+    elif stage == 'features':
+        totals = build_grid_totals(cache)
+        partitions = list_partitions(CLEANED_DATASET)
+        keys = {
+            p: combine(code, totals, partition_digest(CLEANED_DATASET, p, cache),
+                       *(partition_digest(CLEANED_DATASET, c, cache) for c in context_partitions(p)))
+            for p in partitions
+        }
+    else:
+        # Only the stored columns matter, not e.g. total_crimes moving for old months
+        from load_to_mysql import INCIDENT_COLUMNS
+        partitions = list_partitions(FEATURES_DATASET)
+        keys = {p: combine(code, partition_digest(FEATURES_DATASET, p, cache, INCIDENT_COLUMNS))
+                for p in partitions}
+
+    done = cache["stages"].get(stage, {})
+    stale = {p: k for p, k in keys.items() if done.get(partition_key(p)) != k}
+    current = {partition_key(p) for p in partitions}
+    removed = [tuple(int(x) for x in k.split('-')) for k in done if k not in current]
+    return stale, removed, len(partitions)
+
+def run_stage(stage, cache, workers, force=False):
+    \"\"\"Run the stale partitions of one stage across a process pool\"\"\"
+    worker = {'clean': clean_partition, 'features': features_partition,
+              'load': load_partition}[stage]
+    output = {'clean': CLEANED_DATASET, 'features': FEATURES_DATASET}.get(stage)
+
+    if force:
+        cache["stages"][stage] = {}
+    stale, removed, total = plan_stage(stage, cache)
+    done = cache["stages"].setdefault(stage, {})
+
+    for partition in removed:
+        if output is not None:
+            shutil.rmtree(partition_path(output, partition), ignore_errors=True)
+        else:
+            load_partition(partition)
+        done.pop(partition_key(partition), None)
+
+    print(f"[{stage}] {len(stale)} of {total} partitions to run, "
+          f"{len(removed)} removed")
+    if not stale:
+        if stage == 'load' and removed:
+            refresh_loaded_months(removed)
+        save_cache(cache)
+        return 0
+
+    if stage == 'load' and not done and len(stale) == total:
+        from load_to_mysql import bulk_load
+        # Nothing loaded yet, so bulk load the whole table instead of swapping months
+        metrics = bulk_load(FEATURES_DATASET, workers=workers)
+        done.update({partition_key(p): k for p, k in stale.items()})
+        save_cache(cache)
+        return metrics['rows']
+
+    if stage == 'load':
+        prepare_load_partitions(max(stale))
+
+    start = time.time()
+    rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(worker, p): p for p in sorted(stale)}
+        for i, future in enumerate(as_completed(futures), 1):
+            partition = futures[future]
+            rows += future.result()
+            # Record each partition as it finishes, so a failed run keeps its progress
+            done[partition_key(partition)] = stale[partition]
+            save_cache(cache)
+            print(f"[{stage}] {partition_key(partition)} done ({i}/{len(stale)})")
+
+    if stage == 'load':
+        # Months are swapped concurrently, so the rollup is refreshed once they are all in
+        refresh_loaded_months(sorted(stale) + removed)
+    print(f"[{stage}] {rows} rows in {time.time() - start:.1f}s")
+    return rows
+
+def run_download(mode, workers):
+    \"\"\"Fetch raw data without prompts: 'full' history or the 'incremental' delta\"\"\"
+    from download_data import download_keyset, download_incremental
+
+    if mode == 'full':
+        download_keyset(workers=workers)
+        return []
+    download_incremental(workers=workers)
+    if not DELTA_RAW_DATASET.exists():
+        return []
+    # Merge the delta into the raw dataset; only touched partitions change
+    touched = upsert_table(open_dataset(DELTA_RAW_DATASET).to_table(), RAW_DATASET)
+    print(f"Merged delta into {len(touched)} raw partitions")
+    return touched
+
+def run_pipeline(stages=None, download='none', workers=None,
+                 download_workers=8, force=False):
+    \"\"\"Run the selected stages in dependency order\"\"\"
+    stages = set(stages or DAG)
+    workers = workers or os.cpu_count()
+    cache = load_cache()
+    order = [s for s in TopologicalSorter(DAG).static_order() if s in stages]
+
+    for stage in order:
+        print("\\n" + "=" * 70)
+        print(f"STAGE: {stage.upper()}")
+        print("=" * 70)
+        if stage == 'download':
+            if download == 'none':
+                print("Skipping download (use --download full|incremental)")
+            else:
+                run_download(download, download_workers)
+        else:
+            run_stage(stage, cache, workers, force)
+
+    if download == 'incremental' and 'load' in stages:
+        from download_data import commit_watermark
+        # The delta is in MySQL now
+        commit_watermark()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the cached, partitioned ETL pipeline')
+    parser.add_argument('--stages', nargs='+', choices=list(DAG), default=list(DAG),
+                        help='Stages to run (default: all)')
+    parser.add_argument('--download', choices=['none', 'full', 'incremental'], default='none',
+                        help='Fetch data before processing')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes per stage (default: all cores)')
+    parser.add_argument('--download-workers', type=int, default=8,
+                        help='Parallel download threads')
+    parser.add_argument('--force', action='store_true',
+                        help='Ignore the cache and rebuild every partition')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("CHICAGO CRIME ETL PIPELINE")
+    print("=" * 70)
+
+    start = time.time()
+    run_pipeline(args.stages, args.download, args.workers, args.download_workers, args.force)
+    print(f"\\n✅ Pipeline complete in {time.time() - start:.1f}s")
+"""
+
+etl_synthetic = """#!/usr/bin/env python3
+\"\"\"
+Synthetic Chicago crime incidents at scale, shaped like the portal records
+\"\"\"
+import time
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pathlib import Path
+from storage import DATA_DIR, RAW_SCHEMA, write_table
+
+SYNTHETIC_DIR = DATA_DIR / "synthetic"
+
+# Preset sizes for benchmarks
+SIZES = {'1m': 1_000_000, '10m': 10_000_000, '50m': 50_000_000}
+
+# Same bounding box clean_data enforces
+LAT_RANGE = (41.6, 42.1)
+LON_RANGE = (-87.9, -87.5)
+
+# Primary types with their share of incidents, IUCR, FBI code, arrest and domestic rates
+CRIME_TYPES = [
+    ('THEFT', 0.22, '0820', '06', 0.10, 0.03),
+    ('BATTERY', 0.18, '0486', '08B', 0.20, 0.45),
+    ('CRIMINAL DAMAGE', 0.11, '1320', '14', 0.06, 0.12),
+    ('NARCOTICS', 0.08, '1811', '18', 0.99, 0.00),
+    ('ASSAULT', 0.07, '0560', '08A', 0.18, 0.25),
+    ('OTHER OFFENSE', 0.06, '4625', '26', 0.18, 0.30),
+    ('BURGLARY', 0.05, '0610', '05', 0.05, 0.02),
+    ('MOTOR VEHICLE THEFT', 0.05, '0910', '07', 0.07, 0.01),
+    ('DECEPTIVE PRACTICE', 0.05, '1153', '11', 0.05, 0.01),
+    ('ROBBERY', 0.04, '031A', '03', 0.09, 0.02),
+    ('CRIMINAL TRESPASS', 0.03, '1330', '26', 0.70, 0.05),
+    ('WEAPONS VIOLATION', 0.02, '143A', '15', 0.80, 0.01),
+    ('PUBLIC PEACE VIOLATION', 0.01, '2820', '24', 0.35, 0.05),
+    ('OFFENSE INVOLVING CHILDREN', 0.01, '1750', '20', 0.15, 0.40),
+    ('PROSTITUTION', 0.01, '1512', '16', 0.99, 0.00)
+]
+
+DESCRIPTIONS = ['SIMPLE', 'AGGRAVATED', 'OVER $500', '$500 AND UNDER', 'TO PROPERTY',
+                'FORCIBLE ENTRY', 'POSS: CANNABIS 30GMS OR LESS', 'DOMESTIC BATTERY SIMPLE']
+LOCATION_DESCRIPTIONS = ['STREET', 'RESIDENCE', 'APARTMENT', 'SIDEWALK', 'PARKING LOT',
+                         'SMALL RETAIL STORE', 'RESTAURANT', 'ALLEY', 'GAS STATION',
+                         'CTA TRAIN', 'SCHOOL, PUBLIC, BUILDING', 'PARK PROPERTY']
+STREETS = ['W MADISON ST', 'S STATE ST', 'N CLARK ST', 'W CHICAGO AVE', 'S HALSTED ST',
+           'W 63RD ST', 'N MILWAUKEE AVE', 'S COTTAGE GROVE AVE', 'W NORTH AVE',
+           'S ASHLAND AVE', 'W 79TH ST', 'N BROADWAY', 'S PULASKI RD', 'W FULLERTON AVE']
+
+# Relative incident rates by hour (0-23), month (1-12) and weekday (Mon=0)
+HOUR_WEIGHTS = np.array([4.5, 3.3, 2.9, 2.3, 1.8, 1.5, 1.7, 2.3, 3.4, 3.9, 4.0, 4.2,
+                         5.6, 4.5, 4.6, 4.9, 5.0, 5.2, 5.4, 5.2, 5.1, 4.9, 4.6, 4.0])
+MONTH_WEIGHTS = np.array([7.5, 6.8, 8.0, 8.1, 8.8, 8.9, 9.3, 9.2, 8.7, 8.5, 8.0, 7.8])
+WEEKDAY_WEIGHTS = np.array([14.2, 13.9, 14.1, 14.1, 15.0, 14.6, 14.1])
+
+N_HOTSPOTS = 60
+HOTSPOT_SHARE = 0.85
+
+# Share of records with the data problems clean_data removes
+MISSING_COORDINATES = 0.01
+OUT_OF_BOUNDS = 0.002
+
+def city_model(seed=42):
+    \"\"\"
+    Fixed spatial structure of the synthetic city.
+
+    Gaussian hotspots with Zipf-like weights, each with its own crime-type
+    mix drawn around the citywide shares. Depends only on the seed, so every
+    chunk of a dataset shares it.
+    \"\"\"
+    rng = np.random.default_rng(seed)
+    type_shares = np.array([t[1] for t in CRIME_TYPES])
+    type_shares = type_shares / type_shares.sum()
+
+    weights = 1 / np.arange(1, N_HOTSPOTS + 1) ** 0.8
+    return {
+        'lat': rng.uniform(LAT_RANGE[0] + 0.05, LAT_RANGE[1] - 0.05, N_HOTSPOTS),
+        'lon': rng.uniform(LON_RANGE[0] + 0.05, LON_RANGE[1] - 0.05, N_HOTSPOTS),
+        'sigma': rng.uniform(0.004, 0.02, N_HOTSPOTS),
+        'weight': rng.permutation(weights / weights.sum()),
+        'type_cdf': np.cumsum(rng.dirichlet(type_shares * 50, N_HOTSPOTS), axis=1),
+        'type_shares': type_shares
+    }
+
+def day_weights(start, end):
+    \"\"\"Calendar days in [start, end] with their seasonal and weekday rates\"\"\"
+    days = pd.date_range(start, end, freq='D')
+    # Incidents decline by about half over two decades, as in the real data
+    years = days.year.to_numpy() - days.year.min()
+    trend = 1 - 0.5 * years / max(1, days.year.max() - days.year.min())
+    weights = (MONTH_WEIGHTS[days.month.to_numpy() - 1]
+               * WEEKDAY_WEIGHTS[days.dayofweek.to_numpy()] * trend)
+    return days.to_numpy().astype('datetime64[s]'), weights / weights.sum()
+
+def _pick(values, index):
+    \"\"\"Look up string values by integer index into an Arrow array\"\"\"
+    return pa.array(values).take(pa.array(index))
+
+def _join(*parts):
+    \"\"\"Concatenate Arrow string arrays and scalars element-wise (null if any part is)\"\"\"
+    return pc.binary_join_element_wise(*parts, '')
+
+def generate_chunk(day, first_id, rng, model):
+    \"\"\"Generate portal-shaped records on the given days as a typed Arrow table\"\"\"
+    rows = len(day)
+    # Location: mostly around hotspots, the rest spread across the city
+    hotspot = rng.choice(N_HOTSPOTS, rows, p=model['weight'])
+    lat = rng.normal(model['lat'][hotspot], model['sigma'][hotspot])
+    lon = rng.normal(model['lon'][hotspot], model['sigma'][hotspot] * 1.3)
+    background = rng.random(rows) > HOTSPOT_SHARE
+    outside = ~((lat > LAT_RANGE[0]) & (lat < LAT_RANGE[1]) &
+                (lon > LON_RANGE[0]) & (lon < LON_RANGE[1]))
+    spread = background | outside
+    lat[spread] = rng.uniform(*LAT_RANGE, spread.sum())
+    lon[spread] = rng.uniform(*LON_RANGE, spread.sum())
+
+    # Crime type from the hotspot's mix, or citywide shares for background points
+    u = rng.random(rows)
+    type_index = (u[:, None] > model['type_cdf'][hotspot]).sum(axis=1)
+    type_index[spread] = rng.choice(len(CRIME_TYPES), spread.sum(), p=model['type_shares'])
+    type_index = np.minimum(type_index, len(CRIME_TYPES) - 1)
+
+    # Timestamp: weighted hour and uniform minute on the given day
+    hour = rng.choice(24, rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    minute = rng.integers(0, 60, rows)
+    ts = day + (hour * 3600 + minute * 60).astype('timedelta64[s]')
+    updated = ts + rng.integers(1, 30 * 86400, rows).astype('timedelta64[s]')
+
+    arrest_rate = np.array([t[4] for t in CRIME_TYPES])[type_index]
+    domestic_rate = np.array([t[5] for t in CRIME_TYPES])[type_index]
+
+    # Administrative areas follow location, as coarse lat/lon bins
+    lat_bin = ((lat - LAT_RANGE[0]) / (LAT_RANGE[1] - LAT_RANGE[0]) * 0.9999 * 5).astype(int)
+    lon_bin = ((lon - LON_RANGE[0]) / (LON_RANGE[1] - LON_RANGE[0]) * 0.9999 * 5).astype(int)
+    district = lat_bin * 5 + lon_bin + 1
+    beat = district * 100 + rng.integers(1, 15, rows)
+    community_area = (lat_bin * 15 + (lon - LON_RANGE[0]) * 37.5).astype(int) % 77 + 1
+    ward = (lat_bin * 10 + lon_bin * 2) % 50 + 1
+
+    # Data problems the cleaning step has to deal with
+    missing = rng.random(rows) < MISSING_COORDINATES
+    out_of_bounds = rng.random(rows) < OUT_OF_BOUNDS
+    lat[out_of_bounds] += 1.0
+    lat_out = np.where(missing, np.nan, lat).round(9)
+    lon_out = np.where(missing, np.nan, lon).round(9)
+
+    ids = first_id + np.arange(rows, dtype=np.int64)
+    lat_text = pc.cast(pa.array(lat_out, from_pandas=True), pa.string())
+    lon_text = pc.cast(pa.array(lon_out, from_pandas=True), pa.string())
+    hundreds = pc.utf8_lpad(pc.cast(pa.array(rng.integers(0, 130, rows)), pa.string()), 3, '0')
+
+    table = pa.table({
+        'id': ids,
+        'case_number': _join('J', pc.utf8_lpad(pc.cast(pa.array(ids % 10_000_000), pa.string()), 7, '0')),
+        'date': _join(pa.array(np.datetime_as_string(ts, unit='s')), '.000'),
+        'block': _join(hundreds, 'XX ', _pick(STREETS, rng.integers(0, len(STREETS), rows))),
+        'iucr': _pick([t[2] for t in CRIME_TYPES], type_index),
+        'primary_type': _pick([t[0] for t in CRIME_TYPES], type_index),
+        'description': _pick(DESCRIPTIONS, rng.integers(0, len(DESCRIPTIONS), rows)),
+        'location_description': _pick(LOCATION_DESCRIPTIONS,
+                                      rng.integers(0, len(LOCATION_DESCRIPTIONS), rows)),
+        'arrest': rng.random(rows) < arrest_rate,
+        'domestic': rng.random(rows) < domestic_rate,
+        'beat': beat,
+        'district': district,
+        'ward': ward,
+        'community_area': community_area,
+        'fbi_code': _pick([t[3] for t in CRIME_TYPES], type_index),
+        # Illinois State Plane East (feet), linearised around the city
+        'x_coordinate': pa.array(np.where(missing, np.nan, ((lon + 87.9) * 276000 + 1091000).round()),
+                                 from_pandas=True),
+        'y_coordinate': pa.array(np.where(missing, np.nan, ((lat - 41.6) * 364000 + 1813000).round()),
+                                 from_pandas=True),
+        'year': ts.astype('datetime64[Y]').astype(int) + 1970,
+        'updated_on': _join(pa.array(np.datetime_as_string(updated, unit='s')), '.000'),
+        'latitude': pa.array(lat_out, from_pandas=True),
+        'longitude': pa.array(lon_out, from_pandas=True),
+        'location': _join('{"type": "Point", "coordinates": [', lon_text, ', ', lat_text, ']}')
+    }, schema=RAW_SCHEMA)
+
+    month = ts.astype('datetime64[M]').astype(int)
+    table = table.append_column('event_year', pa.array(month // 12 + 1970, pa.int16()))
+    table = table.append_column('event_month', pa.array(month % 12 + 1, pa.int8()))
+    return table
+
+def generate(rows, seed=42, start='2001-01-01', end='2024-12-31', chunk_rows=1_000_000):
+    \"\"\"
+    Yield portal-shaped Arrow tables of up to chunk_rows, rows in total.
+
+    Daily counts are drawn for the whole period up front and chunks walk
+    through it in time order, so ids rise with time like portal ids and each
+    chunk only touches a few month partitions. Output is reproducible for a
+    given (rows, seed, chunk_rows), and memory stays bounded by chunk_rows.
+    \"\"\"
+    model = city_model(seed)
+    days, day_p = day_weights(start, end)
+    day_ends = np.cumsum(np.random.default_rng(seed).multinomial(rows, day_p))
+    chunk_seeds = np.random.SeedSequence(seed).spawn(-(-rows // chunk_rows))
+    for i, chunk_seed in enumerate(chunk_seeds):
+        first = i * chunk_rows
+        positions = np.arange(first, min(first + chunk_rows, rows))
+        day = days[np.searchsorted(day_ends, positions, side='right')]
+        yield generate_chunk(day, first + 1, np.random.default_rng(chunk_seed), model)
+
+def generate_frame(rows, seed=42, start='2001-01-01', end='2024-12-31'):
+    \"\"\"Generate records in memory as the DataFrame read_dataset would return\"\"\"
+    tables = list(generate(rows, seed, start, end))
+    return pa.concat_tables(tables).drop_columns(['event_year', 'event_month']).to_pandas()
+
+def write_synthetic(rows, path=None, seed=42, start='2001-01-01', end='2024-12-31',
+                    chunk_rows=1_000_000):
+    \"\"\"Write a synthetic raw dataset, partitioned like the downloader's output\"\"\"
+    path = Path(path or SYNTHETIC_DIR / f"raw_{rows}")
+    shutil.rmtree(path, ignore_errors=True)
+
+    written = 0
+    start_time = time.time()
+    for i, table in enumerate(generate(rows, seed, start, end, chunk_rows)):
+        write_table(table, path, mode='append',
+                    basename_template=f"synthetic-{i:05d}-{{i}}.parquet")
+        written += table.num_rows
+        print(f"Generated {written:,} of {rows:,} rows")
+
+    elapsed = time.time() - start_time
+    print(f"Wrote {written:,} rows to {path} in {elapsed:.1f}s")
+    return path
+
+def parse_rows(value):
+    \"\"\"Row count from a preset name (1m, 10m, 50m) or a plain number\"\"\"
+    return SIZES.get(value.lower()) or int(value)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic Chicago crime data')
+    parser.add_argument('--rows', default='1m',
+                        help='Rows to generate: 1m, 10m, 50m or a number')
+    parser.add_argument('--output', default=None,
+                        help='Dataset directory (default data/synthetic/raw_<rows>)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start', default='2001-01-01')
+    parser.add_argument('--end', default='2024-12-31')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SYNTHETIC CHICAGO CRIME GENERATOR")
+    print("=" * 70)
+    write_synthetic(parse_rows(args.rows), args.output, args.seed, args.start, args.end)
+"""
+
+etl_benchmark = """#!/usr/bin/env python3
+\"\"\"
+Time and memory-profile the ETL steps on synthetic data
+\"\"\"
+import io
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import contextlib
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from datetime import datetime
+from clean_data import clean_data
+from feature_engineering import (add_spatial_features, add_temporal_features,
+                                 add_lag_features, add_crime_type_features)
+from storage import DATA_DIR
+from synthetic import generate_frame, parse_rows
+
+REPORT_DIR = DATA_DIR / "benchmarks"
+
+# Steps in pipeline order, each fed the previous step's output
+STEPS = [
+    ('clean_data', lambda df: clean_data(df, verbose=False)),
+    ('add_spatial_features', add_spatial_features),
+    ('add_temporal_features', add_temporal_features),
+    ('add_lag_features', add_lag_features),
+    ('add_crime_type_features', add_crime_type_features)
+]
+
+def run_step(func, df, repeat=1, profile_memory=True):
+    \"\"\"
+    Time a step (best of repeat runs) and measure its peak traced memory.
+
+    Every run gets a fresh copy of the input, made outside the timed region.
+    Memory is measured in a separate run, since tracing slows the code down.
+    \"\"\"
+    seconds = []
+    for _ in range(repeat):
+        data = df.copy()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(data)
+            seconds.append(time.perf_counter() - start)
+
+    peak_mb = None
+    if profile_memory:
+        data = df.copy()
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(data)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    return result, min(seconds), peak_mb
+
+def benchmark(rows, seed=42, repeat=1, profile_memory=True):
+    \"\"\"Run every step over synthetic data of the given size\"\"\"
+    print(f"Generating {rows:,} synthetic incidents...")
+    start = time.perf_counter()
+    df = generate_frame(rows, seed)
+    generate_seconds = time.perf_counter() - start
+
+    steps = []
+    for name, func in STEPS:
+        rows_in = len(df)
+        df, seconds, peak_mb = run_step(func, df, repeat, profile_memory)
+        steps.append({
+            'step': name,
+            'rows_in': rows_in,
+            'rows_out': len(df),
+            'seconds': round(seconds, 4),
+            'rows_per_sec': round(rows_in / seconds) if seconds else None,
+            'peak_traced_mb': round(peak_mb, 1) if peak_mb is not None else None
+        })
+        memory = f", peak {peak_mb:,.0f} MB" if peak_mb is not None else ""
+        print(f"  {name:<26} {seconds:8.2f}s  {rows_in / seconds:>12,.0f} rows/s{memory}")
+
+    return {
+        'rows': rows,
+        'seed': seed,
+        'generate_seconds': round(generate_seconds, 2),
+        'total_seconds': round(sum(s['seconds'] for s in steps), 4),
+        'steps': steps
+    }
+
+def environment():
+    \"\"\"Interpreter, library and machine details recorded with each report\"\"\"
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the ETL steps on synthetic data')
+    parser.add_argument('--rows', default='1m',
+                        help='Comma-separated sizes: 1m, 10m, 50m or numbers')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Timed runs per step, the best is reported')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the traced memory runs')
+    parser.add_argument('--report', default=None,
+                        help='Report path (default data/benchmarks/etl_<timestamp>.json)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("CHICAGO CRIME ETL BENCHMARK")
+    print("=" * 70)
+
+    runs = []
+    for size in args.rows.split(','):
+        runs.append(benchmark(parse_rows(size), args.seed, args.repeat, not args.no_memory))
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        # ru_maxrss is in KB on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'runs': runs
+    }
+
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    report_file = args.report or REPORT_DIR / f"etl_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\\n✅ Report saved to {report_file}")
+"""
+
+etl_refresh_aggregates = """#!/usr/bin/env python3
+\"\"\"
+Maintain the rollups of incidents: grid_aggregates per (grid_id, date, hour),
+stats_cube per (date, hour, district, primary_type) and daily_sketches of
+distinct grids and crime types per date
+\"\"\"
+import time
+import argparse
+from datetime import date
+from sqlalchemy import text
+from sketches import refresh_sketches, rebuild_sketches
+from grids import build_grids, refresh_grid_counts
+
+# Trailing windows in hours, ending with (and including) the row's own hour
+ROLLING_WINDOWS = {'rolling_1d': 24, 'rolling_7d': 7 * 24, 'rolling_30d': 30 * 24}
+
+def bump_data_version(conn):
+    \"\"\"
+    Count one more change of the served data, so API response caches drop
+    what they hold. Commits with the caller's transaction.
+    \"\"\"
+    conn.execute(text(\"\"\"
+        INSERT INTO data_version (id, version) VALUES (1, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    \"\"\"))
+
+def create_touched_table(conn):
+    \"\"\"Temporary table collecting the (grid_id, event_date) pairs a load changed\"\"\"
+    conn.execute(text("DROP TEMPORARY TABLE IF EXISTS agg_touched"))
+    conn.execute(text(
+        "CREATE TEMPORARY TABLE agg_touched (grid_id VARCHAR(32), event_date DATE)"
+    ))
+
+# Cube dimensions of incidents, with placeholders for unknown values (key columns can't be NULL)
+CUBE_SELECT = \"\"\"
+    SELECT event_date, event_hour, COALESCE(district, 0), COALESCE(primary_type, ''),
+        COUNT(*), SUM(arrest)
+    FROM incidents
+\"\"\"
+CUBE_GROUP_BY = "GROUP BY event_date, event_hour, COALESCE(district, 0), COALESCE(primary_type, '')"
+
+def date_runs(dates):
+    \"\"\"Collapse sorted dates into (first, last) runs of consecutive days\"\"\"
+    runs = []
+    for day in dates:
+        if runs and (day - runs[-1][1]).days == 1:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+def refresh_cube(conn):
+    \"\"\"
+    Refresh stats_cube and daily_sketches for every date in agg_touched.
+
+    Each run of consecutive dates is rebuilt with constant date bounds, so
+    the incidents scan is pruned to the partitions of that run.
+    \"\"\"
+    dates = [row[0] for row in conn.execute(text(
+        "SELECT DISTINCT event_date FROM agg_touched WHERE event_date IS NOT NULL ORDER BY event_date"
+    ))]
+    for first, last in date_runs(dates):
+        bounds = {"first": first, "last": last}
+        conn.execute(text("DELETE FROM stats_cube WHERE date BETWEEN :first AND :last"), bounds)
+        conn.execute(text(
+            f"INSERT INTO stats_cube (date, hour, district, primary_type, count, arrests) "
+            f"{CUBE_SELECT} WHERE event_date BETWEEN :first AND :last {CUBE_GROUP_BY}"
+        ), bounds)
+        refresh_sketches(conn, first, last)
+    return len(dates)
+
+def refresh_touched(conn, cube=True):
+    \"\"\"
+    Refresh the rollups for the pairs collected in agg_touched.
+
+    Runs in the caller's transaction. grid_aggregates counts are rebuilt
+    from incidents only for each touched grid between its first and last
+    touched date, through the (grid_id, event_date, event_hour) index.
+    Rolling windows are then recomputed from the rollup itself, for just
+    the rows whose trailing 30 days overlap that range, and the grids
+    dimension counts of those grids follow. With cube, the stats_cube and
+    daily_sketches rows of every touched date are rebuilt too. Returns the
+    number of refreshed grids.
+    \"\"\"
+    conn.execute(text("DROP TEMPORARY TABLE IF EXISTS agg_refresh"))
+    conn.execute(text(\"\"\"
+        CREATE TEMPORARY TABLE agg_refresh (PRIMARY KEY (grid_id))
+        SELECT grid_id, MIN(event_date) AS start_date, MAX(event_date) AS end_date
+        FROM agg_touched
+        WHERE grid_id IS NOT NULL AND event_date IS NOT NULL
+        GROUP BY grid_id
+    \"\"\"))
+
+    conn.execute(text(\"\"\"
+        DELETE ga FROM grid_aggregates ga
+        JOIN agg_refresh r ON ga.grid_id = r.grid_id
+        WHERE ga.date BETWEEN r.start_date AND r.end_date
+    \"\"\"))
+    conn.execute(text(\"\"\"
+        INSERT INTO grid_aggregates (grid_id, date, hour, count, arrests)
+        SELECT i.grid_id, i.event_date, i.event_hour, COUNT(*), SUM(i.arrest)
+        FROM incidents i
+        JOIN agg_refresh r ON i.grid_id = r.grid_id
+        WHERE i.event_date BETWEEN r.start_date AND r.end_date
+        GROUP BY i.grid_id, i.event_date, i.event_hour
+    \"\"\"))
+
+    # Windows run over hour slots, so hours without incidents count as zero
+    windows = ",\\n".join(
+        f"SUM(s.count) OVER (PARTITION BY s.grid_id ORDER BY s.slot "
+        f"RANGE BETWEEN {hours - 1} PRECEDING AND CURRENT ROW) AS {name}"
+        for name, hours in ROLLING_WINDOWS.items()
+    )
+    assignments = ", ".join(f"ga.{name} = w.{name}" for name in ROLLING_WINDOWS)
+    conn.execute(text(f\"\"\"
+        UPDATE grid_aggregates ga
+        JOIN (
+            SELECT s.grid_id, s.date, s.hour, s.start_date, s.end_date,
+                {windows}
+            FROM (
+                SELECT a.grid_id, a.date, a.hour, a.count, r.start_date, r.end_date,
+                    TO_DAYS(a.date) * 24 + a.hour AS slot
+                FROM grid_aggregates a
+                JOIN agg_refresh r ON a.grid_id = r.grid_id
+                WHERE a.date BETWEEN r.start_date - INTERVAL 30 DAY
+                                 AND r.end_date + INTERVAL 30 DAY
+            ) s
+        ) w ON ga.grid_id = w.grid_id AND ga.date = w.date AND ga.hour = w.hour
+        SET {assignments}
+        WHERE w.date BETWEEN w.start_date AND w.end_date + INTERVAL 30 DAY
+    \"\"\"))
+
+    grids = conn.execute(text("SELECT COUNT(*) FROM agg_refresh")).scalar()
+    refresh_grid_counts(conn, touched=True)
+    if cube:
+        refresh_cube(conn)
+    conn.execute(text("DROP TEMPORARY TABLE agg_refresh"))
+    conn.execute(text("DROP TEMPORARY TABLE agg_touched"))
+    bump_data_version(conn)
+    return grids
+
+def rebuild_aggregates(conn):
+    \"\"\"Rebuild every rollup from scratch, e.g. after a bulk load\"\"\"
+    conn.execute(text("TRUNCATE TABLE grid_aggregates"))
+    conn.execute(text("TRUNCATE TABLE stats_cube"))
+    conn.execute(text(
+        f"INSERT INTO stats_cube (date, hour, district, primary_type, count, arrests) "
+        f"{CUBE_SELECT} {CUBE_GROUP_BY}"
+    ))
+    rebuild_sketches(conn)
+    create_touched_table(conn)
+    conn.execute(text(\"\"\"
+        INSERT INTO agg_touched (grid_id, event_date)
+        SELECT grid_id, MIN(event_date) FROM incidents GROUP BY grid_id
+        UNION ALL
+        SELECT grid_id, MAX(event_date) FROM incidents GROUP BY grid_id
+    \"\"\"))
+    grids = refresh_touched(conn, cube=False)
+    build_grids(conn)
+    return grids
+
+def refresh_months(conn, months):
+    \"\"\"Refresh every grid with incidents or aggregates in the given (year, month) tuples\"\"\"
+    create_touched_table(conn)
+    for year, month in months:
+        bounds = {"start": date(year, month, 1),
+                  "end": date(year + month // 12, month % 12 + 1, 1)}
+        conn.execute(text(\"\"\"
+            INSERT INTO agg_touched (grid_id, event_date)
+            SELECT DISTINCT grid_id, event_date FROM incidents
+            WHERE event_date >= :start AND event_date < :end
+        \"\"\"), bounds)
+        # Grids whose incidents all left the month still need their rows cleared
+        conn.execute(text(\"\"\"
+            INSERT INTO agg_touched (grid_id, event_date)
+            SELECT DISTINCT grid_id, date FROM grid_aggregates
+            WHERE date >= :start AND date < :end
+        \"\"\"), bounds)
+    return refresh_touched(conn)
+
+def refresh_recent(conn, days):
+    \"\"\"Refresh every grid with incidents in the last days days\"\"\"
+    create_touched_table(conn)
+    conn.execute(text(\"\"\"
+        INSERT INTO agg_touched (grid_id, event_date)
+        SELECT DISTINCT grid_id, event_date
+        FROM incidents
+        WHERE event_date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
+    \"\"\"), {"days": days})
+    return refresh_touched(conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Refresh the incidents rollups')
+    parser.add_argument('--full', action='store_true',
+                        help='Rebuild the whole rollup from incidents')
+    parser.add_argument('--days', type=int, default=30,
+                        help='Refresh grids with incidents in the last N days')
+    args = parser.parse_args()
+
+    from load_to_mysql import get_engine
+
+    print("=" * 70)
+    print("ROLLUP REFRESH")
+    print("=" * 70)
+
+    start = time.time()
+    with get_engine().begin() as conn:
+        grids = rebuild_aggregates(conn) if args.full else refresh_recent(conn, args.days)
+    print(f"\\n✅ Refreshed {grids} grids in {time.time() - start:.1f}s")
+"""
+
+etl_partitions = """#!/usr/bin/env python3
+\"\"\"
+Manage the monthly RANGE partitions of the incidents table
+\"\"\"
+import argparse
+from datetime import date
+from sqlalchemy import text
+
+PARTITIONED_TABLE = "incidents"
+
+# Monthly partitions kept ready beyond the current month
+MONTHS_AHEAD = 3
+
+# Catch-all for rows past the last monthly partition, split by ensure_partitions
+MAX_PARTITION = "pmax"
+
+def add_months(month, n):
+    \"\"\"Shift a month start date by n months\"\"\"
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+def month_partition(month):
+    \"\"\"Partition name of an event month, e.g. p202405\"\"\"
+    return f"p{month.year}{month.month:02d}"
+
+def table_partitions(conn, table=PARTITIONED_TABLE):
+    \"\"\"
+    List a table's partitions in order.
+
+    Returns (name, upper bound, rows) tuples; the bound is the exclusive upper
+    event_date as a date, None for the MAXVALUE partition. Row counts are
+    InnoDB estimates.
+    \"\"\"
+    result = conn.execute(text(\"\"\"
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+        AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    \"\"\"), {"table": table}).fetchall()
+    partitions = []
+    for name, bound, rows in result:
+        upper = None if bound == 'MAXVALUE' else date.fromisoformat(bound.strip("'"))
+        partitions.append((name, upper, int(rows or 0)))
+    return partitions
+
+def _definition(name, upper):
+    bound = "MAXVALUE" if upper is None else f"'{upper.isoformat()}'"
+    return f"PARTITION {name} VALUES LESS THAN ({bound})"
+
+def ensure_partitions(conn, through=None, months_ahead=MONTHS_AHEAD):
+    \"\"\"
+    Split pmax into monthly partitions up to months_ahead past the current month.
+
+    through (a date) extends the range further, e.g. to the last event month
+    of a load. pmax is normally empty, so the reorganization only rewrites
+    metadata. Returns the names of the created partitions.
+    \"\"\"
+    partitions = table_partitions(conn)
+    bounded = [upper for _, upper, _ in partitions if upper is not None]
+    if not bounded:
+        raise RuntimeError(f"{PARTITIONED_TABLE} has no RANGE partitions to extend")
+
+    last = add_months(date.today().replace(day=1), months_ahead)
+    if through is not None:
+        last = max(last, through.replace(day=1))
+
+    month = bounded[-1]
+    created = []
+    while month <= last:
+        created.append((month_partition(month), add_months(month, 1)))
+        month = add_months(month, 1)
+    if not created:
+        return []
+
+    definitions = ",\\n".join(_definition(name, upper) for name, upper in created)
+    conn.execute(text(
+        f"ALTER TABLE {PARTITIONED_TABLE} REORGANIZE PARTITION {MAX_PARTITION} INTO (\\n"
+        f"{definitions},\\n{_definition(MAX_PARTITION, None)})"
+    ))
+    return [name for name, _ in created]
+
+def merge_partitions(conn, before_year):
+    \"\"\"
+    Merge the monthly partitions of every year before before_year into one per year.
+
+    Old years are only read by long-range queries, so twelve partitions
+    there just add open-file and planning overhead. Returns the merged years.
+    \"\"\"
+    by_year = {}
+    for name, upper, _ in table_partitions(conn):
+        if upper is None or len(name) != 7:
+            continue
+        year = add_months(upper, -1).year
+        if year < before_year:
+            by_year.setdefault(year, []).append(name)
+
+    for year, names in sorted(by_year.items()):
+        conn.execute(text(
+            f"ALTER TABLE {PARTITIONED_TABLE} REORGANIZE PARTITION {', '.join(names)} "
+            f"INTO ({_definition(f'p{year}', date(year + 1, 1, 1))})"
+        ))
+    return sorted(by_year)
+
+def archive_partitions(conn, before):
+    \"\"\"
+    Move every partition that ends on or before the before date out of incidents.
+
+    Each partition is swapped with EXCHANGE PARTITION into its own
+    incidents_archive_<partition> table, a metadata-only move, and then
+    dropped. grid_aggregates keeps the archived months' counts. Returns the
+    archive table names.
+    \"\"\"
+    archived = []
+    for name, upper, _ in table_partitions(conn):
+        if upper is None or upper > before:
+            continue
+        archive = f"{PARTITIONED_TABLE}_archive_{name}"
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {archive} LIKE {PARTITIONED_TABLE}"))
+        conn.execute(text(f"ALTER TABLE {archive} REMOVE PARTITIONING"))
+        conn.execute(text(
+            f"ALTER TABLE {PARTITIONED_TABLE} EXCHANGE PARTITION {name} WITH TABLE {archive}"
+        ))
+        conn.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DROP PARTITION {name}"))
+        archived.append(archive)
+    return archived
+
+def print_partitions(conn):
+    \"\"\"Print the current partition layout\"\"\"
+    for name, upper, rows in table_partitions(conn):
+        bound = "MAXVALUE" if upper is None else upper.isoformat()
+        print(f"  {name:<12} < {bound:<12} ~{rows:,} rows")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage incidents partitions')
+    parser.add_argument('--months-ahead', type=int, default=MONTHS_AHEAD,
+                        help='Monthly partitions to keep ready past the current month')
+    parser.add_argument('--merge-before', type=int, default=None,
+                        help='Merge monthly partitions of years before this one')
+    parser.add_argument('--archive-before', type=int, default=None,
+                        help='Move partitions of years before this one to archive tables')
+    parser.add_argument('--list', action='store_true',
+                        help='Only print the partition layout')
+    args = parser.parse_args()
+
+    from load_to_mysql import get_engine
+
+    print("=" * 70)
+    print("INCIDENTS PARTITION MANAGER")
+    print("=" * 70)
+
+    engine = get_engine()
+    # DDL commits implicitly, so each step runs on its own
+    with engine.connect() as conn:
+        if not args.list:
+            created = ensure_partitions(conn, months_ahead=args.months_ahead)
+            print(f"Created {len(created)} monthly partitions"
+                  + (f": {created[0]} .. {created[-1]}" if created else ""))
+            if args.archive_before:
+                archived = archive_partitions(conn, date(args.archive_before, 1, 1))
+                print(f"Archived {len(archived)} partitions")
+            if args.merge_before:
+                years = merge_partitions(conn, args.merge_before)
+                print(f"Merged {len(years)} years into yearly partitions")
+        print_partitions(conn)
+    engine.dispose()
+"""
+
+etl_sketches = """#!/usr/bin/env python3
+\"\"\"
+Per-day HyperLogLog sketches of distinct grids and crime types
+\"\"\"
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# 2^12 one-byte registers per sketch: standard error 1.04 / sqrt(4096) = 1.6%
+SKETCH_PRECISION = 12
+
+# Incident column sketched into each daily_sketches column
+SKETCHED_COLUMNS = {'grids': 'grid_id', 'crime_types': 'primary_type'}
+
+def _bit_length(x):
+    \"\"\"Vectorized int.bit_length of a uint64 array\"\"\"
+    x = x.copy()
+    length = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= np.uint64(1 << shift)
+        length[high] += shift
+        x[high] >>= np.uint64(shift)
+    return length + (x > 0)
+
+def register_updates(values, precision=SKETCH_PRECISION):
+    \"\"\"
+    HyperLogLog register index and rank of every value.
+
+    Values are hashed with pandas' stable 64-bit SipHash. The top precision
+    bits pick the register, the rank is the position of the first set bit
+    in the rest.
+    \"\"\"
+    hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+    rest_bits = 64 - precision
+    index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    rank = (rest_bits + 1 - _bit_length(rest)).astype(np.uint8)
+    return index, rank
+
+def daily_sketches(df, precision=SKETCH_PRECISION):
+    \"\"\"
+    Build one sketch per event_date and sketched column.
+
+    df holds event_date plus the SKETCHED_COLUMNS sources. Returns a
+    DataFrame with a date column and one bytes column per sketch.
+    \"\"\"
+    df = df.dropna(subset=['event_date'])
+    day_codes, days = pd.factorize(pd.to_datetime(df['event_date']).dt.date, sort=True)
+    m = 1 << precision
+    sketches = {'date': list(days)}
+    for column, source in SKETCHED_COLUMNS.items():
+        known = df[source].notna().to_numpy()
+        index, rank = register_updates(df[source].to_numpy()[known], precision)
+        registers = np.zeros(len(days) * m, dtype=np.uint8)
+        np.maximum.at(registers, day_codes[known] * m + index, rank)
+        sketches[column] = [row.tobytes() for row in registers.reshape(len(days), m)]
+    return pd.DataFrame(sketches)
+
+def refresh_sketches(conn, first, last):
+    \"\"\"Rebuild the daily_sketches rows of event dates first..last from incidents\"\"\"
+    rows = pd.read_sql(text(f\"\"\"
+        SELECT event_date, {', '.join(SKETCHED_COLUMNS.values())}
+        FROM incidents
+        WHERE event_date BETWEEN :first AND :last
+    \"\"\"), conn, params={"first": first, "last": last})
+
+    conn.execute(text("DELETE FROM daily_sketches WHERE date BETWEEN :first AND :last"),
+                 {"first": first, "last": last})
+    if rows.empty:
+        return 0
+    sketches = daily_sketches(rows)
+    conn.execute(
+        text(f"INSERT INTO daily_sketches (date, {', '.join(SKETCHED_COLUMNS)}) "
+             f"VALUES (:date, {', '.join(':' + c for c in SKETCHED_COLUMNS)})"),
+        sketches.to_dict('records')
+    )
+    return len(sketches)
+
+def rebuild_sketches(conn):
+    \"\"\"Rebuild every daily sketch, one event month at a time to bound memory\"\"\"
+    conn.execute(text("TRUNCATE TABLE daily_sketches"))
+    first, last = conn.execute(text("SELECT MIN(event_date), MAX(event_date) FROM incidents")).one()
+    days = 0
+    if first is None:
+        return days
+    for start in pd.date_range(first.replace(day=1), last, freq='MS'):
+        end = start + pd.offsets.MonthEnd(0)
+        days += refresh_sketches(conn, start.date(), end.date())
+    return days
+"""
+
+etl_grids = """#!/usr/bin/env python3
+\"\"\"
+Build the grids dimension table: geometry, neighbor ring and counts per grid cell
+\"\"\"
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from geohash_vec import encode, decode_exactly
+
+# The cleaning bounding box in clean_data.py: (lat_min, lat_max, lon_min, lon_max)
+CITY_BOUNDS = (41.6, 42.1, -87.9, -87.5)
+
+# grid_id is the geohash6 of an incident
+GRID_PRECISION = 6
+
+# Window of grids.recent_count, matching the nearby search
+RECENT_DAYS = 30
+
+GRID_COLUMNS = ['grid_id', 'center_lat', 'center_lon', 'lat_min', 'lat_max',
+                'lon_min', 'lon_max', 'parent_id']
+
+def city_cells(bounds=CITY_BOUNDS, precision=GRID_PRECISION):
+    \"\"\"
+    Every geohash cell overlapping the bounding box, sorted.
+
+    Sample points half a cell apart are encoded, so every cell is hit at
+    least once. Cells without incidents are included, so any point in the
+    city resolves to a grid row.
+    \"\"\"
+    lat_min, lat_max, lon_min, lon_max = bounds
+    _, _, lat_err, lon_err = decode_exactly(encode([lat_min], [lon_min], (precision,))[precision])
+    lats = np.append(np.arange(lat_min, lat_max, lat_err[0]), lat_max)
+    lons = np.append(np.arange(lon_min, lon_max, lon_err[0]), lon_max)
+    lat, lon = np.meshgrid(lats, lons)
+    return np.unique(encode(lat.ravel(), lon.ravel(), (precision,))[precision])
+
+def grid_dimension(grid_ids):
+    \"\"\"Centroid, bounds and parent cell of each grid\"\"\"
+    grid_ids = np.asarray(grid_ids, dtype=str)
+    lat, lon, lat_err, lon_err = decode_exactly(grid_ids)
+    return pd.DataFrame({
+        'grid_id': grid_ids,
+        'center_lat': lat,
+        'center_lon': lon,
+        'lat_min': lat - lat_err,
+        'lat_max': lat + lat_err,
+        'lon_min': lon - lon_err,
+        'lon_max': lon + lon_err,
+        'parent_id': [g[:-1] for g in grid_ids]
+    })
+
+def neighbor_ring(grid_ids):
+    \"\"\"
+    (grid_id, neighbor_id, ring) rows: each cell itself at ring 0 and the
+    8 cells around it at ring 1.
+
+    Neighbors are found by encoding the centroid shifted by one cell height
+    and/or width, instead of pygeohash's per-cell adjacency lookups.
+    \"\"\"
+    grid_ids = np.asarray(grid_ids, dtype=str)
+    precision = len(grid_ids[0]) if len(grid_ids) else GRID_PRECISION
+    lat, lon, lat_err, lon_err = decode_exactly(grid_ids)
+    rings = [pd.DataFrame({'grid_id': grid_ids, 'neighbor_id': grid_ids, 'ring': 0})]
+    for dlat in (-1, 0, 1):
+        for dlon in (-1, 0, 1):
+            if dlat == 0 and dlon == 0:
+                continue
+            neighbors = encode(lat + 2 * dlat * lat_err, lon + 2 * dlon * lon_err,
+                               (precision,))[precision]
+            rings.append(pd.DataFrame({'grid_id': grid_ids, 'neighbor_id': neighbors, 'ring': 1}))
+    return pd.concat(rings, ignore_index=True)
+
+def refresh_grid_counts(conn, touched=False):
+    \"\"\"
+    Refresh lifetime and recent counts from grid_aggregates.
+
+    With touched, only the grids in the agg_refresh table of a running
+    rollup refresh are updated, including grids with no rollup rows left
+    (all of their incidents deleted or moved), which drop to zero;
+    otherwise all of them, which also moves the recent window forward.
+    \"\"\"
+    if touched:
+        source = \"\"\"
+            FROM agg_refresh r
+            LEFT JOIN grid_aggregates a ON a.grid_id = r.grid_id
+            GROUP BY r.grid_id
+        \"\"\"
+        grid_id = "r.grid_id"
+    else:
+        conn.execute(text("UPDATE grids SET lifetime_count = 0, recent_count = 0, last_event_date = NULL"))
+        source = \"\"\"
+            FROM grid_aggregates a
+            GROUP BY a.grid_id
+        \"\"\"
+        grid_id = "a.grid_id"
+    conn.execute(text(f\"\"\"
+        UPDATE grids g
+        JOIN (
+            SELECT {grid_id} AS grid_id,
+                COALESCE(SUM(a.count), 0) AS lifetime_count,
+                COALESCE(SUM(CASE WHEN a.date >= DATE_SUB(CURDATE(), INTERVAL :days DAY)
+                                  THEN a.count ELSE 0 END), 0) AS recent_count,
+                MAX(a.date) AS last_event_date
+            {source}
+        ) c ON g.grid_id = c.grid_id
+        SET g.lifetime_count = c.lifetime_count,
+            g.recent_count = c.recent_count,
+            g.last_event_date = c.last_event_date
+    \"\"\"), {"days": RECENT_DAYS})
+
+def refresh_children(conn):
+    \"\"\"List the child cells (one level finer) that have incidents, from the (geohash6, geohash8) index\"\"\"
+    conn.execute(text(\"\"\"
+        UPDATE grids g
+        JOIN (
+            SELECT geohash6 AS grid_id,
+                GROUP_CONCAT(DISTINCT LEFT(geohash8, 7) ORDER BY LEFT(geohash8, 7)) AS children
+            FROM incidents
+            WHERE geohash8 IS NOT NULL
+            GROUP BY geohash6
+        ) c ON g.grid_id = c.grid_id
+        SET g.children = c.children
+    \"\"\"))
+
+def build_grids(conn, bounds=CITY_BOUNDS):
+    \"\"\"
+    Rebuild grids and grid_neighbors for every cell of the city.
+
+    Geometry is upserted so existing counts survive until they are
+    refreshed at the end. Returns the number of grid cells.
+    \"\"\"
+    cells = city_cells(bounds)
+    dimension = grid_dimension(cells)
+    columns = ", ".join(GRID_COLUMNS)
+    updates = ", ".join(f"{c} = VALUES({c})" for c in GRID_COLUMNS[1:])
+    conn.execute(text(
+        f"INSERT INTO grids ({columns}) VALUES ({', '.join(':' + c for c in GRID_COLUMNS)}) "
+        f"ON DUPLICATE KEY UPDATE {updates}"
+    ), dimension.to_dict('records'))
+    conn.execute(text("DELETE FROM grids WHERE grid_id NOT IN :cells"), {"cells": tuple(cells)})
+
+    conn.execute(text("DELETE FROM grid_neighbors"))
+    conn.execute(text(
+        "INSERT INTO grid_neighbors (grid_id, neighbor_id, ring) VALUES (:grid_id, :neighbor_id, :ring)"
+    ), neighbor_ring(cells).to_dict('records'))
+
+    refresh_children(conn)
+    refresh_grid_counts(conn)
+    return len(cells)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the grids dimension table')
+    parser.add_argument('--counts-only', action='store_true',
+                        help='Only refresh lifetime/recent counts (nightly)')
+    args = parser.parse_args()
+
+    from load_to_mysql import get_engine
+    from refresh_aggregates import bump_data_version
+
+    print("=" * 70)
+    print("GRIDS DIMENSION")
+    print("=" * 70)
+
+    start = time.time()
+    with get_engine().begin() as conn:
+        if args.counts_only:
+            refresh_grid_counts(conn)
+            print("Refreshed grid counts")
+        else:
+            cells = build_grids(conn)
+            print(f"Built {cells} grid cells with their neighbor rings")
+        bump_data_version(conn)
+    print(f"\\n✅ Done in {time.time() - start:.1f}s")
+"""
+
 print("\n✅ ETL Pipeline Files Generated:")
 print("   - etl/download_data.py")
 print("   - etl/clean_data.py") 
 print("   - etl/feature_engineering.py")
+print("   - etl/load_to_mysql.py")
+print("   - etl/storage.py")
+print("   - etl/geohash_vec.py")
+print("   - etl/temporal.py")
+print("   - etl/lag_panel.py")
+print("   - etl/pipeline.py")
+print("   - etl/synthetic.py")
+print("   - etl/benchmark.py")
+print("   - etl/refresh_aggregates.py")
+print("   - etl/partitions.py")
+print("   - etl/sketches.py")
+print("   - etl/grids.py")